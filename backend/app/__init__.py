@@ -5,13 +5,20 @@ from __future__ import annotations
 import os
 
 from flask import Flask, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from app.blueprints.api import bp as api_bp
 from app.blueprints.auth import bp as auth_bp
 from app.blueprints.history import bp as history_bp
+from app.cli import register_cli
 from app.config import config as config_map
-from app.extensions import cors, db, jwt, limiter
+from app.extensions import cors, db, jwt, limiter, register_sqlite_pragmas
+from app.models.history_search import ensure_search_index
+from app.models.question_signature import ensure_question_signatures
+from app.models.schema import upgrade_schema
+from app.models.types import configure_json_compression
 from app.utils.errors import register_error_handlers
+from app.utils.timing import register_server_timing
 
 
 def _rate_limit_rule(max_requests: int, window_seconds: int) -> str:
@@ -31,16 +38,23 @@ def create_app(config_name: str | None = None) -> Flask:
     app.json.ensure_ascii = False
 
     db.init_app(app)
+    register_sqlite_pragmas(app)
+    configure_json_compression(app)
     jwt.init_app(app)
     cors.init_app(
         app,
         resources={r"/api/*": {"origins": app.config["CORS_ORIGIN"]}},
         supports_credentials=True,
     )
+    proxy_count = app.config["TRUSTED_PROXY_COUNT"]
+    if proxy_count > 0:
+        # 从 X-Forwarded-For / X-Forwarded-Proto 还原客户端地址，限流才能区分不同客户端
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_count, x_proto=proxy_count)
     app.config["RATELIMIT_DEFAULT"] = _rate_limit_rule(
         app.config["RATE_LIMIT_MAX_REQUESTS"],
         app.config["RATE_LIMIT_WINDOW_SECONDS"],
     )
+    app.config["RATELIMIT_STORAGE_URI"] = app.config["RATE_LIMIT_STORAGE_URI"]
     limiter.init_app(app)
 
     @jwt.unauthorized_loader
@@ -72,8 +86,14 @@ def create_app(config_name: str | None = None) -> Flask:
     app.register_blueprint(history_bp, url_prefix="/api/history")
 
     register_error_handlers(app)
+    register_server_timing(app)
+    register_cli(app)
 
     with app.app_context():
         db.create_all()
+        upgrade_schema(db.engine)
+        ensure_search_index()
+        if app.config["DEDUP_MODE"] != "off":
+            ensure_question_signatures()
 
     return app
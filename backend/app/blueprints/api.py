@@ -2,17 +2,32 @@
 
 from __future__ import annotations
 
-import base64
+import hmac
 import json
 from datetime import datetime
 
-from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
-from flask_jwt_extended import decode_token
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
 
 from app.extensions import db
 from app.models.user import User
-from app.schemas.problem import ParseSchema, RecognizeSchema, SolveProblemSchema, SolveSchema, SolveStreamSchema
+from app.schemas.problem import (
+    ParseSchema,
+    RecognizeSchema,
+    SolveBatchSchema,
+    SolveProblemSchema,
+    SolveSchema,
+    SolveStreamSchema,
+)
+from app.services.cache_service import ocr_cache, parse_cache, solution_cache
+from app.services.dedup_service import question_dedup
+from app.services.history_writer import history_writer
+from app.services.image_preprocess import image_preprocessor
+from app.services.http_client import upstream_client
 from app.services.pipeline_service import pipeline_service
+from app.services.single_flight import ocr_flight, parse_flight, solution_flight, solution_stream_broadcast
+from app.utils.auth import bearer_identity
+from app.utils.errors import APIError
+from app.utils.images import ImagePayload
 
 
 bp = Blueprint("api", __name__)
@@ -22,27 +37,49 @@ parse_schema = ParseSchema()
 solve_schema = SolveSchema()
 solve_problem_schema = SolveProblemSchema()
 solve_stream_schema = SolveStreamSchema()
+solve_batch_schema = SolveBatchSchema()
 
 
 def _iso_now() -> str:
     return datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
 
 
-def _optional_user_identity() -> str | None:
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header:
-        return None
-
-    parts = auth_header.split(" ")
-    if len(parts) != 2 or parts[0] != "Bearer":
-        return None
-
-    token = parts[1]
-    try:
-        decoded = decode_token(token)
-        return decoded.get("sub")
-    except Exception:  # noqa: BLE001
-        return None
+def _optional_user() -> tuple[str | None, str | None]:
+    user_id = bearer_identity()
+    if not user_id:
+        return None, None
+
+    user = db.session.get(User, user_id)
+    # 后续调用上游可能持续数十秒，先归还数据库连接，避免高并发时耗尽连接池
+    db.session.close()
+    if not user:
+        return None, None
+    return user_id, user.username
+
+
+def _uploaded_image() -> ImagePayload | None:
+    """读取 multipart 的 image 字段或原始图片请求体；请求不是上传图片时返回 None。"""
+    max_size = current_app.config.get("MAX_IMAGE_SIZE", 5 * 1024 * 1024)
+    if request.mimetype == "multipart/form-data":
+        upload = request.files.get("image")
+        if upload is None:
+            return None
+        return ImagePayload.from_stream(upload.stream, upload.mimetype, max_size)
+    if request.mimetype.startswith("image/") or request.mimetype == "application/octet-stream":
+        return ImagePayload.from_stream(request.stream, request.mimetype, max_size)
+    return None
+
+
+def _solve_problem_payload() -> dict:
+    image = _uploaded_image()
+    if image is None:
+        return solve_problem_schema.load(request.get_json(silent=True) or {})
+    # 上传图片时其余参数来自表单字段或查询参数
+    payload = solve_problem_schema.load(
+        {"type": "image", "content": "", "skipDuplicate": request.values.get("skipDuplicate", False)}
+    )
+    payload["content"] = image
+    return payload
 
 
 @bp.get("/health")
@@ -56,19 +93,47 @@ def health():
     )
 
 
-@bp.post("/recognize")
-def recognize():
-    payload = recognize_schema.load(request.get_json(silent=True) or {})
-    image = payload["image"]
+@bp.get("/metrics")
+def metrics():
+    token = current_app.config.get("METRICS_TOKEN", "")
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get("X-Metrics-Token", "").encode(), token.encode()):
+        raise APIError("指标令牌无效", 401)
 
-    try:
-        body = image.split(",", 1)[1] if "," in image else image
-        size_in_bytes = len(base64.b64decode(body, validate=False))
-    except Exception:  # noqa: BLE001
-        return jsonify({"success": False, "error": "缺少图片数据"}), 400
+    return jsonify(
+        {
+            "success": True,
+            "data": {
+                "upstream": upstream_client.stats(),
+                "parseCache": parse_cache.stats(),
+                "solutionCache": solution_cache.stats(),
+                "ocrCache": ocr_cache.stats(),
+                "imagePreprocess": image_preprocessor.stats(),
+                "singleFlight": {
+                    "ocr": ocr_flight.stats(),
+                    "parse": parse_flight.stats(),
+                    "solution": solution_flight.stats(),
+                    "solutionStream": solution_stream_broadcast.stats(),
+                },
+                "historyWriter": history_writer.stats(),
+                "dedup": question_dedup.stats(),
+            },
+            "timestamp": _iso_now(),
+        }
+    )
 
-    if size_in_bytes > current_app.config.get("MAX_IMAGE_SIZE", 5 * 1024 * 1024):
-        return jsonify({"success": False, "error": "图片大小超过限制"}), 400
+
+@bp.post("/recognize")
+def recognize():
+    image = _uploaded_image()
+    if image is None:
+        payload = recognize_schema.load(request.get_json(silent=True) or {})
+        image = ImagePayload.from_data_url(payload["image"])
+        if image.size is None:
+            return jsonify({"success": False, "error": "缺少图片数据"}), 400
+        if image.size > current_app.config.get("MAX_IMAGE_SIZE", 5 * 1024 * 1024):
+            return jsonify({"success": False, "error": "图片大小超过限制"}), 400
 
     result = pipeline_service.recognize_only(image)
     return jsonify(result)
@@ -90,16 +155,9 @@ def solve_problem_part():
 
 @bp.post("/solve-problem")
 def solve_problem_full():
-    payload = solve_problem_schema.load(request.get_json(silent=True) or {})
+    payload = _solve_problem_payload()
 
-    user_id = _optional_user_identity()
-    username = None
-    if user_id:
-        user = db.session.get(User, user_id)
-        if user:
-            username = user.username
-        else:
-            user_id = None
+    user_id, username = _optional_user()
 
     result = pipeline_service.solve_problem(
         {
@@ -107,12 +165,80 @@ def solve_problem_full():
             "content": payload["content"],
             "userId": user_id,
             "username": username,
+            "skipDuplicate": payload["skip_duplicate"],
         }
     )
 
     return jsonify(result)
 
 
+@bp.post("/solve-problem-stream")
+def solve_problem_stream():
+    payload = _solve_problem_payload()
+    user_id, username = _optional_user()
+
+    input_data = {
+        "type": payload["type"],
+        "content": payload["content"],
+        "userId": user_id,
+        "username": username,
+        "skipDuplicate": payload["skip_duplicate"],
+    }
+
+    @stream_with_context
+    def generate():
+        try:
+            for event in pipeline_service.solve_problem_stream(input_data):
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+        except Exception as exc:  # noqa: BLE001
+            db.session.rollback()
+            yield f"data: {json.dumps({'type': 'error', 'error': str(exc)}, ensure_ascii=False)}\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        },
+    )
+
+
+@bp.post("/solve-batch")
+def solve_batch():
+    # 一次提交多张图片，单独设置请求体上限；每张图片的大小在解题时逐题检查，超限的题目作为单题错误返回
+    request.max_content_length = current_app.config.get("BATCH_MAX_CONTENT_LENGTH", 32 * 1024 * 1024)
+    payload = solve_batch_schema.load(request.get_json(silent=True) or {})
+
+    problems = payload["problems"]
+    max_items = current_app.config.get("BATCH_MAX_ITEMS", 50)
+    if len(problems) > max_items:
+        return jsonify({"success": False, "error": f"单次最多提交 {max_items} 道题目"}), 400
+
+    user_id, username = _optional_user()
+
+    user_key = user_id or request.remote_addr or "anonymous"
+    use_sse = payload["format"] == "sse"
+
+    @stream_with_context
+    def generate():
+        for event in pipeline_service.solve_batch(problems, user_key, user_id, username):
+            line = json.dumps(event, ensure_ascii=False)
+            yield f"data: {line}\n\n" if use_sse else f"{line}\n"
+        if use_sse:
+            yield "data: [DONE]\n\n"
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        },
+    )
+
+
 @bp.post("/solve-stream")
 def solve_stream():
     payload = solve_stream_schema.load(request.get_json(silent=True) or {})
@@ -3,17 +3,27 @@
 from __future__ import annotations
 
 import math
+from datetime import datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from flask_jwt_extended import get_jwt_identity, jwt_required
+from sqlalchemy import tuple_
 
 from app.extensions import db
 from app.models.history import History
-from app.schemas.history import HistoryQuerySchema
+from app.models.history_count import HistoryCount
+from app.models.history_search import HistorySearch
+from app.models.question_signature import QuestionSignature
+from app.schemas.history import HistoryExportQuerySchema, HistoryQuerySchema, HistorySearchQuerySchema
+from app.services.history_export import MIMETYPES, history_exporter
+from app.services.history_writer import history_writer
+from app.utils.pagination import decode_cursor, encode_cursor
 
 
 bp = Blueprint("history", __name__)
 query_schema = HistoryQuerySchema()
+search_schema = HistorySearchQuerySchema()
+export_schema = HistoryExportQuerySchema()
 
 
 @bp.get("")
@@ -23,33 +33,106 @@ def list_history():
 
     page = args["page"]
     limit = args["limit"]
+    cursor = args["cursor"]
     user_id = get_jwt_identity()
+    # 延迟写入时先等本进程中该用户排队的记录落库，列表和总数才包含刚解完的题
+    history_writer.wait_for_user(user_id)
+    # 先取总数：首次回填会提交事务，放在后面会让已加载的记录过期重查
+    total = HistoryCount.for_user(user_id)
+
+    summary = args["view"] == "summary"
+
+    query = History.query.filter_by(user_id=user_id).order_by(History.created_at.desc(), History.id.desc())
+    if summary:
+        query = query.with_entities(*History.summary_columns())
+    if cursor:
+        created_at, record_id = decode_cursor(cursor)
+        # 行值比较让 SQLite 直接在复合索引上定位起点，而不是从头扫描该用户的记录
+        query = query.filter(tuple_(History.created_at, History.id) < tuple_(created_at, record_id))
+    else:
+        # 兼容旧的 page 参数；越往后 OFFSET 越慢，新客户端应使用 nextCursor
+        query = query.offset((page - 1) * limit)
+
+    # 多取一条判断是否还有下一页
+    records = query.limit(limit + 1).all()
+    has_more = len(records) > limit
+    records = records[:limit]
+
+    pagination = {
+        "limit": limit,
+        "total": total,
+        "nextCursor": encode_cursor(records[-1].created_at, records[-1].id) if has_more else None,
+        "hasMore": has_more,
+    }
+    if not cursor:
+        pagination.update(
+            {
+                "page": page,
+                "totalPages": math.ceil(total / limit) if total > 0 else 0,
+            }
+        )
 
-    query = History.query.filter_by(user_id=user_id).order_by(History.created_at.desc())
-    total = query.count()
-
-    records = (
-        query.offset((page - 1) * limit)
-        .limit(limit)
-        .all()
+    return jsonify(
+        {
+            "success": True,
+            "data": {
+                "records": [
+                    History.summary_to_dict(record) if summary else record.to_dict() for record in records
+                ],
+                "pagination": pagination,
+            },
+        }
     )
 
+
+@bp.get("/search")
+@jwt_required()
+def search_history():
+    args = search_schema.load(request.args)
+
+    page = args["page"]
+    limit = args["limit"]
+    user_id = get_jwt_identity()
+    history_writer.wait_for_user(user_id)
+
+    records = HistorySearch.search(user_id, args["q"].strip(), limit + 1, (page - 1) * limit)
+    has_more = len(records) > limit
+
     return jsonify(
         {
             "success": True,
             "data": {
-                "records": [record.to_dict() for record in records],
-                "pagination": {
-                    "page": page,
-                    "limit": limit,
-                    "total": total,
-                    "totalPages": math.ceil(total / limit) if total > 0 else 0,
-                },
+                "records": [History.summary_to_dict(record) for record in records[:limit]],
+                "pagination": {"page": page, "limit": limit, "hasMore": has_more},
             },
         }
     )
 
 
+@bp.get("/export")
+@jwt_required()
+def export_history():
+    args = export_schema.load(request.args)
+
+    user_id = get_jwt_identity()
+    history_writer.wait_for_user(user_id)
+
+    fmt = args["format"]
+    compress = args["gzip"]
+    filename = f"history-{datetime.utcnow():%Y%m%d}.{fmt}" + (".gz" if compress else "")
+    # 查询在生成器第一次迭代时才执行，逐批从游标读取，不会把全部记录读进内存
+    rows = history_exporter.rows(user_id, args["date_from"], args["date_to"], args["subject"])
+
+    return Response(
+        stream_with_context(history_exporter.stream(rows, fmt, compress)),
+        mimetype="application/gzip" if compress else MIMETYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-cache",
+        },
+    )
+
+
 @bp.post("")
 @jwt_required()
 def create_history():
@@ -69,8 +152,7 @@ def create_history():
         parse_result=parse_result,
         solution=solution,
     )
-    db.session.add(record)
-    db.session.commit()
+    history_writer.save(record)
 
     return jsonify({"success": True, "data": {"record": record.to_dict()}}), 201
 
@@ -79,6 +161,7 @@ def create_history():
 @jwt_required()
 def get_history(record_id: str):
     user_id = get_jwt_identity()
+    history_writer.wait_for_user(user_id)
 
     record = History.query.filter_by(id=record_id, user_id=user_id).first()
     if not record:
@@ -91,6 +174,7 @@ def get_history(record_id: str):
 @jwt_required()
 def delete_history(record_id: str):
     user_id = get_jwt_identity()
+    history_writer.wait_for_user(user_id)
 
     record = History.query.filter_by(id=record_id, user_id=user_id).first()
     if not record:
@@ -106,8 +190,13 @@ def delete_history(record_id: str):
 @jwt_required()
 def clear_history():
     user_id = get_jwt_identity()
+    history_writer.wait_for_user(user_id)
 
+    QuestionSignature.delete_user(user_id)
     History.query.filter_by(user_id=user_id).delete()
+    # 批量删除不经过 ORM 的 flush 事件，计数和搜索文本需要单独处理
+    HistoryCount.reset(user_id)
+    HistorySearch.delete_user(user_id)
     db.session.commit()
 
     return jsonify({"success": True, "message": "清空历史记录成功"})
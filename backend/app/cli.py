@@ -0,0 +1,17 @@
+"""Flask CLI commands."""
+
+from __future__ import annotations
+
+import click
+
+from app.services.cache_service import caches
+
+
+def register_cli(app):
+    @app.cli.command("clear-cache")
+    @click.argument("namespace", required=False, type=click.Choice(sorted(caches)))
+    def clear_cache(namespace: str | None):
+        """Drop cached model results (all namespaces by default)."""
+        for name in [namespace] if namespace else sorted(caches):
+            removed = caches[name].invalidate()
+            click.echo(f"{name}: 已清除 {removed} 条")
@@ -24,6 +24,24 @@ def _to_int(value: str, default: int) -> int:
         return default
 
 
+def _to_float(value: str, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _sqlite_engine_options(database_uri: str) -> dict:
+    if not database_uri.startswith("sqlite:") or database_uri in {"sqlite://", "sqlite:///:memory:"}:
+        return {}
+    # 文件库使用 QueuePool；SQLite 同一时刻只有一个写者，连接数够用即可，等待连接的时间与 busy_timeout 相当
+    return {
+        "pool_size": _to_int(os.getenv("SQLITE_POOL_SIZE"), 10),
+        "max_overflow": _to_int(os.getenv("SQLITE_POOL_MAX_OVERFLOW"), 10),
+        "pool_timeout": _to_int(os.getenv("SQLITE_POOL_TIMEOUT"), 30),
+    }
+
+
 class Config:
     FLASK_ENV = os.getenv("FLASK_ENV", os.getenv("NODE_ENV", "development"))
     DEBUG = FLASK_ENV == "development"
@@ -33,6 +51,16 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv(
         "DATABASE_URL", f"sqlite:///{BASE_DIR / 'data' / 'app.db'}"
     )
+    SQLALCHEMY_ENGINE_OPTIONS = _sqlite_engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # SQLite 生产参数，每个新连接执行一次：WAL 让读写互不阻塞，synchronous=NORMAL 在 WAL 下只在检查点时 fsync，
+    # busy_timeout 让并发写等待锁而不是立即报 database is locked
+    SQLITE_PRAGMAS_ENABLED = _to_bool(os.getenv("SQLITE_PRAGMAS_ENABLED"), True)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = _to_int(os.getenv("SQLITE_BUSY_TIMEOUT_MS"), 10000)
+    SQLITE_CACHE_SIZE_KB = _to_int(os.getenv("SQLITE_CACHE_SIZE_KB"), 32768)
+    SQLITE_MMAP_SIZE = _to_int(os.getenv("SQLITE_MMAP_SIZE"), 256 * 1024 * 1024)
 
     JWT_SECRET_KEY = os.getenv("JWT_SECRET", "ai-learning-assistant-secret-key")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=7)
@@ -62,11 +90,106 @@ class Config:
     CHATGLM_ENABLE_THINKING = DEEPSEEK_ENABLE_THINKING
 
     REQUEST_TIMEOUT = _to_int(os.getenv("REQUEST_TIMEOUT"), 120)
+
+    # 上游模型调用的共享连接池（每个 worker 一个）。REQUEST_TIMEOUT 作为读超时。
+    UPSTREAM_POOL_CONNECTIONS = _to_int(os.getenv("UPSTREAM_POOL_CONNECTIONS"), 4)
+    UPSTREAM_POOL_MAXSIZE = _to_int(os.getenv("UPSTREAM_POOL_MAXSIZE"), 10)
+    UPSTREAM_POOL_BLOCK = _to_bool(os.getenv("UPSTREAM_POOL_BLOCK"), False)
+    UPSTREAM_KEEPALIVE = _to_bool(os.getenv("UPSTREAM_KEEPALIVE"), True)
+    UPSTREAM_CONNECT_TIMEOUT = _to_int(os.getenv("UPSTREAM_CONNECT_TIMEOUT"), 5)
+    UPSTREAM_WARMUP = _to_bool(os.getenv("UPSTREAM_WARMUP"), True)
+    # /api/metrics 暴露进程号、上游地址和各缓存、队列的内部状态：留空时接口关闭（返回 404），
+    # 设置后请求需在 X-Metrics-Token 头中带上相同的值
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    # 题目解析结果缓存：进程内 LRU + 数据库持久层，TTL 单位为秒
+    PARSE_CACHE_ENABLED = _to_bool(os.getenv("PARSE_CACHE_ENABLED"), True)
+    PARSE_CACHE_MAX_ENTRIES = _to_int(os.getenv("PARSE_CACHE_MAX_ENTRIES"), 2000)
+    PARSE_CACHE_TTL_SECONDS = _to_int(os.getenv("PARSE_CACHE_TTL_SECONDS"), 30 * 24 * 3600)
+    PARSE_CACHE_DB_MAX_ENTRIES = _to_int(os.getenv("PARSE_CACHE_DB_MAX_ENTRIES"), 100000)
+
+    # 解答缓存：键包含规范化题目、解析结果、模型、推理设置和提示词版本
+    SOLUTION_CACHE_ENABLED = _to_bool(os.getenv("SOLUTION_CACHE_ENABLED"), True)
+    SOLUTION_CACHE_MAX_ENTRIES = _to_int(os.getenv("SOLUTION_CACHE_MAX_ENTRIES"), 500)
+    SOLUTION_CACHE_TTL_SECONDS = _to_int(os.getenv("SOLUTION_CACHE_TTL_SECONDS"), 30 * 24 * 3600)
+    SOLUTION_CACHE_DB_MAX_ENTRIES = _to_int(os.getenv("SOLUTION_CACHE_DB_MAX_ENTRIES"), 50000)
+
+    # 图片识别缓存：按解码后图片内容的哈希命中，进程内 LRU + 本地磁盘目录
+    OCR_CACHE_ENABLED = _to_bool(os.getenv("OCR_CACHE_ENABLED"), True)
+    OCR_CACHE_MAX_ENTRIES = _to_int(os.getenv("OCR_CACHE_MAX_ENTRIES"), 500)
+    OCR_CACHE_TTL_SECONDS = _to_int(os.getenv("OCR_CACHE_TTL_SECONDS"), 7 * 24 * 3600)
+    OCR_CACHE_DISK_MAX_ENTRIES = _to_int(os.getenv("OCR_CACHE_DISK_MAX_ENTRIES"), 20000)
+    OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", str(BASE_DIR / "data" / "cache" / "ocr"))
+
+    # 识别前的图片预处理（需要 Pillow）：按 EXIF 方向摆正，长边缩到 IMAGE_PREPROCESS_MAX_EDGE 像素，
+    # 可选转灰度和自动对比度，再以 JPEG 重新编码；在独立的线程池中执行
+    IMAGE_PREPROCESS_ENABLED = _to_bool(os.getenv("IMAGE_PREPROCESS_ENABLED"), True)
+    IMAGE_PREPROCESS_MAX_EDGE = _to_int(os.getenv("IMAGE_PREPROCESS_MAX_EDGE"), 1600)
+    # 像素数（宽×高）超过此值的图片不做预处理，直接交给视觉模型，避免解码时占用大量内存
+    IMAGE_PREPROCESS_MAX_PIXELS = _to_int(os.getenv("IMAGE_PREPROCESS_MAX_PIXELS"), 50 * 1000 * 1000)
+    IMAGE_PREPROCESS_GRAYSCALE = _to_bool(os.getenv("IMAGE_PREPROCESS_GRAYSCALE"), True)
+    IMAGE_PREPROCESS_AUTOCONTRAST = _to_bool(os.getenv("IMAGE_PREPROCESS_AUTOCONTRAST"), True)
+    IMAGE_PREPROCESS_QUALITY = _to_int(os.getenv("IMAGE_PREPROCESS_QUALITY"), 85)
+    IMAGE_PREPROCESS_WORKERS = _to_int(os.getenv("IMAGE_PREPROCESS_WORKERS"), 2)
+
+    # 推测执行：识别出题目后立即用本地启发式字段开始解答，同时并行调用模型解析；
+    # 模型解析结果中 PIPELINE_SPECULATIVE_RESOLVE_ON 列出的字段与启发式不一致时重新解答（留空则从不重解）
+    PIPELINE_SPECULATIVE = _to_bool(os.getenv("PIPELINE_SPECULATIVE"), False)
+    PIPELINE_SPECULATIVE_RESOLVE_ON = os.getenv("PIPELINE_SPECULATIVE_RESOLVE_ON", "type,subject")
+    PIPELINE_MAX_WORKERS = _to_int(os.getenv("PIPELINE_MAX_WORKERS"), 16)
+
+    # 合并同一 worker 内并发的相同 OCR/解析/解答请求，流式解答共享同一条上游流
+    SINGLE_FLIGHT_ENABLED = _to_bool(os.getenv("SINGLE_FLIGHT_ENABLED"), True)
+
+    # 近似重复题目：识别出的题目与历史记录中某道题的字符 3-gram Jaccard 相似度不低于 DEDUP_THRESHOLD
+    # 且数字完全一致时，不再调用模型。off 关闭；offer 把已有解答交给前端确认；serve 直接作为本次结果返回。
+    # serve 只直接返回与本题仅差空白和标点的记录，其余仍按 offer 处理；只改一个关键字（如“正确”改为“错误”）
+    # 的两道题相似度也可能超过 0.9，serve 模式下阈值应接近 1.0
+    DEDUP_MODE = os.getenv("DEDUP_MODE", "off").strip().lower()
+    DEDUP_THRESHOLD = _to_float(os.getenv("DEDUP_THRESHOLD"), 0.9)
+
+    # 批量解题：单次题目上限、请求体上限、全局线程池大小、每个用户同时执行的题目数。
+    # 请求体在同步 worker 中整体解析，上限不宜过大；默认约容得下 5 张最大尺寸的 base64 图片
+    BATCH_MAX_ITEMS = _to_int(os.getenv("BATCH_MAX_ITEMS"), 50)
+    BATCH_MAX_CONTENT_LENGTH = _to_int(os.getenv("BATCH_MAX_CONTENT_LENGTH"), 32 * 1024 * 1024)
+    BATCH_MAX_WORKERS = _to_int(os.getenv("BATCH_MAX_WORKERS"), 8)
+    BATCH_PER_USER_CONCURRENCY = _to_int(os.getenv("BATCH_PER_USER_CONCURRENCY"), 3)
+
+    # 历史记录延迟写入：请求只把记录放入进程内队列，由后台线程每 BATCH_SIZE 条或每 INTERVAL_MS 毫秒提交一次；
+    # 队列超过 MAX_QUEUE 条时退回同步写入
+    HISTORY_WRITE_BEHIND = _to_bool(os.getenv("HISTORY_WRITE_BEHIND"), False)
+    HISTORY_WRITE_BEHIND_BATCH_SIZE = _to_int(os.getenv("HISTORY_WRITE_BEHIND_BATCH_SIZE"), 50)
+    HISTORY_WRITE_BEHIND_INTERVAL_MS = _to_int(os.getenv("HISTORY_WRITE_BEHIND_INTERVAL_MS"), 200)
+    HISTORY_WRITE_BEHIND_MAX_QUEUE = _to_int(os.getenv("HISTORY_WRITE_BEHIND_MAX_QUEUE"), 10000)
+
+    # 历史记录 parse_result/solution 的压缩存储：off / zlib / zstd（需安装 zstandard）。
+    # 序列化后不足 COMPRESS_MIN_BYTES 字节的值仍存 JSON 文本；LEVEL 留空时 zlib 取 6、zstd 取 3
+    HISTORY_JSON_COMPRESSION = os.getenv("HISTORY_JSON_COMPRESSION", "zlib").strip().lower()
+    HISTORY_JSON_COMPRESSION_LEVEL = _to_int(os.getenv("HISTORY_JSON_COMPRESSION_LEVEL"), 0)
+    HISTORY_JSON_COMPRESS_MIN_BYTES = _to_int(os.getenv("HISTORY_JSON_COMPRESS_MIN_BYTES"), 256)
+
+    # 在响应头 Server-Timing 中报告 ocr/parse/solve/db 各阶段耗时，供压测和排查使用
+    SERVER_TIMING_ENABLED = _to_bool(os.getenv("SERVER_TIMING_ENABLED"), False)
+
     MAX_IMAGE_SIZE = _to_int(os.getenv("MAX_IMAGE_SIZE"), 5 * 1024 * 1024)
+    # 单个请求体上限，超过时在读取请求体之前直接返回 413；默认容得下一张 base64 编码的最大图片
+    MAX_CONTENT_LENGTH = _to_int(os.getenv("MAX_CONTENT_LENGTH"), MAX_IMAGE_SIZE * 4 // 3 + 1024 * 1024)
 
+    # 限流：携带有效 JWT 时按用户、否则按客户端 IP 计数，每个窗口内可消耗 RATE_LIMIT_MAX_REQUESTS 点额度；
+    # 每次请求按 RATE_LIMIT_COSTS 中的路由扣除（未列出的路由扣 1 点）
     RATE_LIMIT_WINDOW_MS = _to_int(os.getenv("RATE_LIMIT_WINDOW_MS"), 60000)
     RATE_LIMIT_MAX_REQUESTS = _to_int(os.getenv("RATE_LIMIT_MAX_REQUESTS"), 30)
     RATE_LIMIT_WINDOW_SECONDS = max(1, RATE_LIMIT_WINDOW_MS // 1000)
+    RATE_LIMIT_COSTS = os.getenv(
+        "RATE_LIMIT_COSTS",
+        "/api/solve-problem=3,/api/solve-problem-stream=3,/api/solve-batch=10,"
+        "/api/recognize=2,/api/solve=2,/api/solve-stream=2",
+    )
+    # 计数存储：sqlite:// 保存在本机文件中，所有 gunicorn worker 共享同一份计数；
+    # memory:// 为每个进程各自计数（多 worker 时实际上限会乘以 worker 数），也可使用 redis://
+    RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", f"sqlite:///{BASE_DIR / 'data' / 'ratelimit.db'}")
+    # 应用前面的反向代理层数（nginx.conf 部署为 1），用于从 X-Forwarded-For 取真实客户端 IP；
+    # 直接对外提供服务时必须为 0，否则客户端可以伪造该请求头绕过限流
+    TRUSTED_PROXY_COUNT = _to_int(os.getenv("TRUSTED_PROXY_COUNT"), 0)
 
     CORS_ORIGIN = os.getenv("CORS_ORIGIN", "http://localhost:8080")
 
@@ -84,6 +207,7 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLALCHEMY_ENGINE_OPTIONS = {}
 
 
 config = {
@@ -1,23 +1,58 @@
 """Flask extensions initialization."""
 
+import sqlite3
+
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from flask_sqlalchemy import SQLAlchemy
 from marshmallow import ValidationError
 from marshmallow import Schema
+from sqlalchemy import event
+
+from app.utils.rate_limit import rate_limit_cost, rate_limit_key
 
 
 db = SQLAlchemy()
 jwt = JWTManager()
 limiter = Limiter(
-    key_func=get_remote_address,
+    key_func=rate_limit_key,
+    default_limits_cost=rate_limit_cost,
     headers_enabled=True,
 )
 cors = CORS()
 
 
+def register_sqlite_pragmas(app) -> None:
+    """在应用创建的每个 SQLite 连接上执行 SQLITE_* 配置的 PRAGMA，须在首次连接数据库之前调用。"""
+    config = app.config
+    if not config.get("SQLITE_PRAGMAS_ENABLED", True):
+        return
+
+    pragmas = [
+        f"PRAGMA journal_mode={config.get('SQLITE_JOURNAL_MODE', 'WAL')}",
+        f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 10000))}",
+        # 负数表示以 KiB 为单位
+        f"PRAGMA cache_size={-int(config.get('SQLITE_CACHE_SIZE_KB', 32768))}",
+        f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 0))}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+    def apply_pragmas(dbapi_connection, _connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, "connect", apply_pragmas)
+
+
 class MarshmallowCompat:
     """Lightweight compatibility layer used by this project."""
 
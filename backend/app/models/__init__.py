@@ -1,6 +1,10 @@
 """Database models."""
 
+from .cache_entry import CacheEntry
 from .history import History
+from .history_count import HistoryCount
+from .history_search import HistorySearch
+from .question_signature import QuestionSignature
 from .user import User
 
-__all__ = ["User", "History"]
+__all__ = ["User", "History", "HistoryCount", "HistorySearch", "QuestionSignature", "CacheEntry"]
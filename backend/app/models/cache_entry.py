@@ -0,0 +1,18 @@
+"""Persistent cache tier for model results."""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from app.extensions import db
+
+
+class CacheEntry(db.Model):
+    __tablename__ = "cache_entries"
+
+    key = db.Column(db.String(64), primary_key=True)
+    namespace = db.Column(db.String(32), nullable=False, index=True)
+    version = db.Column(db.String(32), nullable=False, default="")
+    value = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
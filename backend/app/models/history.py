@@ -5,31 +5,90 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
+from sqlalchemy import event, func
+
 from app.extensions import db
+from app.models.types import CompressedJSON
+
+# 列表摘要中题目截取的字符数
+SUMMARY_QUESTION_LENGTH = 100
 
 
 class History(db.Model):
     __tablename__ = "histories"
+    # 列表按 (created_at, id) 倒序做键集分页，复合索引同时覆盖按用户过滤
+    __table_args__ = (db.Index("ix_histories_user_created_id", "user_id", "created_at", "id"),)
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False)
     username = db.Column(db.String(64), nullable=True)
     question = db.Column(db.Text, nullable=False)
-    parse_result = db.Column(db.JSON, nullable=False)
-    solution = db.Column(db.JSON, nullable=False)
+    # 从 parse_result 冗余出来供列表展示。列表用到的列都放在 JSON 大字段之前，
+    # SQLite 读取摘要时不必沿着大字段的溢出页向后找
+    subject = db.Column(db.String(64), nullable=True)
+    difficulty = db.Column(db.String(32), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # 解答含大段 Markdown 和 LaTeX，较大的值压缩存储，见 CompressedJSON
+    parse_result = db.Column(CompressedJSON, nullable=False)
+    solution = db.Column(CompressedJSON, nullable=False)
 
     user = db.relationship("User", backref=db.backref("histories", lazy=True, cascade="all,delete-orphan"))
 
     def to_dict(self) -> dict:
+        return self.record_to_dict(self)
+
+    @classmethod
+    def record_columns(cls) -> tuple:
+        """完整记录用到的列，按列查询时不经过 identity map，适合一次读取大量记录。"""
+        return (cls.id, cls.user_id, cls.username, cls.question, cls.parse_result, cls.solution, cls.created_at)
+
+    @classmethod
+    def record_to_dict(cls, row) -> dict:
         return {
-            "id": self.id,
-            "userId": self.user_id,
-            "username": self.username,
-            "question": self.question,
-            "parseResult": self.parse_result,
-            "solution": self.solution,
-            "createdAt": self._to_iso(self.created_at),
+            "id": row.id,
+            "userId": row.user_id,
+            "username": row.username,
+            "question": row.question,
+            "parseResult": row.parse_result,
+            "solution": row.solution,
+            "createdAt": cls._to_iso(row.created_at),
+        }
+
+    @classmethod
+    def summary_columns(cls) -> tuple:
+        """列表摘要只查询这些列，parse_result 和 solution 不会被读取。"""
+        return (
+            cls.id,
+            func.substr(cls.question, 1, SUMMARY_QUESTION_LENGTH).label("question"),
+            (func.length(cls.question) > SUMMARY_QUESTION_LENGTH).label("question_truncated"),
+            cls.subject,
+            cls.difficulty,
+            cls.created_at,
+        )
+
+    @classmethod
+    def summary_to_dict(cls, row) -> dict:
+        return {
+            "id": row.id,
+            "question": row.question,
+            "questionTruncated": bool(row.question_truncated),
+            "subject": row.subject,
+            "difficulty": row.difficulty,
+            "createdAt": cls._to_iso(row.created_at),
+        }
+
+    def sync_parse_fields(self) -> None:
+        fields = self.parse_fields(self.parse_result)
+        self.subject = fields["subject"]
+        self.difficulty = fields["difficulty"]
+
+    @staticmethod
+    def parse_fields(parse_result) -> dict:
+        """从 parse_result 冗余出来的列；绕过 ORM 批量插入时需要自己填上。"""
+        parse_result = parse_result if isinstance(parse_result, dict) else {}
+        return {
+            "subject": _short_text(parse_result.get("subject"), 64),
+            "difficulty": _short_text(parse_result.get("difficulty"), 32),
         }
 
     @staticmethod
@@ -37,3 +96,16 @@ class History(db.Model):
         if value is None:
             return None
         return value.isoformat(timespec="milliseconds") + "Z"
+
+
+def _short_text(value, max_length: int) -> str | None:
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = str(value).strip()
+    return text[:max_length] or None
+
+
+@event.listens_for(History, "before_insert")
+@event.listens_for(History, "before_update")
+def _sync_parse_fields(_mapper, _connection, target: History) -> None:
+    target.sync_parse_fields()
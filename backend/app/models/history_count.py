@@ -0,0 +1,80 @@
+"""Per-user history record counts, maintained incrementally."""
+
+from __future__ import annotations
+
+from collections import Counter
+
+from sqlalchemy import delete, event, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.history import History
+
+
+class HistoryCount(db.Model):
+    """每个用户的历史记录条数，代替分页时的 COUNT(*) 扫描。
+
+    行在第一次读取时按现有记录回填，此后随 ORM 的插入和删除在同一事务内增减；
+    绕过 ORM 的批量删除需要调用 :meth:`reset`，批量插入需要调用 :meth:`invalidate`。
+    """
+
+    __tablename__ = "history_counts"
+
+    user_id = db.Column(db.String(36), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def for_user(cls, user_id: str) -> int:
+        table = cls.__table__
+        current = select(table.c.count).where(table.c.user_id == user_id)
+        count = db.session.execute(current).scalar_one_or_none()
+        if count is not None:
+            return count
+
+        histories = History.__table__
+        backfill = insert(table).from_select(
+            ["user_id", "count"],
+            select(literal(user_id), func.count()).select_from(histories).where(histories.c.user_id == user_id),
+        )
+        try:
+            # 单条语句统计并写入，不会漏掉统计与写入之间提交的记录
+            db.session.execute(backfill)
+            db.session.commit()
+        except IntegrityError:
+            # 其他请求已经回填
+            db.session.rollback()
+        return db.session.execute(current).scalar_one()
+
+    @classmethod
+    def reset(cls, user_id: str) -> None:
+        """批量删除某个用户的全部记录后调用，与删除在同一事务中提交。"""
+        table = cls.__table__
+        db.session.execute(update(table).where(table.c.user_id == user_id).values(count=0))
+
+    @classmethod
+    def invalidate(cls, user_ids) -> None:
+        """绕过 ORM 为这些用户批量插入记录时调用，删除计数行，下次读取时重新统计。"""
+        table = cls.__table__
+        db.session.execute(delete(table).where(table.c.user_id.in_(list(user_ids))))
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_history_count_deltas(session: Session, _flush_context) -> None:
+    # after_flush 时 new/deleted 仍是本次 flush 之前的状态
+    deltas: Counter = Counter()
+    for obj in session.new:
+        if isinstance(obj, History):
+            deltas[obj.user_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, History):
+            deltas[obj.user_id] -= 1
+
+    table = HistoryCount.__table__
+    connection = session.connection()
+    for user_id, delta in deltas.items():
+        if delta:
+            # 尚未回填的用户没有计数行，更新不到任何行，首次读取时再统计
+            connection.execute(
+                update(table).where(table.c.user_id == user_id).values(count=table.c.count + delta)
+            )
@@ -0,0 +1,250 @@
+"""Full-text search over history records (SQLite FTS5 with the trigram tokenizer)."""
+
+from __future__ import annotations
+
+import json
+
+from flask import current_app
+from sqlalchemy import column, delete, event, exists, func, insert, literal_column, or_, select, table, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.history import History
+
+# trigram 分词按 3 个字符切分，短于 3 个字符的词无法走索引
+MIN_TERM_LENGTH = 3
+# bm25 的列权重：题目、知识点、答案与总结
+BM25_WEIGHTS = (3.0, 2.0, 1.0)
+BACKFILL_CHUNK = 1000
+
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE history_fts USING fts5("
+    "question, knowledge, solution, content='history_search', content_rowid='id', tokenize='trigram')"
+)
+FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS history_search_ai AFTER INSERT ON history_search BEGIN
+        INSERT INTO history_fts (rowid, question, knowledge, solution)
+        VALUES (new.id, new.question, new.knowledge, new.solution);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS history_search_ad AFTER DELETE ON history_search BEGIN
+        INSERT INTO history_fts (history_fts, rowid, question, knowledge, solution)
+        VALUES ('delete', old.id, old.question, old.knowledge, old.solution);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS history_search_au AFTER UPDATE ON history_search BEGIN
+        INSERT INTO history_fts (history_fts, rowid, question, knowledge, solution)
+        VALUES ('delete', old.id, old.question, old.knowledge, old.solution);
+        INSERT INTO history_fts (rowid, question, knowledge, solution)
+        VALUES (new.id, new.question, new.knowledge, new.solution);
+    END
+    """,
+)
+
+_fts = table("history_fts", column("rowid"))
+
+# 这些字段变化时需要更新搜索文本
+_INDEXED_ATTRIBUTES = ("question", "parse_result", "solution")
+
+
+class HistorySearch(db.Model):
+    """每条历史记录的可搜索文本，同时作为 FTS5 索引 ``history_fts`` 的外部内容表。
+
+    文本在 Python 中从 ORM 对象提取，随插入、修改和删除在同一事务内维护；``history_fts``
+    由本表上的触发器同步。绕过 ORM 的批量删除需要调用 :meth:`delete_user`，
+    绕过 ORM 的批量插入在下次启动时由 :func:`ensure_search_index` 补齐。
+    """
+
+    __tablename__ = "history_search"
+
+    # 显式整数主键作为 FTS rowid，VACUUM 不会改变它
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    history_id = db.Column(db.String(36), nullable=False, unique=True)
+    user_id = db.Column(db.String(36), nullable=False, index=True)
+    question = db.Column(db.Text, nullable=False, default="")
+    knowledge = db.Column(db.Text, nullable=False, default="")
+    solution = db.Column(db.Text, nullable=False, default="")
+
+    @staticmethod
+    def document(question, parse_result, solution) -> dict:
+        """提取一条记录的搜索文本：题目、知识点，以及解答中的答案和总结。"""
+        parse_result = parse_result if isinstance(parse_result, dict) else {}
+        solution = solution if isinstance(solution, dict) else {}
+        points = parse_result.get("knowledgePoints")
+        if not isinstance(points, list):
+            points = [points]
+        return {
+            "question": str(question or ""),
+            "knowledge": " ".join(_plain_text(point) for point in points if point),
+            "solution": "\n".join(
+                _plain_text(solution.get(key)) for key in ("answer", "summary") if solution.get(key)
+            ),
+        }
+
+    @classmethod
+    def delete_user(cls, user_id: str) -> None:
+        """批量删除某个用户的全部记录时调用，与删除在同一事务中提交。"""
+        db.session.execute(delete(cls.__table__).where(cls.__table__.c.user_id == user_id))
+
+    @classmethod
+    def search(cls, user_id: str, query: str, limit: int, offset: int = 0) -> list:
+        """按相关度返回该用户匹配的记录摘要（``History.summary_columns`` 的行）。
+
+        多个词之间是“且”的关系。不短于 3 个字符的词走 FTS5 并按 bm25 排序，更短的词只在匹配结果上
+        再做子串过滤；全部是短词（或 FTS5 不可用）时在该用户自己的记录里做子串匹配，按时间倒序。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        indexed = [term for term in terms if len(term) >= MIN_TERM_LENGTH] if _fts_available() else []
+        filters = [
+            or_(
+                cls.question.contains(term, autoescape=True),
+                cls.knowledge.contains(term, autoescape=True),
+                cls.solution.contains(term, autoescape=True),
+            )
+            for term in terms
+            if term not in indexed
+        ]
+        statement = select(*History.summary_columns()).select_from(History).join(cls, cls.history_id == History.id)
+        if indexed:
+            # 每个词作为短语，trigram 下即“包含该子串”；引号转义后用户输入不会被解析成 FTS 语法
+            match = " AND ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+            statement = (
+                statement.join(_fts, _fts.c.rowid == cls.id)
+                .where(
+                    literal_column("history_fts").op("MATCH")(match),
+                    # 一元 + 让 SQLite 不走 user_id 索引，否则它会逐条取出该用户的记录再分别执行 MATCH
+                    literal_column("+history_search.user_id") == user_id,
+                    *filters,
+                )
+                .order_by(func.bm25(literal_column("history_fts"), *BM25_WEIGHTS), History.created_at.desc())
+            )
+        else:
+            statement = statement.where(cls.user_id == user_id, *filters).order_by(
+                History.created_at.desc(), History.id.desc()
+            )
+        return db.session.execute(statement.limit(limit).offset(offset)).all()
+
+
+def _plain_text(value) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+# engine.url -> 是否已建立 history_fts
+_FTS_STATE: dict = {}
+
+
+def _fts_available() -> bool:
+    return _FTS_STATE.get(db.engine.url, False)
+
+
+def ensure_search_index() -> bool:
+    """建立 FTS5 表和触发器，并为尚无搜索文本的历史记录补齐，需在应用上下文中调用。
+
+    返回 FTS5 是否可用；不可用时（非 SQLite，或 SQLite 未编译 FTS5/trigram）搜索退回子串匹配。
+    """
+    engine = db.engine
+    available = False
+    if engine.dialect.name == "sqlite":
+        try:
+            with engine.begin() as conn:
+                created = not conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'")
+                ).first()
+                if created:
+                    conn.execute(text(FTS_DDL))
+                for trigger in FTS_TRIGGERS:
+                    conn.execute(text(trigger))
+                if created:
+                    # 搜索表中已有数据时（例如 FTS5 之前不可用）重建索引
+                    conn.execute(text("INSERT INTO history_fts (history_fts) VALUES ('rebuild')"))
+            available = True
+        except OperationalError as exc:
+            current_app.logger.warning("FTS5 trigram 不可用，历史搜索退回子串匹配: %s", exc)
+    _FTS_STATE[engine.url] = available
+
+    search = HistorySearch.__table__
+    histories = History.__table__
+    # 清理记录已被删除的搜索行
+    db.session.execute(delete(search).where(~exists().where(histories.c.id == search.c.history_id)))
+    db.session.commit()
+
+    columns = select(History.id, History.user_id, History.question, History.parse_result, History.solution)
+    missing = columns.where(~exists().where(search.c.history_id == History.id)).order_by(History.id)
+    last_id = None
+    while True:
+        # 按主键向后推进，每批不必从头跳过已有搜索文本的记录
+        chunk = missing if last_id is None else missing.where(History.id > last_id)
+        rows = db.session.execute(chunk.limit(BACKFILL_CHUNK)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        try:
+            db.session.execute(
+                insert(search),
+                [
+                    {
+                        "history_id": row.id,
+                        "user_id": row.user_id,
+                        **HistorySearch.document(row.question, row.parse_result, row.solution),
+                    }
+                    for row in rows
+                ],
+            )
+            db.session.commit()
+        except IntegrityError:
+            # 另一个进程正在补齐
+            db.session.rollback()
+            break
+    return available
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_history_search(session: Session, _flush_context) -> None:
+    # after_flush 时 new/dirty/deleted 和属性的修改历史仍是本次 flush 之前的状态
+    inserted, updated, deleted = [], [], []
+    for obj in session.new:
+        if isinstance(obj, History):
+            inserted.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, History) and obj not in session.deleted:
+            state = db.inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _INDEXED_ATTRIBUTES):
+                updated.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, History):
+            deleted.append(obj.id)
+
+    if not (inserted or updated or deleted):
+        return
+
+    table = HistorySearch.__table__
+    connection = session.connection()
+    if deleted:
+        connection.execute(delete(table).where(table.c.history_id.in_(deleted)))
+    if inserted:
+        connection.execute(
+            insert(table),
+            [
+                {
+                    "history_id": obj.id,
+                    "user_id": obj.user_id,
+                    **HistorySearch.document(obj.question, obj.parse_result, obj.solution),
+                }
+                for obj in inserted
+            ],
+        )
+    for obj in updated:
+        connection.execute(
+            update(table)
+            .where(table.c.history_id == obj.id)
+            .values(**HistorySearch.document(obj.question, obj.parse_result, obj.solution))
+        )
@@ -0,0 +1,123 @@
+"""MinHash LSH band keys of history questions, used to find near-duplicate problems."""
+
+from __future__ import annotations
+
+from sqlalchemy import delete, event, exists, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models.history import History
+from app.utils.minhash import band_keys
+
+BACKFILL_CHUNK = 1000
+
+
+class QuestionSignature(db.Model):
+    """每条历史记录题目的 LSH 段键，每段一列、各自建索引（段数即 ``minhash.NUM_BANDS``）。
+
+    相似题目至少有一段键相同，查找时对 8 个索引各做一次等值查找即可，不需要在进程内常驻索引，
+    各 worker 也能立即看到彼此写入的记录。段键随 ORM 的插入、修改和删除在同一事务内维护；
+    绕过 ORM 的批量删除需要调用 :meth:`delete_user`，批量插入由 :func:`ensure_question_signatures` 补齐。
+    """
+
+    __tablename__ = "question_signatures"
+
+    history_id = db.Column(db.String(36), primary_key=True)
+    band_0 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_1 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_2 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_3 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_4 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_5 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_6 = db.Column(db.BigInteger, nullable=False, index=True)
+    band_7 = db.Column(db.BigInteger, nullable=False, index=True)
+
+    @staticmethod
+    def band_values(question: str) -> dict | None:
+        keys = band_keys(question)
+        if keys is None:
+            return None
+        return {f"band_{band}": key for band, key in enumerate(keys)}
+
+    @classmethod
+    def band_columns(cls) -> list:
+        return [column for column in cls.__table__.c if column.name.startswith("band_")]
+
+    @classmethod
+    def delete_user(cls, user_id: str) -> None:
+        """批量删除某个用户的全部记录之前调用，与删除在同一事务中提交。"""
+        table = cls.__table__
+        histories = History.__table__
+        db.session.execute(
+            delete(table).where(
+                table.c.history_id.in_(select(histories.c.id).where(histories.c.user_id == user_id))
+            )
+        )
+
+
+def ensure_question_signatures() -> None:
+    """为尚无段键的历史记录补齐，并清理记录已被删除的段键，需在应用上下文中调用。"""
+    table = QuestionSignature.__table__
+    histories = History.__table__
+    db.session.execute(delete(table).where(~exists().where(histories.c.id == table.c.history_id)))
+    db.session.commit()
+
+    missing = (
+        select(History.id, History.question)
+        .where(~exists().where(table.c.history_id == History.id))
+        .order_by(History.id)
+    )
+    last_id = None
+    while True:
+        # 按主键向后推进，每批不必从头跳过已有段键的记录
+        chunk = missing if last_id is None else missing.where(History.id > last_id)
+        rows = db.session.execute(chunk.limit(BACKFILL_CHUNK)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        values = []
+        for row in rows:
+            bands = QuestionSignature.band_values(row.question)
+            if bands is not None:
+                values.append({"history_id": row.id, **bands})
+        if not values:
+            continue
+        try:
+            db.session.execute(insert(table), values)
+            db.session.commit()
+        except IntegrityError:
+            # 另一个进程正在补齐
+            db.session.rollback()
+            break
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_question_signatures(session: Session, _flush_context) -> None:
+    # after_flush 时 new/dirty/deleted 和属性的修改历史仍是本次 flush 之前的状态
+    inserted, updated, deleted = [], [], []
+    for obj in session.new:
+        if isinstance(obj, History):
+            inserted.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, History) and obj not in session.deleted:
+            if db.inspect(obj).attrs.question.history.has_changes():
+                updated.append(obj)
+    for obj in session.deleted:
+        if isinstance(obj, History):
+            deleted.append(obj.id)
+
+    if not (inserted or updated or deleted):
+        return
+
+    table = QuestionSignature.__table__
+    connection = session.connection()
+    if deleted or updated:
+        connection.execute(delete(table).where(table.c.history_id.in_(deleted + [obj.id for obj in updated])))
+    values = []
+    for obj in inserted + updated:
+        bands = QuestionSignature.band_values(obj.question)
+        if bands is not None:
+            values.append({"history_id": obj.id, **bands})
+    if values:
+        connection.execute(insert(table), values)
@@ -0,0 +1,46 @@
+"""In-place upgrades for databases created by an older version of the models."""
+
+from __future__ import annotations
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.extensions import db
+
+# 给已有表新增列后执行的回填语句。压缩存储的 JSON 是 BLOB，json_* 函数只能用于文本值
+COLUMN_BACKFILLS = {
+    ("histories", "subject"): (
+        "UPDATE histories SET subject = substr(trim(json_extract(parse_result, '$.subject')), 1, 64) "
+        "WHERE CASE WHEN typeof(parse_result) = 'text' THEN json_type(parse_result, '$.subject') END "
+        "IN ('text', 'integer', 'real')"
+    ),
+    ("histories", "difficulty"): (
+        "UPDATE histories SET difficulty = substr(trim(json_extract(parse_result, '$.difficulty')), 1, 32) "
+        "WHERE CASE WHEN typeof(parse_result) = 'text' THEN json_type(parse_result, '$.difficulty') END "
+        "IN ('text', 'integer', 'real')"
+    ),
+}
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """create_all 只会创建缺失的表，这里为已有的表补上后来新增的列和索引。
+
+    新增的列只能是可空列；补列后按 ``COLUMN_BACKFILLS`` 回填已有数据。
+    """
+    inspector = inspect(engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        if missing:
+            with engine.begin() as conn:
+                for column in missing:
+                    if not column.nullable:
+                        raise RuntimeError(f"无法自动为 {table.name} 添加非空列 {column.name}")
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                    backfill = COLUMN_BACKFILLS.get((table.name, column.name))
+                    if backfill:
+                        conn.execute(text(backfill))
+
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
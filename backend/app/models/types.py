@@ -0,0 +1,113 @@
+"""Column types shared by the models."""
+
+from __future__ import annotations
+
+import json
+import threading
+import zlib
+
+from sqlalchemy import JSON, Text
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # zstd 是可选依赖，未安装时只能使用 zlib
+    zstandard = None
+
+# 压缩后的值以 NUL 开头，JSON 文本不可能以 NUL 开头，据此区分压缩格式和未压缩的旧数据
+ZLIB_MARKER = b"\x00z"
+ZSTD_MARKER = b"\x00s"
+ALGORITHMS = ("off", "zlib", "zstd")
+
+_settings = {"algorithm": "zlib", "level": 6, "min_bytes": 256}
+_local = threading.local()
+
+
+def configure_json_compression(app) -> None:
+    """按 HISTORY_JSON_* 配置设置压缩算法，在应用写入数据之前调用；读取不受配置影响。"""
+    config = app.config
+    algorithm = str(config.get("HISTORY_JSON_COMPRESSION", "zlib")).strip().lower()
+    if algorithm not in ALGORITHMS:
+        raise RuntimeError(f"HISTORY_JSON_COMPRESSION 只能是 {'/'.join(ALGORITHMS)}，当前为 {algorithm}")
+    if algorithm == "zstd" and zstandard is None:
+        app.logger.warning("未安装 zstandard，历史记录改用 zlib 压缩")
+        algorithm = "zlib"
+    default_level = 3 if algorithm == "zstd" else 6
+    _settings.update(
+        algorithm=algorithm,
+        level=int(config.get("HISTORY_JSON_COMPRESSION_LEVEL") or default_level),
+        min_bytes=int(config.get("HISTORY_JSON_COMPRESS_MIN_BYTES", 256)),
+    )
+
+
+def _zstd_compressor():
+    # ZstdCompressor 不能在线程间共享，每个线程各建一个，压缩级别改变后重建
+    level = _settings["level"]
+    if getattr(_local, "level", None) != level:
+        _local.compressor = zstandard.ZstdCompressor(level=level)
+        _local.level = level
+    return _local.compressor
+
+
+def _zstd_decompressor():
+    if zstandard is None:
+        raise RuntimeError("数据库中有 zstd 压缩的记录，需要安装 zstandard 才能读取")
+    decompressor = getattr(_local, "decompressor", None)
+    if decompressor is None:
+        decompressor = _local.decompressor = zstandard.ZstdDecompressor()
+    return decompressor
+
+
+def encode_json(value) -> str | bytes:
+    """序列化为 JSON；不短于 min_bytes 且压缩后更小时返回带格式标记的压缩字节，否则返回文本。"""
+    text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    algorithm = _settings["algorithm"]
+    raw = text.encode("utf-8")
+    if algorithm == "off" or len(raw) < _settings["min_bytes"]:
+        return text
+    if algorithm == "zstd":
+        packed = ZSTD_MARKER + _zstd_compressor().compress(raw)
+    else:
+        packed = ZLIB_MARKER + zlib.compress(raw, _settings["level"])
+    return packed if len(packed) < len(raw) else text
+
+
+def decode_json(stored):
+    """读取任意格式：压缩字节、未压缩的 JSON 文本（包括 db.JSON 写入的旧数据）。"""
+    if stored is None:
+        return None
+    if isinstance(stored, memoryview):
+        stored = stored.tobytes()
+    if isinstance(stored, bytes):
+        if stored.startswith(ZLIB_MARKER):
+            stored = zlib.decompress(stored[len(ZLIB_MARKER) :])
+        elif stored.startswith(ZSTD_MARKER):
+            stored = _zstd_decompressor().decompress(stored[len(ZSTD_MARKER) :])
+    return json.loads(stored)
+
+
+class CompressedJSON(TypeDecorator):
+    """可直接替换 ``db.JSON`` 的列类型，较大的值压缩后以 BLOB 存储。
+
+    较小的值仍以 JSON 文本存储，SQLite 的 JSON 函数对它们照常可用；对压缩的值则不可用，
+    在 SQL 中读取字段时要先用 ``typeof(列) = 'text'`` 过滤。只在 SQLite 上压缩，
+    其他数据库按普通 JSON 列处理。
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name != "sqlite":
+            return dialect.type_descriptor(JSON())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name != "sqlite":
+            return value
+        return encode_json(value)
+
+    def process_result_value(self, value, dialect):
+        if dialect.name != "sqlite":
+            return value
+        return decode_json(value)
@@ -1,8 +1,15 @@
 """Schemas for request validation."""
 
 from .auth import LoginSchema, RegisterSchema
-from .history import HistoryQuerySchema
-from .problem import ParseSchema, RecognizeSchema, SolveProblemSchema, SolveSchema, SolveStreamSchema
+from .history import HistoryExportQuerySchema, HistoryQuerySchema, HistorySearchQuerySchema
+from .problem import (
+    ParseSchema,
+    RecognizeSchema,
+    SolveBatchSchema,
+    SolveProblemSchema,
+    SolveSchema,
+    SolveStreamSchema,
+)
 
 __all__ = [
     "RegisterSchema",
@@ -11,6 +18,9 @@ __all__ = [
     "ParseSchema",
     "SolveSchema",
     "SolveProblemSchema",
+    "SolveBatchSchema",
     "SolveStreamSchema",
     "HistoryQuerySchema",
+    "HistorySearchQuerySchema",
+    "HistoryExportQuerySchema",
 ]
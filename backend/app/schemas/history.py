@@ -1,8 +1,32 @@
-"""History query schema."""
+"""History query schemas."""
 
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, ValidationError, fields, validate, validates_schema
 
 
 class HistoryQuerySchema(Schema):
     page = fields.Integer(load_default=1, validate=validate.Range(min=1))
     limit = fields.Integer(load_default=20, validate=validate.Range(min=1, max=100))
+    # 上一页返回的 nextCursor；传入时忽略 page，按游标继续向后翻页
+    cursor = fields.String(load_default=None)
+    # summary 只返回题目摘要、学科、难度和时间，完整记录通过 GET /api/history/<id> 获取
+    view = fields.String(load_default="full", validate=validate.OneOf(["full", "summary"]))
+
+
+class HistorySearchQuerySchema(Schema):
+    q = fields.String(required=True, validate=validate.Length(min=1, max=100))
+    page = fields.Integer(load_default=1, validate=validate.Range(min=1))
+    limit = fields.Integer(load_default=20, validate=validate.Range(min=1, max=100))
+
+
+class HistoryExportQuerySchema(Schema):
+    format = fields.String(load_default="ndjson", validate=validate.OneOf(["ndjson", "csv"]))
+    # 按创建日期（UTC）过滤，两端都包含
+    date_from = fields.Date(load_default=None, data_key="from")
+    date_to = fields.Date(load_default=None, data_key="to")
+    subject = fields.String(load_default=None, validate=validate.Length(min=1, max=64))
+    gzip = fields.Boolean(load_default=False)
+
+    @validates_schema
+    def validate_range(self, data, **_kwargs):
+        if data["date_from"] and data["date_to"] and data["date_from"] > data["date_to"]:
+            raise ValidationError("开始日期不能晚于结束日期", "date_from")
@@ -37,6 +37,21 @@ class SolveProblemSchema(Schema):
         error_messages={"required": "缺少必要参数"},
     )
     content = fields.Raw(required=True, error_messages={"required": "缺少必要参数"})
+    # 不复用近似重复题目的已有解答，始终调用模型
+    skip_duplicate = fields.Boolean(load_default=False, data_key="skipDuplicate")
+
+
+class SolveBatchSchema(Schema):
+    problems = fields.List(
+        fields.Nested(SolveProblemSchema),
+        required=True,
+        validate=validate.Length(min=1, error="题目列表不能为空"),
+        error_messages={"required": "缺少题目列表"},
+    )
+    format = fields.String(
+        load_default="ndjson",
+        validate=validate.OneOf(["ndjson", "sse"], error="无效的输出格式"),
+    )
 
 
 class SolveStreamSchema(Schema):
@@ -2,6 +2,7 @@
 
 from .ai_service import ai_service
 from .chatglm_service import chatglm_service
+from .http_client import upstream_client
 from .pipeline_service import pipeline_service
 
-__all__ = ["ai_service", "chatglm_service", "pipeline_service"]
+__all__ = ["ai_service", "chatglm_service", "pipeline_service", "upstream_client"]
@@ -9,7 +9,14 @@ import requests
 from flask import current_app
 
 from app.services.chatglm_service import chatglm_service
+from app.services.http_client import upstream_client
 from app.utils.errors import APIError
+from app.utils.images import ImagePayload
+
+# 修改识别提示词或视觉模型参数时递增，旧的识别缓存不再命中
+OCR_PROMPT_VERSION = "1"
+# 请求体中图片 data URL 的占位符，序列化后替换为图片内容
+_IMAGE_URL_PLACEHOLDER = "__IMAGE_DATA_URL__"
 
 
 class AIService:
@@ -57,12 +64,15 @@ class AIService:
         model = current_app.config.get("MULTIMODAL_MODEL", "glm-4.6v-flashx")
         return (api_key or "", api_url or "", model)
 
-    def recognize_image(self, image_base64: str) -> str:
+    def require_multimodal_config(self) -> tuple[str, str, str]:
+        """视觉模型未配置时抛出 APIError；识别前的预处理也先检查，未配置时不必白白处理图片。"""
         api_key, api_url, model = self._resolve_multimodal_config()
-        timeout = current_app.config.get("REQUEST_TIMEOUT", 120)
-
         if not api_key or not api_url:
             raise APIError("图像识别服务未配置", 500)
+        return api_key, api_url, model
+
+    def recognize_image(self, image: ImagePayload) -> str:
+        api_key, api_url, model = self.require_multimodal_config()
 
         payload = {
             "model": model,
@@ -72,7 +82,7 @@ class AIService:
                     "content": [
                         {
                             "type": "image_url",
-                            "image_url": {"url": image_base64},
+                            "image_url": {"url": _IMAGE_URL_PLACEHOLDER},
                         },
                         {
                             "type": "text",
@@ -89,8 +99,14 @@ class AIService:
             "Content-Type": "application/json",
         }
 
+        # 其余字段序列化后再把图片拼进去，几 MB 的 base64 不必再经过 json.dumps 和一次编码
+        prefix, suffix = json.dumps(payload, ensure_ascii=False).encode("utf-8").split(
+            _IMAGE_URL_PLACEHOLDER.encode("ascii"), 1
+        )
+        body = b"".join([prefix, *image.data_url_parts(), suffix])
+
         try:
-            response = requests.post(api_url, json=payload, headers=headers, timeout=timeout)
+            response = upstream_client.post(api_url, data=body, headers=headers)
             response.raise_for_status()
             data = response.json()
             raw_content = data["choices"][0]["message"]["content"]
@@ -106,6 +122,12 @@ class AIService:
     def parse_problem(self, text: str) -> Dict:
         return chatglm_service.parse_problem(text)
 
+    def parse_problem_checked(self, text: str) -> tuple[Dict, bool]:
+        return chatglm_service.parse_problem_checked(text)
+
+    def infer_parse_result(self, text: str) -> Dict:
+        return chatglm_service.infer_parse_result(text)
+
     def generate_solution(self, text: str, parse_result: Dict) -> Dict:
         return chatglm_service.generate_solution(text, parse_result)
 
@@ -122,7 +144,7 @@ class AIService:
 
         if api_key and api_url:
             try:
-                response = requests.post(
+                response = upstream_client.post(
                     api_url,
                     json={
                         "model": model,
@@ -143,7 +165,7 @@ class AIService:
                         "Authorization": f"Bearer {api_key}",
                         "Content-Type": "application/json",
                     },
-                    timeout=10,
+                    read_timeout=10,
                 )
                 response.raise_for_status()
                 result["multimodal"] = True
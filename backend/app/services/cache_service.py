@@ -0,0 +1,343 @@
+"""Two-tier (in-process LRU + database) caches for model results."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.extensions import db
+from app.models.cache_entry import CacheEntry
+from app.services.ai_service import OCR_PROMPT_VERSION
+from app.services.chatglm_service import PARSE_PROMPT_VERSION, SOLUTION_PROMPT_VERSION
+
+
+class LRUCache:
+    """线程安全的 LRU，按条目数和 TTL 淘汰。值以 JSON 文本保存，读取时返回副本。"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._items: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at and expires_at < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+        return json.loads(payload)
+
+    def set(self, key: str, value: Dict) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else 0
+        with self._lock:
+            self._items[key] = (expires_at, payload)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class ResultCache:
+    """模型结果缓存：进程内 LRU 为一级，cache_entries 表为持久化二级。
+
+    配置项按 ``<config_prefix>_ENABLED/_MAX_ENTRIES/_TTL_SECONDS/_DB_MAX_ENTRIES`` 读取。
+    ``version`` 参与键计算并落库，提示词变更时旧条目自然失效。
+    子类可覆盖 ``_store_*`` 系列方法替换持久层。
+    """
+
+    PRUNE_EVERY = 100
+    store_name = "db"
+
+    def __init__(self, namespace: str, config_prefix: str, version: str = ""):
+        self.namespace = namespace
+        self.config_prefix = config_prefix
+        self.version = version
+        self._memory: Optional[LRUCache] = None
+        self._lock = threading.Lock()
+        self._counters = {"memoryHits": 0, f"{self.store_name}Hits": 0, "misses": 0, "sets": 0, "errors": 0}
+        self._sets_since_prune = 0
+        self._stale_purged = False
+
+    def _config(self, name: str, default):
+        return current_app.config.get(f"{self.config_prefix}_{name}", default)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._config("ENABLED", True))
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self._config("TTL_SECONDS", 7 * 24 * 3600)
+
+    @property
+    def memory(self) -> LRUCache:
+        if self._memory is None:
+            with self._lock:
+                if self._memory is None:
+                    self._memory = LRUCache(self._config("MAX_ENTRIES", 1000), self.ttl_seconds)
+        return self._memory
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def make_key(self, *parts) -> str:
+        raw = json.dumps([self.namespace, self.version, *parts], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+
+        if not self._stale_purged:
+            self._stale_purged = True
+            self.invalidate(stale_only=True)
+
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memoryHits")
+            return value
+
+        value = self._store_get(key)
+        if value is not None:
+            self._count(f"{self.store_name}Hits")
+            self.memory.set(key, value)
+            return value
+
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Dict) -> None:
+        if not self.enabled:
+            return
+        self.memory.set(key, value)
+        self._count("sets")
+        if not self._store_set(key, value):
+            return
+
+        with self._lock:
+            self._sets_since_prune += 1
+            should_prune = self._sets_since_prune >= self.PRUNE_EVERY
+            if should_prune:
+                self._sets_since_prune = 0
+        if should_prune:
+            self.prune()
+
+    def invalidate(self, stale_only: bool = False) -> int:
+        """清空本命名空间的缓存；``stale_only`` 时只删除版本号与当前不一致的持久化条目。"""
+        if not stale_only:
+            self.memory.clear()
+        removed = self._store_clear(stale_only)
+        if removed:
+            current_app.logger.info("已清除 %s 缓存 %s 条", self.namespace, removed)
+        return removed
+
+    def _warn(self, action: str, exc: Exception) -> None:
+        self._count("errors")
+        current_app.logger.warning("%s %s 缓存失败: %s", action, self.namespace, exc)
+
+    def _store_get(self, key: str) -> Optional[Dict]:
+        table = CacheEntry.__table__
+        try:
+            with db.engine.begin() as conn:
+                row = conn.execute(
+                    select(table.c.value, table.c.expires_at).where(table.c.key == key)
+                ).first()
+                if row is None:
+                    return None
+                if row.expires_at is not None and row.expires_at < datetime.utcnow():
+                    conn.execute(delete(table).where(table.c.key == key))
+                    return None
+                return row.value
+        except SQLAlchemyError as exc:
+            self._warn("读取", exc)
+            return None
+
+    def _store_set(self, key: str, value: Dict) -> bool:
+        table = CacheEntry.__table__
+        now = datetime.utcnow()
+        ttl_seconds = self.ttl_seconds
+        values = {
+            "namespace": self.namespace,
+            "version": self.version,
+            "value": value,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl_seconds) if ttl_seconds > 0 else None,
+        }
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(update(table).where(table.c.key == key).values(**values))
+                if updated.rowcount == 0:
+                    conn.execute(insert(table).values(key=key, **values))
+            return True
+        except SQLAlchemyError as exc:
+            # 并发写入同一键或数据库繁忙时放弃持久化，不影响本次请求
+            self._warn("写入", exc)
+            return False
+
+    def _store_clear(self, stale_only: bool) -> int:
+        table = CacheEntry.__table__
+        condition = table.c.namespace == self.namespace
+        if stale_only:
+            condition = condition & (table.c.version != self.version)
+        try:
+            with db.engine.begin() as conn:
+                return conn.execute(delete(table).where(condition)).rowcount
+        except SQLAlchemyError as exc:
+            self._warn("清除", exc)
+            return 0
+
+    def prune(self) -> int:
+        """删除过期条目，并把持久层条目数限制在 ``_DB_MAX_ENTRIES`` 以内。"""
+        table = CacheEntry.__table__
+        max_entries = self._config("DB_MAX_ENTRIES", 50000)
+        removed = 0
+        try:
+            with db.engine.begin() as conn:
+                removed += conn.execute(
+                    delete(table).where(
+                        table.c.namespace == self.namespace,
+                        table.c.expires_at.is_not(None),
+                        table.c.expires_at < datetime.utcnow(),
+                    )
+                ).rowcount
+
+                total = conn.execute(
+                    select(func.count()).select_from(table).where(table.c.namespace == self.namespace)
+                ).scalar_one()
+                if total > max_entries:
+                    oldest = (
+                        select(table.c.key)
+                        .where(table.c.namespace == self.namespace)
+                        .order_by(table.c.created_at)
+                        .limit(total - max_entries)
+                    )
+                    removed += conn.execute(delete(table).where(table.c.key.in_(oldest))).rowcount
+        except SQLAlchemyError as exc:
+            self._warn("清理", exc)
+        return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+        hits = counters["memoryHits"] + counters[f"{self.store_name}Hits"]
+        lookups = hits + counters["misses"]
+        counters.update(
+            {
+                "version": self.version,
+                "memoryEntries": len(self._memory) if self._memory is not None else 0,
+                "memoryEvictions": self._memory.evictions if self._memory is not None else 0,
+                "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+        )
+        return counters
+
+
+class DiskResultCache(ResultCache):
+    """持久层为本地目录的缓存，文件名即键；条目数上限读取 ``<config_prefix>_DISK_MAX_ENTRIES``。
+
+    键中已包含版本号，旧版本文件不会再被命中，按 TTL 和条目上限自然淘汰。
+    """
+
+    store_name = "disk"
+
+    @property
+    def directory(self) -> Path:
+        return Path(self._config("DIR", "data/cache"))
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _store_get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        try:
+            if self.ttl_seconds > 0 and path.stat().st_mtime + self.ttl_seconds < time.time():
+                path.unlink(missing_ok=True)
+                return None
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            self._warn("读取", exc)
+            return None
+
+    def _store_set(self, key: str, value: Dict) -> bool:
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再原子替换，多个 worker 并发写同一键也不会读到半个文件
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_name, path)
+            return True
+        except OSError as exc:
+            self._warn("写入", exc)
+            return False
+
+    def _entries(self) -> list[tuple[float, Path]]:
+        entries = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _store_clear(self, stale_only: bool) -> int:
+        if stale_only:
+            return 0
+        removed = 0
+        for _mtime, path in self._entries():
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def prune(self) -> int:
+        max_entries = self._config("DISK_MAX_ENTRIES", 10000)
+        entries = sorted(self._entries())
+        expire_before = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0
+        removed = 0
+        for index, (mtime, path) in enumerate(entries):
+            if mtime >= expire_before and len(entries) - index <= max_entries:
+                break
+            try:
+                path.unlink(missing_ok=True)
+                removed += 1
+            except OSError as exc:
+                self._warn("清理", exc)
+        return removed
+
+
+parse_cache = ResultCache("parse", "PARSE_CACHE", version=PARSE_PROMPT_VERSION)
+solution_cache = ResultCache("solution", "SOLUTION_CACHE", version=SOLUTION_PROMPT_VERSION)
+ocr_cache = DiskResultCache("ocr", "OCR_CACHE", version=OCR_PROMPT_VERSION)
+
+caches = {cache.namespace: cache for cache in (parse_cache, solution_cache, ocr_cache)}
@@ -5,13 +5,158 @@ from __future__ import annotations
 import ast
 import json
 import re
+from bisect import bisect_left
 from typing import Dict, Generator, Iterable, Optional
 
 import requests
 from flask import current_app
 
+from app.services.http_client import upstream_client
 from app.utils.errors import APIError
 
+# 修改解析提示词或结果结构时递增，旧的解析缓存随之失效
+PARSE_PROMPT_VERSION = "2"
+# 修改解答提示词（generate_solution）时递增，旧的解答缓存会在下次访问时清除
+SOLUTION_PROMPT_VERSION = "2"
+
+# 解答文本解析用到的正则均在导入时编译；修改后需通过 benchmarks/parsing_golden.py 校验
+SECTION_ALIASES = {
+    "解题思路": "thinking",
+    "详细步骤": "steps",
+    "解题步骤": "steps",
+    "步骤": "steps",
+    "最终答案": "answer",
+    "答案": "answer",
+    "知识总结": "summary",
+    "知识点总结": "summary",
+    "学习总结": "summary",
+    "总结": "summary",
+}
+_HEADING_ALIASES = "|".join(SECTION_ALIASES)
+# 标题候选：文本开头或换行处，其后（跨越空白、# 与【）紧跟标题别名。
+# 只消费换行符本身，相邻的候选不会互相遮挡。
+HEADING_CANDIDATE_RE = re.compile(r"(?:^|\n)(?=\s*(?:#{1,6}\s*)?(?:【\s*)?(" + _HEADING_ALIASES + r"))")
+HEADING_TRAILER_RE = re.compile(r"(?:\s*】)?\s*[:：]?\s*")
+STEP_PREFIX_RE = re.compile(r"^\s*(?:[-*•]|\d+[\.、\)]|第[一二三四五六七八九十百零\d]+步)\s*")
+STEP_SPLIT_RE = re.compile(r"[。；;\n]+")
+NUMBERED_LINE_RE = re.compile(r"^(?:\d+[\.、\)]|[-*•])\s*")
+PARAGRAPH_SPLIT_RE = re.compile(r"\n{2,}")
+ANSWER_INLINE_RE = re.compile(r"(?:最终答案|答案)\s*[:：]\s*(.+)")
+SUMMARY_INLINE_RE = re.compile(r"(?:知识总结|知识点总结|学习总结|总结)\s*[:：]\s*(.+)")
+JSON_SOLUTION_MARKERS = (
+    '"thinking"',
+    '"steps"',
+    '"answer"',
+    '"summary"',
+    "'thinking'",
+    "'steps'",
+    "'answer'",
+    "'summary'",
+)
+
+_LIST_FIELD_SPLIT_RE = re.compile(r"[，,、；;\n]+")
+_CODE_BLOCK_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
+# JSON 风格的 "键": 值；每个字段一个命名分组，一次扫描找出所有字段的候选位置
+_JSON_KEY_RE = re.compile(
+    r"(?:\"|')(?:"
+    r"(?P<thinking>thinking|analysis|thought|解题思路|思路)"
+    r"|(?P<steps>steps|detailedSteps|solutionSteps|详细步骤|解题步骤|步骤)"
+    r"|(?P<answer>answer|finalAnswer|final_answer|最终答案|答案)"
+    r"|(?P<summary>summary|knowledgeSummary|knowledge_summary|知识总结|知识点总结|学习总结|总结)"
+    r")(?:\"|')\s*:\s*",
+    re.IGNORECASE,
+)
+_JSON_STRING_VALUE_RE = re.compile(r"\"((?:\\.|[^\"\\])*)\"|'((?:\\.|[^'\\])*)'")
+_DOUBLE_QUOTED_RE = re.compile(r'"((?:\\.|[^"\\])*)"')
+_SINGLE_QUOTED_RE = re.compile(r"'((?:\\.|[^'\\])*)'")
+_ANSWER_HINT_RES = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"(?:最终答案|答案)\s*[:：]\s*([^\n，,。；;]+)",
+        r"(?:答案是|结果为|可得)\s*([^\s，,。；;]+)",
+        r"(?:等于)\s*([^\s，,。；;]+)",
+        r"=\s*([^\s，,。；;]+)",
+    )
+)
+
+
+class SolutionTokens:
+    """Heading and JSON-key positions of one model output, each found by a single scan.
+
+    ``parse_solution_content`` builds one instance and hands it to every extractor, so
+    the text is tokenised once instead of being re-searched per heading alias and per
+    JSON key. Each token kind is computed on first use.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self._sections: Optional[Dict[str, str]] = None
+        self._json_fields: Optional[Dict] = None
+        self._looks_like_json: Optional[bool] = None
+        self._paragraphs: Optional[list[str]] = None
+
+    @property
+    def looks_like_json(self) -> bool:
+        if self._looks_like_json is None:
+            source = self.text.strip()
+            self._looks_like_json = bool(source) and (
+                source.startswith("{")
+                or source.startswith("```json")
+                or any(marker in source for marker in JSON_SOLUTION_MARKERS)
+            )
+        return self._looks_like_json
+
+    @property
+    def paragraphs(self) -> list[str]:
+        if self._paragraphs is None:
+            self._paragraphs = [p.strip() for p in PARAGRAPH_SPLIT_RE.split(self.text) if p.strip()]
+        return self._paragraphs
+
+    @property
+    def sections(self) -> Dict[str, str]:
+        """各部分第一次出现的标题下的正文，正文止于下一个标题所在行之前。"""
+        if self._sections is None:
+            text = self.text
+            starts: Dict[str, int] = {}
+            boundaries: list[int] = []
+            for match in HEADING_CANDIDATE_RE.finditer(text):
+                if match.group(0):
+                    boundaries.append(match.start())
+                section = SECTION_ALIASES[match.group(1)]
+                if section not in starts:
+                    starts[section] = HEADING_TRAILER_RE.match(text, match.end(1)).end()
+
+            self._sections = {}
+            for section, start in starts.items():
+                index = bisect_left(boundaries, start)
+                end = boundaries[index] if index < len(boundaries) else len(text)
+                self._sections[section] = text[start:end].strip()
+        return self._sections
+
+    @property
+    def json_fields(self) -> Dict:
+        """JSON 风格文本中各字段第一次出现的字符串值；steps 为数组体的原始文本。"""
+        if self._json_fields is None:
+            source = self.text.strip()
+            fields: Dict = {}
+            for match in _JSON_KEY_RE.finditer(source):
+                field = match.lastgroup
+                if field in fields:
+                    continue
+                if field == "steps":
+                    if source.startswith("[", match.end()):
+                        body_start = match.end() + 1
+                        body_end = source.find("]", body_start)
+                        fields[field] = source[body_start : body_end if body_end != -1 else len(source)]
+                    continue
+                value = _JSON_STRING_VALUE_RE.match(source, match.end())
+                if value:
+                    fields[field] = value.group(1) if value.group(1) is not None else (value.group(2) or "")
+                if len(fields) == 4:
+                    break
+            self._json_fields = fields
+        return self._json_fields
+
 
 class ChatGLMService:
     @staticmethod
@@ -68,7 +213,7 @@ class ChatGLMService:
             except Exception:  # noqa: BLE001
                 pass
 
-        parts = re.split(r"[，,、；;\n]+", text)
+        parts = _LIST_FIELD_SPLIT_RE.split(text)
         return [part.strip(" -•*") for part in parts if part.strip(" -•*")]
 
     @staticmethod
@@ -102,11 +247,7 @@ class ChatGLMService:
 
         cleaned_steps = []
         for line in raw_lines:
-            cleaned = re.sub(
-                r"^\s*(?:[-*•]|\d+[\.、\)]|第[一二三四五六七八九十百零\d]+步)\s*",
-                "",
-                line,
-            ).strip()
+            cleaned = STEP_PREFIX_RE.sub("", line).strip()
             if cleaned:
                 cleaned_steps.append(cleaned)
 
@@ -114,7 +255,7 @@ class ChatGLMService:
             return cleaned_steps
 
         text = ChatGLMService._normalize_text_content(value)
-        return [item.strip() for item in re.split(r"[。；;\n]+", text) if item.strip()]
+        return [item.strip() for item in STEP_SPLIT_RE.split(text) if item.strip()]
 
     @staticmethod
     def _coerce_solution_result(data) -> Dict:
@@ -176,24 +317,7 @@ class ChatGLMService:
 
     @staticmethod
     def _looks_like_json_solution_text(text: str) -> bool:
-        source = (text or "").strip()
-        if not source:
-            return False
-        if source.startswith("{") or source.startswith("```json"):
-            return True
-        return any(
-            marker in source
-            for marker in (
-                '"thinking"',
-                '"steps"',
-                '"answer"',
-                '"summary"',
-                "'thinking'",
-                "'steps'",
-                "'answer'",
-                "'summary'",
-            )
-        )
+        return SolutionTokens(text or "").looks_like_json
 
     @staticmethod
     def _unescape_json_string(text: str) -> str:
@@ -211,42 +335,28 @@ class ChatGLMService:
             )
 
     @staticmethod
-    def _extract_solution_from_json_like_text(text: str) -> Dict:
+    def _extract_solution_from_json_like_text(text: str, tokens: Optional[SolutionTokens] = None) -> Dict:
         result = ChatGLMService._empty_solution_result()
-        if not ChatGLMService._looks_like_json_solution_text(text):
+        tokens = tokens or SolutionTokens(text)
+        if not tokens.looks_like_json:
             return result
 
-        source = text.strip()
-
-        def _extract_string_value(keys: str) -> str:
-            pattern = rf"(?:\"|')(?:{keys})(?:\"|')\s*:\s*(?:\"((?:\\.|[^\"\\])*)\"|'((?:\\.|[^'\\])*)')"
-            match = re.search(pattern, source, re.IGNORECASE)
-            if not match:
-                return ""
-            raw_value = match.group(1) if match.group(1) is not None else (match.group(2) or "")
-            return ChatGLMService._unescape_json_string(raw_value).strip()
-
-        result["thinking"] = _extract_string_value("thinking|analysis|thought|解题思路|思路")
-        result["answer"] = _extract_string_value("answer|finalAnswer|final_answer|最终答案|答案")
-        result["summary"] = _extract_string_value(
-            "summary|knowledgeSummary|knowledge_summary|知识总结|知识点总结|学习总结|总结"
-        )
+        fields = tokens.json_fields
+        for field in ("thinking", "answer", "summary"):
+            if field in fields:
+                result[field] = ChatGLMService._unescape_json_string(fields[field]).strip()
 
-        steps_block_pattern = (
-            r"(?:\"|')(?:steps|detailedSteps|solutionSteps|详细步骤|解题步骤|步骤)(?:\"|')\s*:\s*\[([\s\S]*?)(?:\]|$)"
-        )
-        steps_match = re.search(steps_block_pattern, source, re.IGNORECASE)
-        if steps_match:
-            steps_body = steps_match.group(1)
+        if "steps" in fields:
+            steps_body = fields["steps"]
             step_items = []
 
-            for raw_item in re.findall(r'"((?:\\.|[^"\\])*)"', steps_body):
+            for raw_item in _DOUBLE_QUOTED_RE.findall(steps_body):
                 value = ChatGLMService._unescape_json_string(raw_item).strip()
                 if value:
                     step_items.append(value)
 
             if not step_items:
-                for raw_item in re.findall(r"'((?:\\.|[^'\\])*)'", steps_body):
+                for raw_item in _SINGLE_QUOTED_RE.findall(steps_body):
                     value = ChatGLMService._unescape_json_string(raw_item).strip()
                     if value:
                         step_items.append(value)
@@ -261,15 +371,8 @@ class ChatGLMService:
         if not source:
             return ""
 
-        patterns = [
-            r"(?:最终答案|答案)\s*[:：]\s*([^\n，,。；;]+)",
-            r"(?:答案是|结果为|可得)\s*([^\s，,。；;]+)",
-            r"(?:等于)\s*([^\s，,。；;]+)",
-            r"=\s*([^\s，,。；;]+)",
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, source, re.IGNORECASE)
+        for pattern in _ANSWER_HINT_RES:
+            match = pattern.search(source)
             if match:
                 value = (match.group(1) or "").strip().strip("。；;，,")
                 if value:
@@ -343,6 +446,10 @@ class ChatGLMService:
             "prerequisites": prerequisites,
         }
 
+    def infer_parse_result(self, text: str) -> Dict:
+        """Heuristic parse without calling the model, used for speculative solving."""
+        return self._coerce_parse_result({}, text)
+
     def _extract_fields_from_text(self, content: str, source_text: str) -> Dict:
         text = (content or "").strip()
         if not text:
@@ -372,7 +479,6 @@ class ChatGLMService:
     def _request(self, data: dict, stream: bool = False) -> requests.Response:
         api_key = current_app.config.get("DEEPSEEK_API_KEY")
         api_url = current_app.config.get("DEEPSEEK_API_URL")
-        timeout = current_app.config.get("REQUEST_TIMEOUT", 120)
 
         if not api_key:
             raise APIError("DeepSeek API Key 未配置", 500)
@@ -383,11 +489,10 @@ class ChatGLMService:
         }
 
         try:
-            response = requests.post(
+            response = upstream_client.post(
                 api_url,
                 json=data,
                 headers=headers,
-                timeout=timeout,
                 stream=stream,
             )
             response.raise_for_status()
@@ -427,6 +532,10 @@ class ChatGLMService:
 }}"""
 
     def parse_problem(self, text: str) -> Dict:
+        return self.parse_problem_checked(text)[0]
+
+    def parse_problem_checked(self, text: str) -> tuple[Dict, bool]:
+        """Parse ``text``; the flag is True when the reply was not JSON and fields were scraped from prose."""
         request_data = {
             "model": current_app.config.get("DEEPSEEK_MODEL", "deepseek-v4-pro"),
             "messages": [
@@ -453,13 +562,13 @@ class ChatGLMService:
 
         try:
             parsed = self._extract_json(normalized_content)
-            return self._coerce_parse_result(parsed, text)
+            return self._coerce_parse_result(parsed, text), False
         except APIError:
             current_app.logger.warning(
                 "解析返回非标准 JSON，降级提取字段。content=%s",
                 normalized_content[:600],
             )
-            return self._extract_fields_from_text(normalized_content, text)
+            return self._extract_fields_from_text(normalized_content, text), True
 
     def generate_solution(self, text: str, parse_result: Dict) -> Dict:
         knowledge_points = parse_result.get("knowledgePoints", [])
@@ -575,23 +684,27 @@ class ChatGLMService:
 
         response = self._request(request_data, stream=True)
 
-        for line in self._iter_sse_lines(response.iter_lines(decode_unicode=True)):
-            if line == "[DONE]":
-                break
-            try:
-                parsed = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            delta = (
-                parsed.get("choices", [{}])[0]
-                .get("delta", {})
-            )
-            reasoning = delta.get("reasoning_content") or delta.get("reasoning")
-            if reasoning:
-                yield {"type": "reasoning", "content": reasoning}
-            content = delta.get("content")
-            if content:
-                yield {"type": "content", "content": content}
+        try:
+            for line in self._iter_sse_lines(response.iter_lines(decode_unicode=True)):
+                if line == "[DONE]":
+                    break
+                try:
+                    parsed = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                delta = (
+                    parsed.get("choices", [{}])[0]
+                    .get("delta", {})
+                )
+                reasoning = delta.get("reasoning_content") or delta.get("reasoning")
+                if reasoning:
+                    yield {"type": "reasoning", "content": reasoning}
+                content = delta.get("content")
+                if content:
+                    yield {"type": "content", "content": content}
+        finally:
+            # 流式响应读完后归还连接；客户端中途断开时关闭连接，避免占用连接池
+            response.close()
 
     @staticmethod
     def _iter_sse_lines(lines: Iterable[Optional[str]]) -> Generator[str, None, None]:
@@ -611,13 +724,15 @@ class ChatGLMService:
         if not json_str:
             raise APIError("解析结果格式错误: 模型未返回有效内容", 500)
 
-        code_block_match = re.search(r"```(?:json)?\s*([\s\S]*?)```", json_str)
+        code_block_match = _CODE_BLOCK_RE.search(json_str)
         if code_block_match:
             json_str = code_block_match.group(1).strip()
 
-        json_match = re.search(r"\{[\s\S]*\}", json_str)
-        if json_match:
-            json_str = json_match.group(0)
+        # 取第一个 { 到最后一个 } 之间的片段
+        brace_start = json_str.find("{")
+        brace_end = json_str.rfind("}")
+        if brace_start != -1 and brace_end > brace_start:
+            json_str = json_str[brace_start : brace_end + 1]
 
         json_str = json_str.replace("\ufeff", "").strip()
 
@@ -633,38 +748,23 @@ class ChatGLMService:
             raise APIError(f"解析结果格式错误: {exc}", 500) from exc
 
     @staticmethod
-    def _extract_solution_sections(text: str) -> Dict:
+    def _extract_solution_sections(text: str, tokens: Optional[SolutionTokens] = None) -> Dict:
         result = ChatGLMService._empty_solution_result()
+        tokens = tokens or SolutionTokens(text)
 
-        heading_line = (
-            r"\n\s*(?:#{1,6}\s*)?(?:【\s*)?"
-            r"(?:解题思路|详细步骤|解题步骤|步骤|最终答案|答案|知识总结|知识点总结|学习总结|总结)"
-            r"(?:\s*】)?\s*[:：]?"
-        )
-
-        def _extract_section(aliases: str) -> str:
-            pattern = (
-                r"(?:^|\n)\s*(?:#{1,6}\s*)?(?:【\s*)?(?:"
-                + aliases
-                + r")(?:\s*】)?\s*[:：]?\s*([\s\S]*?)(?="
-                + heading_line
-                + r"|\Z)"
-            )
-            match = re.search(pattern, text, re.IGNORECASE)
-            return match.group(1).strip() if match else ""
-
-        result["thinking"] = _extract_section("解题思路")
-        steps_text = _extract_section("详细步骤|解题步骤|步骤")
-        result["answer"] = _extract_section("最终答案|答案")
-        result["summary"] = _extract_section("知识总结|知识点总结|学习总结|总结")
+        sections = tokens.sections
+        result["thinking"] = sections.get("thinking", "")
+        steps_text = sections.get("steps", "")
+        result["answer"] = sections.get("answer", "")
+        result["summary"] = sections.get("summary", "")
 
         if steps_text:
             result["steps"] = ChatGLMService._normalize_steps_field(steps_text)
 
         # 兜底：模型未按模板输出时，尽量把正文映射到可展示结构
         # 若文本本身像 JSON（可能还是半截 JSON），这里不要把整段 JSON 当作思路输出。
-        if not ChatGLMService._has_solution_content(result) and not ChatGLMService._looks_like_json_solution_text(text):
-            paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+        if not ChatGLMService._has_solution_content(result) and not tokens.looks_like_json:
+            paragraphs = tokens.paragraphs
             if paragraphs:
                 result["thinking"] = paragraphs[0]
                 if len(paragraphs) > 1:
@@ -675,26 +775,26 @@ class ChatGLMService:
             numbered_lines = []
             for line in text.splitlines():
                 stripped = line.strip()
-                if re.match(r"^(?:\d+[\.、\)]|[-*•])\s*", stripped):
-                    cleaned = re.sub(r"^(?:\d+[\.、\)]|[-*•])\s*", "", stripped).strip()
+                if NUMBERED_LINE_RE.match(stripped):
+                    cleaned = NUMBERED_LINE_RE.sub("", stripped).strip()
                     if cleaned:
                         numbered_lines.append(cleaned)
             if numbered_lines and not result["steps"]:
                 result["steps"] = numbered_lines
 
         if not result["answer"]:
-            answer_inline = re.search(r"(?:最终答案|答案)\s*[:：]\s*(.+)", text)
+            answer_inline = ANSWER_INLINE_RE.search(text)
             if answer_inline:
                 result["answer"] = answer_inline.group(1).strip()
             elif result["steps"]:
                 result["answer"] = str(result["steps"][-1]).strip()
 
         if not result["summary"]:
-            summary_inline = re.search(r"(?:知识总结|知识点总结|学习总结|总结)\s*[:：]\s*(.+)", text)
+            summary_inline = SUMMARY_INLINE_RE.search(text)
             if summary_inline:
                 result["summary"] = summary_inline.group(1).strip()
             else:
-                paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+                paragraphs = tokens.paragraphs
                 if len(paragraphs) > 1:
                     tail = paragraphs[-1]
                     if tail and tail != result["answer"]:
@@ -716,8 +816,9 @@ class ChatGLMService:
         except APIError:
             json_result = ChatGLMService._empty_solution_result()
 
-        json_like_result = ChatGLMService._extract_solution_from_json_like_text(text)
-        section_result = ChatGLMService._extract_solution_sections(text)
+        tokens = SolutionTokens(text)
+        json_like_result = ChatGLMService._extract_solution_from_json_like_text(text, tokens)
+        section_result = ChatGLMService._extract_solution_sections(text, tokens)
 
         if ChatGLMService._has_solution_content(json_result):
             fallback = ChatGLMService._merge_solution_result(json_like_result, section_result)
@@ -0,0 +1,121 @@
+"""Near-duplicate problem lookup over stored history questions."""
+
+from __future__ import annotations
+
+import operator
+import threading
+import time
+from collections import deque
+from functools import reduce
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import Integer, bindparam, cast, or_, select
+
+from app.extensions import db
+from app.models.history import History
+from app.models.question_signature import QuestionSignature
+from app.utils.minhash import jaccard, numbers, shingles, skeleton
+
+# 常见题目会有很多完全相同的历史记录，只核对其中一部分
+MAX_CANDIDATES = 50
+
+
+def _candidate_rows_statement():
+    # 预先构造好语句，每次查找只绑定段键，省去重复构造表达式的开销
+    conditions = [column == bindparam(column.name) for column in QuestionSignature.band_columns()]
+    matching = (
+        select(QuestionSignature.history_id)
+        .where(or_(*conditions))
+        # 题目有大段相同的套话时候选会很多，先核对相同段数最多的
+        .order_by(reduce(operator.add, [cast(condition, Integer) for condition in conditions]).desc())
+        .limit(MAX_CANDIDATES)
+    )
+    return select(History.id, History.user_id, History.question, History.created_at).where(
+        History.id.in_(matching.scalar_subquery())
+    )
+
+
+_CANDIDATE_ROWS = _candidate_rows_statement()
+
+
+class QuestionDeduplicator:
+    """按 LSH 段键找出候选记录，再用 n-gram 的精确 Jaccard 相似度核对。
+
+    相似度不低于 DEDUP_THRESHOLD、题中数字完全一致、且解答完整的记录才算重复；
+    多条满足时取相似度最高、其次最新的一条。
+
+    n-gram 相似度分辨不出只改了一个关键字的题（"正确" 改成 "错误" 仍有 0.9 以上），
+    所以结果中的 ``servable`` 只在两道题去掉空白和句读标点后完全相同时为真（见 ``minhash.skeleton``），
+    serve 模式只直接复用这种记录。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {"lookups": 0, "candidates": 0, "matches": 0, "servableMatches": 0, "numberMismatches": 0}
+        self._lookup_ms: deque = deque(maxlen=500)
+
+    def find(self, question: str) -> Optional[Dict]:
+        started = time.perf_counter()
+        match, checked, number_mismatches = self._find(question)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counters["lookups"] += 1
+            self._counters["candidates"] += checked
+            self._counters["numberMismatches"] += number_mismatches
+            self._counters["matches"] += 1 if match else 0
+            self._counters["servableMatches"] += 1 if match and match["servable"] else 0
+            self._lookup_ms.append(elapsed_ms)
+        return match
+
+    def _find(self, question: str) -> tuple[Optional[Dict], int, int]:
+        bands = QuestionSignature.band_values(question)
+        if bands is None:
+            return None, 0, 0
+
+        rows = db.session.execute(_CANDIDATE_ROWS, bands).all()
+
+        threshold = current_app.config.get("DEDUP_THRESHOLD", 0.9)
+        target = shingles(question)
+        target_numbers = numbers(question)
+        best, best_key, number_mismatches = None, None, 0
+        for row in rows:
+            similarity = jaccard(target, shingles(row.question))
+            if similarity < threshold:
+                continue
+            if numbers(row.question) != target_numbers:
+                number_mismatches += 1
+                continue
+            key = (similarity, row.created_at)
+            if best_key is None or key > best_key:
+                best, best_key = row, key
+
+        if best is None:
+            return None, len(rows), number_mismatches
+
+        parse_result, solution = db.session.execute(
+            select(History.parse_result, History.solution).where(History.id == best.id)
+        ).one()
+        if not isinstance(solution, dict) or not (solution.get("steps") or solution.get("answer")):
+            return None, len(rows), number_mismatches
+        match = {
+            "historyId": best.id,
+            "userId": best.user_id,
+            "question": best.question,
+            "similarity": round(best_key[0], 3),
+            "servable": skeleton(best.question) == skeleton(question),
+            "parseResult": parse_result,
+            "solution": solution,
+        }
+        return match, len(rows), number_mismatches
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            lookup_ms = sorted(self._lookup_ms)
+        counters["lookupMsP50"] = round(lookup_ms[len(lookup_ms) // 2], 3) if lookup_ms else 0
+        counters["lookupMsMax"] = round(lookup_ms[-1], 3) if lookup_ms else 0
+        return counters
+
+
+question_dedup = QuestionDeduplicator()
@@ -0,0 +1,125 @@
+"""Streaming bulk export of history records as NDJSON or CSV."""
+
+from __future__ import annotations
+
+import csv
+import json
+import zlib
+from datetime import date, timedelta
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models.history import History
+
+# 每次从游标取的行数，导出的内存占用只与这个数有关，与记录总数无关
+EXPORT_BATCH_SIZE = 500
+# 攒够这么多字符再交给 WSGI 服务器，避免每条记录一次写入
+FLUSH_CHARS = 64 * 1024
+
+CSV_FIELDS = [
+    "id",
+    "createdAt",
+    "subject",
+    "difficulty",
+    "type",
+    "knowledgePoints",
+    "question",
+    "answer",
+    "steps",
+    "summary",
+]
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+class _Passthrough:
+    """csv.writer 的输出目标，writerow 直接返回格式化好的一行。"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class HistoryExporter:
+    def rows(
+        self,
+        user_id: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        subject: Optional[str] = None,
+    ) -> Iterator:
+        """按创建时间正序逐批读出该用户的完整记录，须在应用上下文中迭代。"""
+        query = select(*History.record_columns(), History.subject, History.difficulty).where(
+            History.user_id == user_id
+        )
+        if date_from:
+            query = query.where(History.created_at >= date_from)
+        if date_to:
+            query = query.where(History.created_at < date_to + timedelta(days=1))
+        if subject:
+            query = query.where(History.subject == subject)
+        query = query.order_by(History.created_at, History.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        yield from db.session.execute(query)
+
+    def stream(self, rows: Iterable, fmt: str, compress: bool = False) -> Iterator[bytes]:
+        lines = self._csv_lines(rows) if fmt == "csv" else self._ndjson_lines(rows)
+        # wbits=31 输出带 gzip 头的数据，边读边压缩
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        buffer, size = [], 0
+        for line in lines:
+            buffer.append(line)
+            size += len(line)
+            if size < FLUSH_CHARS:
+                continue
+            chunk = "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        tail = "".join(buffer).encode("utf-8")
+        if compressor:
+            tail = compressor.compress(tail) + compressor.flush()
+        if tail:
+            yield tail
+
+    @staticmethod
+    def _ndjson_lines(rows: Iterable) -> Iterator[str]:
+        for row in rows:
+            yield json.dumps(History.record_to_dict(row), ensure_ascii=False) + "\n"
+
+    @staticmethod
+    def _csv_lines(rows: Iterable) -> Iterator[str]:
+        writer = csv.writer(_Passthrough())
+        # 带 BOM，Excel 才会按 UTF-8 打开中文
+        yield "\ufeff" + writer.writerow(CSV_FIELDS)
+        for row in rows:
+            parse_result = row.parse_result if isinstance(row.parse_result, dict) else {}
+            solution = row.solution if isinstance(row.solution, dict) else {}
+            yield writer.writerow(
+                [
+                    row.id,
+                    History._to_iso(row.created_at),
+                    row.subject or "",
+                    row.difficulty or "",
+                    _flatten(parse_result.get("type"), "；"),
+                    _flatten(parse_result.get("knowledgePoints"), "；"),
+                    row.question,
+                    _flatten(solution.get("answer"), "\n"),
+                    _flatten(solution.get("steps"), "\n\n"),
+                    _flatten(solution.get("summary"), "\n"),
+                ]
+            )
+
+
+def _flatten(value, separator: str) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return separator.join(_flatten(item, separator) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+history_exporter = HistoryExporter()
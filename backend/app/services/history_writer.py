@@ -0,0 +1,234 @@
+"""History persistence, optionally write-behind through an in-process batching queue."""
+
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Optional
+
+from flask import Flask, current_app
+
+from app.extensions import db
+from app.models.history import History
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """保存历史记录。默认在请求内同步提交；开启 HISTORY_WRITE_BEHIND 后只入队，由后台线程批量提交。
+
+    入队前先生成 id 和 created_at，接口返回的内容与同步写入一致。队列和后台线程按进程懒加载
+    （preload_app 下 fork 之后才创建）；进程退出时把剩余记录全部写入。
+    同一 worker 内读取某个用户的历史前应调用 :meth:`wait_for_user`，保证能读到刚提交的记录。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._app: Optional[Flask] = None
+        # 批次写入后通知 wait_for_user，与其他状态共用一把锁
+        self._flushed = threading.Condition(self._lock)
+        # 每个用户已入队但尚未提交的记录数
+        self._pending_by_user: Counter = Counter()
+        self._counters = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "failedBatches": 0,
+            "dropped": 0,
+            "syncFallbacks": 0,
+        }
+        self._flush_ms: deque = deque(maxlen=200)
+        self._oldest_enqueued_at: deque = deque()
+
+    @staticmethod
+    def _enabled() -> bool:
+        return bool(current_app.config.get("HISTORY_WRITE_BEHIND"))
+
+    def save(self, record: History) -> None:
+        """持久化一条新记录；返回时 ``record.id`` 和 ``record.created_at`` 均已确定。"""
+        if not record.id:
+            record.id = str(uuid.uuid4())
+        if record.created_at is None:
+            record.created_at = datetime.utcnow()
+
+        if not self._enabled() or not self._enqueue([record]):
+            db.session.add(record)
+            db.session.commit()
+
+    def save_all(self, records: list[History]) -> None:
+        for record in records:
+            if not record.id:
+                record.id = str(uuid.uuid4())
+            if record.created_at is None:
+                record.created_at = datetime.utcnow()
+
+        if not self._enabled() or not self._enqueue(records):
+            db.session.add_all(records)
+            db.session.commit()
+
+    def _enqueue(self, records: list[History]) -> bool:
+        pending = self._ensure_started()
+        max_queue = current_app.config.get("HISTORY_WRITE_BEHIND_MAX_QUEUE", 10000)
+        with self._lock:
+            if len(self._oldest_enqueued_at) + len(records) > max_queue:
+                # 队列积压说明数据库跟不上，退回同步写入，由请求承担背压
+                self._counters["syncFallbacks"] += 1
+                return False
+            now = time.monotonic()
+            for record in records:
+                values = {column.key: getattr(record, column.key) for column in History.__table__.columns}
+                self._pending_by_user[record.user_id] += 1
+                self._oldest_enqueued_at.append(now)
+                pending.put(values)
+            self._counters["enqueued"] += len(records)
+        return True
+
+    def _ensure_started(self) -> queue.Queue:
+        pid = os.getpid()
+        if self._queue is None or self._pid != pid:
+            with self._lock:
+                if self._queue is None or self._pid != pid:
+                    self._app = current_app._get_current_object()
+                    self._queue = queue.Queue()
+                    self._pid = pid
+                    self._pending_by_user.clear()
+                    self._oldest_enqueued_at.clear()
+                    self._thread = threading.Thread(
+                        target=self._run, args=(self._queue,), name="history-writer", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.shutdown)
+        return self._queue
+
+    def _run(self, pending: queue.Queue) -> None:
+        config = self._app.config
+        batch_size = max(1, config.get("HISTORY_WRITE_BEHIND_BATCH_SIZE", 50))
+        interval = max(1, config.get("HISTORY_WRITE_BEHIND_INTERVAL_MS", 200)) / 1000
+
+        stopping = False
+        while not stopping:
+            item = pending.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # 凑满一批或距第一条入队超过 interval 即提交
+            deadline = time.monotonic() + interval
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+        # 退出前写完停止信号之后仍在队列中的记录
+        leftover = []
+        while True:
+            try:
+                item = pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), batch_size):
+            self._write(leftover[start : start + batch_size])
+
+    def _commit(self, batch: list[Dict], attempts: int) -> bool:
+        for attempt in range(attempts):
+            try:
+                # 走 ORM 插入，学科/难度冗余列和用户计数的事件钩子照常生效
+                db.session.add_all(History(**values) for values in batch)
+                db.session.commit()
+                return True
+            except Exception as exc:  # noqa: BLE001
+                db.session.rollback()
+                self._app.logger.warning("历史记录批量写入失败（第 %s 次）: %s", attempt + 1, exc)
+                if attempt + 1 < attempts:
+                    time.sleep(0.1 * (attempt + 1))
+        return False
+
+    def _write(self, batch: list[Dict]) -> None:
+        started = time.perf_counter()
+        with self._app.app_context():
+            if self._commit(batch, attempts=3):
+                dropped = 0
+            else:
+                # 整批失败时逐条重试，只丢弃自身有问题的记录
+                dropped = sum(1 for values in batch if not self._commit([values], attempts=1))
+            db.session.remove()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._flushed:
+            self._counters["batches"] += 1
+            self._counters["written"] += len(batch) - dropped
+            self._counters["dropped"] += dropped
+            if dropped:
+                self._counters["failedBatches"] += 1
+            else:
+                self._flush_ms.append(elapsed_ms)
+            for values in batch:
+                self._pending_by_user[values["user_id"]] -= 1
+                if self._pending_by_user[values["user_id"]] <= 0:
+                    del self._pending_by_user[values["user_id"]]
+                if self._oldest_enqueued_at:
+                    self._oldest_enqueued_at.popleft()
+            self._flushed.notify_all()
+        if dropped:
+            self._app.logger.error("丢弃 %s 条未能写入的历史记录", dropped)
+
+    def wait_for_user(self, user_id: str, timeout: float = 5.0) -> None:
+        """等待本进程中该用户已入队的记录写入数据库。"""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._pending_by_user.get(user_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._flushed.wait(remaining)
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """停止后台线程，并在返回前写完队列中的全部记录。"""
+        with self._lock:
+            thread = self._thread if self._pid == os.getpid() else None
+            pending = self._queue
+        if thread is None or not thread.is_alive():
+            return
+        pending.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            # 包括已从队列取出、正在组批或提交中的记录
+            depth = len(self._oldest_enqueued_at)
+            oldest = self._oldest_enqueued_at[0] if self._oldest_enqueued_at else None
+            flush_ms = sorted(self._flush_ms)
+        counters.update(
+            {
+                "queueDepth": depth,
+                "oldestPendingMs": round((time.monotonic() - oldest) * 1000, 1) if oldest is not None else 0,
+                "flushMsP50": round(flush_ms[len(flush_ms) // 2], 2) if flush_ms else 0,
+                "flushMsMax": round(flush_ms[-1], 2) if flush_ms else 0,
+            }
+        )
+        return counters
+
+
+history_writer = HistoryWriter()
@@ -0,0 +1,177 @@
+"""Pooled keep-alive HTTP client shared by all upstream model calls."""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+
+class UpstreamClient:
+    """每个 worker 进程一个 requests.Session，复用 TCP/TLS 连接。
+
+    gunicorn 使用 preload_app，模块在 master 中导入；Session 按 pid 懒加载，
+    避免 fork 后多个 worker 共享同一批 socket。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._pid: Optional[int] = None
+        self._pool_maxsize = 0
+        self._requests = 0
+        self._errors = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._warmed_up: list[str] = []
+
+    def _build_session(self) -> requests.Session:
+        config = current_app.config
+        self._pool_maxsize = config.get("UPSTREAM_POOL_MAXSIZE", 10)
+
+        adapter = HTTPAdapter(
+            pool_connections=config.get("UPSTREAM_POOL_CONNECTIONS", 4),
+            pool_maxsize=self._pool_maxsize,
+            pool_block=config.get("UPSTREAM_POOL_BLOCK", False),
+            max_retries=0,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not config.get("UPSTREAM_KEEPALIVE", True):
+            session.headers["Connection"] = "close"
+        return session
+
+    @property
+    def session(self) -> requests.Session:
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+                    self._requests = self._errors = 0
+                    self._in_flight = self._peak_in_flight = 0
+                    self._warmed_up = []
+        return self._session
+
+    @staticmethod
+    def timeout(read_timeout: Optional[float] = None) -> tuple[float, float]:
+        config = current_app.config
+        connect_timeout = config.get("UPSTREAM_CONNECT_TIMEOUT", 5)
+        if read_timeout is None:
+            read_timeout = config.get("REQUEST_TIMEOUT", 120)
+        return (connect_timeout, read_timeout)
+
+    def post(
+        self,
+        url: str,
+        *,
+        json: Optional[dict] = None,
+        data: Optional[bytes] = None,
+        headers: Dict[str, str],
+        read_timeout: Optional[float] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        session = self.session
+        with self._lock:
+            self._requests += 1
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        try:
+            return session.post(
+                url,
+                json=json,
+                data=data,
+                headers=headers,
+                timeout=self.timeout(read_timeout),
+                stream=stream,
+            )
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def warm_up(self) -> list[str]:
+        """在 worker 启动时预先建立到各上游的连接，失败时静默跳过。"""
+        config = current_app.config
+        if not config.get("UPSTREAM_WARMUP", True):
+            return []
+
+        targets = []
+        if config.get("DEEPSEEK_API_KEY") and config.get("DEEPSEEK_API_URL"):
+            targets.append(config["DEEPSEEK_API_URL"])
+        if config.get("MULTIMODAL_API_KEY") and config.get("MULTIMODAL_API_URL"):
+            targets.append(config["MULTIMODAL_API_URL"])
+
+        session = self.session
+        connect_timeout = config.get("UPSTREAM_CONNECT_TIMEOUT", 5)
+        warmed = []
+        for origin in dict.fromkeys(self._origin(url) for url in targets):
+            try:
+                session.head(origin, timeout=(connect_timeout, connect_timeout), allow_redirects=False)
+                warmed.append(origin)
+            except requests.RequestException as exc:
+                current_app.logger.warning("上游连接预热失败: %s (%s)", origin, exc)
+
+        with self._lock:
+            self._warmed_up = warmed
+        return warmed
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}/"
+
+    def stats(self) -> Dict:
+        with self._lock:
+            result = {
+                "pid": self._pid,
+                "poolMaxsize": self._pool_maxsize,
+                "requests": self._requests,
+                "errors": self._errors,
+                "inFlight": self._in_flight,
+                "peakInFlight": self._peak_in_flight,
+                "warmedUp": list(self._warmed_up),
+                "pools": [],
+            }
+            session = self._session if self._pid == os.getpid() else None
+
+        if session is None:
+            return result
+
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue
+            seen.add(id(adapter))
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                queue = pool.pool
+                idle = sum(1 for conn in list(queue.queue) if conn is not None) if queue else 0
+                maxsize = queue.maxsize if queue else 0
+                result["pools"].append(
+                    {
+                        "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+                        "maxsize": maxsize,
+                        "inUse": maxsize - queue.qsize() if queue else 0,
+                        "idle": idle,
+                        "connectionsCreated": pool.num_connections,
+                        "requests": pool.num_requests,
+                    }
+                )
+        return result
+
+
+upstream_client = UpstreamClient()
@@ -0,0 +1,182 @@
+"""Image preprocessing before OCR: orientation, downscaling and re-encoding."""
+
+from __future__ import annotations
+
+import io
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import current_app
+
+from app.utils.images import ImagePayload
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 是可选依赖，未安装时跳过预处理，原图直接交给视觉模型
+    Image = ImageOps = None
+
+# 修改预处理算法时递增，识别缓存随之失效
+PREPROCESS_VERSION = "2"
+
+
+def _gevent_threadpool_class():
+    # gevent worker 中 threading 已被替换为协程，Pillow 的计算会阻塞整个 worker，需要放到真正的线程中
+    try:
+        from gevent import monkey
+        from gevent.threadpool import ThreadPool
+    except ImportError:
+        return None
+    return ThreadPool if monkey.is_module_patched("threading") else None
+
+
+def _settings(config) -> Dict:
+    return {
+        "maxEdge": config.get("IMAGE_PREPROCESS_MAX_EDGE", 1600),
+        "maxPixels": config.get("IMAGE_PREPROCESS_MAX_PIXELS", 50 * 1000 * 1000),
+        "grayscale": config.get("IMAGE_PREPROCESS_GRAYSCALE", True),
+        "autocontrast": config.get("IMAGE_PREPROCESS_AUTOCONTRAST", True),
+        "quality": config.get("IMAGE_PREPROCESS_QUALITY", 85),
+    }
+
+
+def _process(raw: bytes, settings: Dict) -> Optional[tuple[bytes, bool]]:
+    """返回重新编码的 JPEG，以及图片是否被旋转或缩小过；像素数超过上限时返回 None。"""
+    max_edge = settings["maxEdge"]
+    mode = "L" if settings["grayscale"] else "RGB"
+    with Image.open(io.BytesIO(raw)) as image:
+        width, height = image.size
+        # 打开只读取文件头；几十 KB 的 PNG 也可能声明上亿像素，完整解码前先按尺寸拒绝
+        if width * height > settings["maxPixels"]:
+            return None
+        scale = min(1.0, max_edge / max(width, height))
+        # JPEG 可在解码时直接按 1/2、1/4、1/8 缩小并输出灰度，4000×3000 的照片不必完整解码
+        image.draft(mode, (max(1, round(width * scale)), max(1, round(height * scale))))
+        image = ImageOps.exif_transpose(image)
+        transformed = image.size != (width, height) or scale < 1
+
+        factor = max(image.size) // max_edge
+        if image.format != "JPEG" and factor >= 2:
+            # 其他格式没有 draft，先按整数倍盒式缩小，后面的转换和 LANCZOS 只处理缩小后的像素；
+            # 调色板和二值图的像素值不能直接求平均，先展开
+            if image.mode in ("P", "1"):
+                image = image.convert("RGBA" if image.mode == "P" else "L")
+            image = image.reduce(factor)
+
+        if image.mode in ("RGBA", "LA", "P"):
+            # 透明背景按白色铺底，否则转换后变成黑底
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+            image = background
+        image = image.convert(mode)
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            transformed = True
+        if settings["autocontrast"]:
+            # 两端各裁掉 1% 的像素再拉伸，纸张泛黄、阴影造成的偏色一并去掉
+            image = ImageOps.autocontrast(image, cutoff=1)
+
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=settings["quality"])
+    return output.getvalue(), transformed
+
+
+class ImagePreprocessor:
+    """识别前压缩图片，统计节省的字节数以及预处理前后的识别耗时。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._counters = {
+            "processed": 0,
+            "keptOriginal": 0,
+            "oversized": 0,
+            "failed": 0,
+            "bytesIn": 0,
+            "bytesOut": 0,
+        }
+        self._preprocess_ms: deque = deque(maxlen=500)
+        self._ocr_ms = {"preprocessed": deque(maxlen=500), "original": deque(maxlen=500)}
+        self._warned = False
+
+    @staticmethod
+    def enabled() -> bool:
+        return Image is not None and current_app.config.get("IMAGE_PREPROCESS_ENABLED", True)
+
+    def cache_tag(self) -> str:
+        """参与识别缓存键：预处理设置不同，交给模型的图片就不同。"""
+        if not self.enabled():
+            return "original"
+        settings = _settings(current_app.config)
+        return "v{}:{maxEdge}:{maxPixels}:{grayscale:d}:{autocontrast:d}:{quality}".format(PREPROCESS_VERSION, **settings)
+
+    def _run(self, func, *args):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    workers = max(1, current_app.config.get("IMAGE_PREPROCESS_WORKERS", 2))
+                    gevent_pool = _gevent_threadpool_class()
+                    if gevent_pool is not None:
+                        self._pool = gevent_pool(workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preprocess")
+        if isinstance(self._pool, ThreadPoolExecutor):
+            return self._pool.submit(func, *args).result()
+        return self._pool.apply(func, args)
+
+    def preprocess(self, image: ImagePayload) -> ImagePayload:
+        """返回缩小后的图片；未启用、无法处理或结果没有变小时返回原图。"""
+        if Image is None and current_app.config.get("IMAGE_PREPROCESS_ENABLED", True) and not self._warned:
+            self._warned = True
+            current_app.logger.warning("未安装 Pillow，跳过识别前的图片预处理")
+        if not self.enabled() or not image.raw:
+            return image
+
+        started = time.perf_counter()
+        try:
+            processed = self._run(_process, bytes(image.raw), _settings(current_app.config))
+        except Exception as exc:  # noqa: BLE001
+            current_app.logger.warning("图片预处理失败，使用原图识别: %s", exc)
+            self._count(failed=1)
+            return image
+        if processed is None:
+            self._count(oversized=1)
+            return image
+        data, transformed = processed
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        # 没有旋转或缩小且重新编码反而更大时（例如本来就很小的图片），保留原图
+        if not transformed and len(data) >= image.size:
+            self._count(keptOriginal=1, bytesIn=image.size, bytesOut=image.size)
+            self._preprocess_ms.append(elapsed_ms)
+            return image
+        self._count(processed=1, bytesIn=image.size, bytesOut=len(data))
+        self._preprocess_ms.append(elapsed_ms)
+        return ImagePayload("image/jpeg", raw=data, size=len(data), digest=image.digest)
+
+    def record_ocr(self, elapsed_ms: float, preprocessed: bool) -> None:
+        self._ocr_ms["preprocessed" if preprocessed else "original"].append(elapsed_ms)
+
+    def _count(self, **deltas) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self._counters[key] += value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["bytesSaved"] = counters["bytesIn"] - counters["bytesOut"]
+        counters["preprocessMsP50"] = _p50(self._preprocess_ms)
+        # 两组识别耗时分别来自预处理后和未经预处理（未启用或处理失败）的图片，可在切换配置后对比
+        counters["ocrMsP50"] = {name: _p50(values) for name, values in self._ocr_ms.items()}
+        return counters
+
+
+def _p50(values) -> Optional[float]:
+    values = sorted(values)
+    return round(values[len(values) // 2], 1) if values else None
+
+
+image_preprocessor = ImagePreprocessor()
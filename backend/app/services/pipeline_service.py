@@ -2,42 +2,314 @@
 
 from __future__ import annotations
 
-from typing import Dict, Generator
+import queue
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Generator, Optional
+
+from flask import Flask, current_app, g
 
 from app.extensions import db
 from app.models.history import History
 from app.services.ai_service import ai_service
+from app.services.cache_service import ocr_cache, parse_cache, solution_cache
+from app.services.dedup_service import question_dedup
+from app.services.history_writer import history_writer
+from app.services.image_preprocess import image_preprocessor
+from app.services.single_flight import (
+    SingleFlight,
+    ocr_flight,
+    parse_flight,
+    solution_flight,
+    solution_stream_broadcast,
+)
+from app.services.solution_stream import SolutionStreamParser
+from app.utils.errors import APIError
+from app.utils.images import ImagePayload
+from app.utils.text import normalize_problem_text
+from app.utils.timing import StageTimings, current_timings, timed
+
+
+SPECULATIVE_FIELDS = ("type", "subject", "difficulty", "knowledgePoints")
+
+
+def _call_in_app_context(app: Flask, func, *args, timings: Optional[StageTimings] = None):
+    with app.app_context():
+        if timings is not None:
+            # 线程池中是新的应用上下文，沿用发起请求的阶段计时
+            g.stage_timings = timings
+        return func(*args)
+
+
+def _single_flight(flight: SingleFlight, key: str, func, *args):
+    # 相同题目并发到达时只调用一次上游，其余请求等待并共享结果
+    if not current_app.config.get("SINGLE_FLIGHT_ENABLED", True):
+        return func(*args)
+    value, _shared = flight.do(key, func, *args)
+    return value
 
 
 class PipelineService:
-    def solve_problem(self, input_data: Dict) -> Dict:
-        result = {"success": True, "data": {}}
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._batch_executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # 只在有批次运行时保留每个用户的并发名额
+        self._batch_slots: "weakref.WeakValueDictionary[str, threading.BoundedSemaphore]" = (
+            weakref.WeakValueDictionary()
+        )
 
-        try:
-            if input_data.get("type") == "image":
-                problem_text = ai_service.recognize_image(input_data.get("content", ""))
-            else:
-                problem_text = str(input_data.get("content", ""))
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=current_app.config.get("PIPELINE_MAX_WORKERS", 16),
+                        thread_name_prefix="pipeline",
+                    )
+        return self._executor
+
+    @property
+    def batch_executor(self) -> ThreadPoolExecutor:
+        # 与推测执行分开的线程池：批量任务内部还会向 executor 提交子任务，共用会互相等待
+        if self._batch_executor is None:
+            with self._executor_lock:
+                if self._batch_executor is None:
+                    self._batch_executor = ThreadPoolExecutor(
+                        max_workers=current_app.config.get("BATCH_MAX_WORKERS", 8),
+                        thread_name_prefix="batch",
+                    )
+        return self._batch_executor
+
+    @staticmethod
+    def _recognize_image_uncached(image: ImagePayload, cache_key: str) -> str:
+        ai_service.require_multimodal_config()
+        with timed("preprocess"):
+            prepared = image_preprocessor.preprocess(image)
+        started = time.perf_counter()
+        text = ai_service.recognize_image(prepared)
+        image_preprocessor.record_ocr((time.perf_counter() - started) * 1000, prepared is not image)
+        ocr_cache.set(cache_key, {"text": text})
+        return text
+
+    def _recognize_image(self, image) -> str:
+        # 上传的图片已是 ImagePayload；JSON 中的 base64 字符串在这里解码一次
+        if not isinstance(image, ImagePayload):
+            image = ImagePayload.from_data_url(str(image or ""))
+            # 上传的图片读取时已限制大小；JSON 中的图片（包括批量解题的每一道）在这里按解码后的大小检查
+            if image.size is not None and image.size > current_app.config.get("MAX_IMAGE_SIZE", 5 * 1024 * 1024):
+                raise APIError("图片大小超过限制", 400)
+        if image.digest is None:
+            with timed("ocr"):
+                return ai_service.recognize_image(image)
+
+        cache_key = ocr_cache.make_key(
+            image.digest,
+            current_app.config.get("MULTIMODAL_MODEL", "glm-4.6v-flashx"),
+            image_preprocessor.cache_tag(),
+        )
+        cached = ocr_cache.get(cache_key)
+        if cached is not None:
+            return cached["text"]
+
+        with timed("ocr"):
+            return _single_flight(ocr_flight, cache_key, self._recognize_image_uncached, image, cache_key)
+
+    @staticmethod
+    def _parse_cache_key(text: str) -> str:
+        return parse_cache.make_key(
+            normalize_problem_text(text),
+            current_app.config.get("DEEPSEEK_MODEL", "deepseek-v4-pro"),
+        )
+
+    @staticmethod
+    def _call_parse_upstream(text: str, cache_key: str) -> Dict:
+        parse_result, degraded = ai_service.parse_problem_checked(text)
+        # 模型偶尔不按 JSON 回复，降级提取的字段可能不全；不写入缓存，下次重新请求模型
+        if not degraded:
+            parse_cache.set(cache_key, parse_result)
+        return parse_result
+
+    def _parse_problem_uncached(self, text: str, cache_key: str) -> Dict:
+        with timed("parse"):
+            return _single_flight(parse_flight, cache_key, self._call_parse_upstream, text, cache_key)
+
+    def _parse_problem(self, text: str) -> Dict:
+        cache_key = self._parse_cache_key(text)
+        parse_result = parse_cache.get(cache_key)
+        if parse_result is None:
+            parse_result = self._parse_problem_uncached(text, cache_key)
+        return parse_result
+
+    @staticmethod
+    def _canonical_parse_result(parse_result: Dict) -> Dict:
+        # 只保留解答提示词实际使用的字段，字段顺序、空白和知识点写法不同不影响命中
+        knowledge_points = parse_result.get("knowledgePoints", [])
+        if not isinstance(knowledge_points, list):
+            knowledge_points = [knowledge_points]
+        return {
+            "type": normalize_problem_text(str(parse_result.get("type", ""))),
+            "subject": normalize_problem_text(str(parse_result.get("subject", ""))),
+            "difficulty": normalize_problem_text(str(parse_result.get("difficulty", ""))),
+            "knowledgePoints": [normalize_problem_text(str(item)) for item in knowledge_points],
+        }
+
+    def _solution_cache_key(self, text: str, parse_result: Dict, *extra) -> str:
+        config = current_app.config
+        return solution_cache.make_key(
+            normalize_problem_text(text),
+            self._canonical_parse_result(parse_result),
+            config.get("DEEPSEEK_MODEL", "deepseek-v4-pro"),
+            bool(config.get("DEEPSEEK_ENABLE_THINKING")),
+            config.get("DEEPSEEK_REASONING_EFFORT", "high") if config.get("DEEPSEEK_ENABLE_THINKING") else "",
+            *extra,
+        )
+
+    @staticmethod
+    def _call_solution_upstream(text: str, parse_result: Dict, cache_key: str) -> Dict:
+        solution = ai_service.generate_solution(text, parse_result)
+        solution_cache.set(cache_key, solution)
+        return solution
+
+    def _generate_solution(self, text: str, parse_result: Dict) -> tuple[Dict, bool]:
+        cache_key = self._solution_cache_key(text, parse_result)
+        solution = solution_cache.get(cache_key)
+        if solution is not None:
+            return solution, True
+
+        with timed("solve"):
+            solution = _single_flight(
+                solution_flight, cache_key, self._call_solution_upstream, text, parse_result, cache_key
+            )
+        return solution, False
+
+    @staticmethod
+    def _diverged_fields(speculated: Dict, parse_result: Dict) -> list[str]:
+        fields = [
+            item.strip()
+            for item in current_app.config.get("PIPELINE_SPECULATIVE_RESOLVE_ON", "type,subject").split(",")
+            if item.strip() in SPECULATIVE_FIELDS
+        ]
+        speculated = PipelineService._canonical_parse_result(speculated)
+        parse_result = PipelineService._canonical_parse_result(parse_result)
+        return [field for field in fields if speculated[field] != parse_result[field]]
+
+    def _parse_and_solve_speculatively(self, text: str) -> tuple[Dict, Dict, bool, Dict]:
+        """Solve with heuristic parse fields while the model parse runs in parallel.
+
+        When the model parse arrives, fields listed in PIPELINE_SPECULATIVE_RESOLVE_ON are
+        compared with the heuristics; any difference discards the speculative solution and
+        re-solves with the model parse.
+        """
+        cache_key = self._parse_cache_key(text)
+        parse_result = parse_cache.get(cache_key)
+        if parse_result is not None:
+            solution, solution_cached = self._generate_solution(text, parse_result)
+            return parse_result, solution, solution_cached, {"used": False}
+
+        app = current_app._get_current_object()
+        timings = current_timings()
+        speculated = ai_service.infer_parse_result(text)
+        parse_future = self.executor.submit(
+            _call_in_app_context, app, self._parse_problem_uncached, text, cache_key, timings=timings
+        )
+        solve_future = self.executor.submit(
+            _call_in_app_context, app, self._generate_solution, text, speculated, timings=timings
+        )
+
+        parse_result = parse_future.result()
+        diverged = self._diverged_fields(speculated, parse_result)
+        if diverged:
+            # 推测解答仍会在后台完成并写入缓存，这里直接按模型解析结果重新求解
+            solution, solution_cached = self._generate_solution(text, parse_result)
+        else:
+            solution, solution_cached = solve_future.result()
+
+        speculation = {"used": True, "divergedFields": diverged, "resolved": bool(diverged)}
+        return parse_result, solution, solution_cached, speculation
+
+    def _reuse_duplicate(self, problem_text: str, user_id: Optional[str], data: Dict) -> bool:
+        """Fill ``data`` from a near-duplicate history record per DEDUP_MODE; False if none matched."""
+        mode = current_app.config.get("DEDUP_MODE", "off")
+        with timed("dedup"):
+            match = question_dedup.find(problem_text)
+        if match is None:
+            return False
+
+        # serve 只直接复用与本题仅差空白和标点的记录，其余近似重复按 offer 交给用户确认
+        if mode == "serve" and not match["servable"]:
+            mode = "offer"
+        duplicate = {
+            "mode": mode,
+            "similarity": match["similarity"],
+            "question": match["question"],
+            # 其他用户的记录 id 对当前用户没有意义
+            "historyId": match["historyId"] if user_id and match["userId"] == user_id else None,
+        }
+        if mode == "serve":
+            data["parseResult"] = match["parseResult"]
+            data["solution"] = match["solution"]
+            data["solutionCached"] = True
+        else:
+            # offer：不给出本次结果，由前端展示已有解答，用户不接受时带 skipDuplicate 重新提交
+            duplicate["parseResult"] = match["parseResult"]
+            duplicate["solution"] = match["solution"]
+        data["duplicate"] = duplicate
+        return True
+
+    def _run_stages(self, input_data: Dict, data: Dict, dedup: bool = False) -> None:
+        """Run recognise → parse → solve, filling ``data`` as each stage completes.
 
-            result["data"]["recognizedText"] = problem_text
+        With ``dedup``, a near-duplicate history record found after recognition replaces the
+        parse and solve stages (see :meth:`_reuse_duplicate`).
+        """
+        if input_data.get("type") == "image":
+            problem_text = self._recognize_image(input_data.get("content", ""))
+        else:
+            problem_text = str(input_data.get("content", ""))
 
-            parse_result = ai_service.parse_problem(problem_text)
-            result["data"]["parseResult"] = parse_result
+        data["recognizedText"] = problem_text
 
-            solution = ai_service.generate_solution(problem_text, parse_result)
-            result["data"]["solution"] = solution
+        if dedup and self._reuse_duplicate(problem_text, input_data.get("userId"), data):
+            return
+
+        if current_app.config.get("PIPELINE_SPECULATIVE"):
+            parse_result, solution, solution_cached, speculation = self._parse_and_solve_speculatively(
+                problem_text
+            )
+            data["parseResult"] = parse_result
+            data["speculation"] = speculation
+        else:
+            parse_result = self._parse_problem(problem_text)
+            data["parseResult"] = parse_result
+            solution, solution_cached = self._generate_solution(problem_text, parse_result)
+
+        data["solution"] = solution
+        data["solutionCached"] = solution_cached
+
+    def solve_problem(self, input_data: Dict) -> Dict:
+        result = {"success": True, "data": {}}
+
+        try:
+            dedup = current_app.config.get("DEDUP_MODE", "off") in {"offer", "serve"}
+            self._run_stages(input_data, result["data"], dedup=dedup and not input_data.get("skipDuplicate"))
 
             user_id = input_data.get("userId")
-            if user_id:
+            # offer 模式命中重复时没有本次解答，等用户确认后再保存
+            if user_id and "solution" in result["data"]:
                 history_record = History(
                     user_id=user_id,
                     username=input_data.get("username"),
-                    question=problem_text,
-                    parse_result=parse_result,
-                    solution=solution,
+                    question=result["data"]["recognizedText"],
+                    parse_result=result["data"]["parseResult"],
+                    solution=result["data"]["solution"],
                 )
-                db.session.add(history_record)
-                db.session.commit()
+                with timed("db"):
+                    history_writer.save(history_record)
                 result["data"]["historyId"] = history_record.id
 
             return result
@@ -49,29 +321,210 @@ class PipelineService:
                 "data": result["data"],
             }
 
-    def recognize_only(self, image_base64: str) -> Dict:
+    def _solve_batch_item(self, index: int, input_data: Dict) -> Dict:
+        data: Dict = {}
         try:
-            text = ai_service.recognize_image(image_base64)
+            self._run_stages(input_data, data)
+            return {"index": index, "success": True, "data": data}
+        except Exception as exc:  # noqa: BLE001
+            return {"index": index, "success": False, "error": str(exc), "data": data}
+
+    def _user_batch_slots(self, user_key: str) -> threading.BoundedSemaphore:
+        with self._executor_lock:
+            slots = self._batch_slots.get(user_key)
+            if slots is None:
+                slots = threading.BoundedSemaphore(current_app.config.get("BATCH_PER_USER_CONCURRENCY", 3))
+                self._batch_slots[user_key] = slots
+            return slots
+
+    def solve_batch(
+        self,
+        problems: list[Dict],
+        user_key: str,
+        user_id: Optional[str] = None,
+        username: Optional[str] = None,
+    ) -> Generator[Dict, None, None]:
+        """Solve ``problems`` on the shared batch pool, yielding results in completion order.
+
+        At most BATCH_PER_USER_CONCURRENCY items of the same user run at once, across all of
+        that user's concurrent batches. History rows are saved together at the end, in one
+        transaction or as one write-behind enqueue.
+        """
+        app = current_app._get_current_object()
+        slots = self._user_batch_slots(user_key)
+        completed: "queue.Queue[Dict]" = queue.Queue()
+
+        def _on_done(future):
+            slots.release()
+            completed.put(future.result())
+
+        pending = list(enumerate(problems))
+        pending.reverse()
+        in_flight = 0
+        results = []
+        while pending or in_flight:
+            # 没有在途任务时阻塞等待名额（同一用户的其他批次可能占满了名额）
+            if pending and slots.acquire(blocking=in_flight == 0):
+                index, item = pending.pop()
+                future = self.batch_executor.submit(
+                    _call_in_app_context, app, self._solve_batch_item, index, item
+                )
+                future.add_done_callback(_on_done)
+                in_flight += 1
+                continue
+
+            outcome = completed.get()
+            in_flight -= 1
+            if outcome["success"] and user_id:
+                outcome["data"]["historyId"] = str(uuid.uuid4())
+            results.append(outcome)
+            yield {"type": "result", **outcome}
+
+        summary = {
+            "type": "summary",
+            "total": len(problems),
+            "succeeded": sum(1 for item in results if item["success"]),
+            "failed": sum(1 for item in results if not item["success"]),
+        }
+
+        if user_id:
+            try:
+                history_writer.save_all(
+                    [
+                        History(
+                            id=item["data"]["historyId"],
+                            user_id=user_id,
+                            username=username,
+                            question=item["data"]["recognizedText"],
+                            parse_result=item["data"]["parseResult"],
+                            solution=item["data"]["solution"],
+                        )
+                        for item in results
+                        if item["success"]
+                    ]
+                )
+                summary["historySaved"] = True
+            except Exception as exc:  # noqa: BLE001
+                db.session.rollback()
+                current_app.logger.exception("批量解题历史记录写入失败: %s", exc)
+                summary["historySaved"] = False
+
+        yield summary
+
+    def solve_problem_stream(self, input_data: Dict) -> Generator[Dict, None, None]:
+        """Stream the whole pipeline as typed events.
+
+        Yields ``recognized``, ``parsed``, the events of :meth:`solve_stream` (deltas,
+        incremental ``step``/``answer``/``summary`` and the structured ``solution``) and
+        finally ``done`` with the history id (None for anonymous users). When a near-duplicate
+        is found (DEDUP_MODE), a ``duplicate`` event replaces the model stream; in ``offer``
+        mode it carries the existing solution and is followed directly by ``done``.
+        """
+        if input_data.get("type") == "image":
+            problem_text = self._recognize_image(input_data.get("content", ""))
+        else:
+            problem_text = str(input_data.get("content", ""))
+        yield {"type": "recognized", "text": problem_text}
+
+        user_id = input_data.get("userId")
+        reused: Dict = {}
+        dedup = current_app.config.get("DEDUP_MODE", "off") in {"offer", "serve"}
+        if dedup and not input_data.get("skipDuplicate") and self._reuse_duplicate(problem_text, user_id, reused):
+            if "solution" not in reused:
+                yield {"type": "duplicate", "duplicate": reused["duplicate"]}
+                yield {"type": "done", "historyId": None}
+                return
+            parse_result = reused["parseResult"]
+            yield {"type": "parsed", "parseResult": parse_result}
+            yield {"type": "duplicate", "duplicate": reused["duplicate"]}
+            solution = reused["solution"]
+            yield {"type": "solution", "solution": solution}
+        else:
+            parse_result = self._parse_problem(problem_text)
+            yield {"type": "parsed", "parseResult": parse_result}
+
+            solution = yield from self.solve_stream(problem_text, parse_result)
+
+        history_id = None
+        if user_id:
+            history_record = History(
+                user_id=user_id,
+                username=input_data.get("username"),
+                question=problem_text,
+                parse_result=parse_result,
+                solution=solution,
+            )
+            history_writer.save(history_record)
+            history_id = history_record.id
+        yield {"type": "done", "historyId": history_id}
+
+    def recognize_only(self, image) -> Dict:
+        try:
+            text = self._recognize_image(image)
             return {"success": True, "data": {"text": text}}
         except Exception as exc:  # noqa: BLE001
             return {"success": False, "error": str(exc)}
 
     def parse_only(self, text: str) -> Dict:
         try:
-            parse_result = ai_service.parse_problem(text)
+            parse_result = self._parse_problem(text)
             return {"success": True, "data": parse_result}
         except Exception as exc:  # noqa: BLE001
             return {"success": False, "error": str(exc)}
 
     def solve_only(self, text: str, parse_result: Dict) -> Dict:
         try:
-            solution = ai_service.generate_solution(text, parse_result)
-            return {"success": True, "data": solution}
+            solution, cached = self._generate_solution(text, parse_result)
+            return {"success": True, "data": solution, "cached": cached}
         except Exception as exc:  # noqa: BLE001
             return {"success": False, "error": str(exc)}
 
-    def solve_stream(self, text: str, parse_result: Dict) -> Generator[Dict[str, str], None, None]:
-        yield from ai_service.generate_solution_stream(text, parse_result)
+    def solve_stream(self, text: str, parse_result: Dict) -> Generator[Dict, None, Dict]:
+        """Relay the solution deltas and interleave ``step``/``answer``/``summary`` events.
+
+        Ends with a ``solution`` event carrying the structured result, which is also the
+        generator's return value. Concurrent streams for the same problem share one upstream
+        stream; a late joiner first receives the events buffered so far.
+        """
+        if not current_app.config.get("SINGLE_FLIGHT_ENABLED", True):
+            events = self._solve_stream_events(text, parse_result)
+        else:
+            app = current_app._get_current_object()
+
+            def _start(run):
+                # 上游流在独立线程中读取，发起请求的客户端断开不会影响其他订阅者
+                threading.Thread(
+                    target=_call_in_app_context, args=(app, run), name="solve-stream", daemon=True
+                ).start()
+
+            events = solution_stream_broadcast.subscribe(
+                # 流式解答的提示词与非流式不同，键中加上区分标记
+                self._solution_cache_key(text, parse_result, "stream"),
+                _start,
+                lambda: self._solve_stream_events(text, parse_result),
+            )
+
+        solution: Dict = {}
+        for event in events:
+            if event["type"] == "solution":
+                solution = event["solution"]
+            yield event
+        return solution
+
+    def _solve_stream_events(self, text: str, parse_result: Dict) -> Generator[Dict, None, None]:
+        parser = SolutionStreamParser()
+        reasoning_parts: list[str] = []
+        for chunk in ai_service.generate_solution_stream(text, parse_result):
+            yield chunk
+            if chunk["type"] == "reasoning":
+                reasoning_parts.append(chunk["content"])
+            else:
+                yield from parser.feed(chunk["content"])
+
+        yield from parser.close()
+        solution = parser.result()
+        solution["reasoning"] = "".join(reasoning_parts).strip()
+        yield {"type": "solution", "solution": solution}
 
 
 pipeline_service = PipelineService()
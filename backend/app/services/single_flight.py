@@ -0,0 +1,184 @@
+"""Coalescing of identical in-flight upstream calls (single-flight) within a worker process."""
+
+from __future__ import annotations
+
+import copy
+import threading
+from typing import Callable, Dict, Generator, Hashable, Iterator, Optional
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同一个键同时只执行一次 ``func``，并发的相同调用等待并共享结果（包括异常）。
+
+    只合并正在进行的调用，完成后立即移除；之后的相同请求由结果缓存负责。
+    合并范围是单个 worker 进程，gevent 下 threading 已被 monkey patch，同样适用。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = {"calls": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key: Hashable, func: Callable, *args) -> tuple[object, bool]:
+        """返回 ``(结果, 是否复用了其他请求的调用)``。"""
+        with self._lock:
+            self._counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # 结果可能被调用方修改，等待者拿到各自的副本
+            return copy.deepcopy(call.value), True
+
+        try:
+            call.value = func(*args)
+            return call.value, False
+        except BaseException as exc:
+            call.error = exc
+            with self._lock:
+                self._counters["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["inFlight"] = len(self._calls)
+        return counters
+
+
+class _Broadcast:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.events: list = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+
+
+class StreamBroadcast:
+    """同一个键同时只运行一个事件生成器，所有订阅者收到完全相同的事件序列。
+
+    生成器在后台线程中运行，事件全部缓存在内存里；中途加入的订阅者先回放已缓存的事件，
+    再跟随实时事件。生成器抛出的异常在每个订阅者读完已缓存事件后重新抛出。
+    所有订阅者都断开后停止读取上游。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._broadcasts: Dict[Hashable, _Broadcast] = {}
+        self._counters = {"streams": 0, "joined": 0, "replayedEvents": 0, "abandoned": 0}
+
+    def subscribe(
+        self,
+        key: Hashable,
+        start: Callable[[Callable[[], Iterator]], None],
+        produce: Callable[[], Iterator],
+    ) -> Generator:
+        """订阅 ``key`` 的事件流；没有在途的流时调用 ``start(run)``，由调用方决定在哪个线程里执行 ``run``。"""
+        with self._lock:
+            broadcast = self._broadcasts.get(key)
+            leader = broadcast is None
+            if leader:
+                broadcast = self._broadcasts[key] = _Broadcast()
+                self._counters["streams"] += 1
+            else:
+                self._counters["joined"] += 1
+                self._counters["replayedEvents"] += len(broadcast.events)
+            broadcast.subscribers += 1
+
+        if leader:
+            try:
+                start(lambda: self._run(key, broadcast, produce))
+            except BaseException as exc:
+                self._finish(key, broadcast, exc)
+                raise
+        return self._follow(broadcast)
+
+    def _finish(self, key: Hashable, broadcast: _Broadcast, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            if self._broadcasts.get(key) is broadcast:
+                del self._broadcasts[key]
+        with broadcast.condition:
+            broadcast.error = error
+            broadcast.finished = True
+            broadcast.condition.notify_all()
+
+    def _run(self, key: Hashable, broadcast: _Broadcast, produce: Callable[[], Iterator]) -> None:
+        error = None
+        events = None
+        try:
+            events = produce()
+            for event in events:
+                with self._lock:
+                    # 订阅者计数与新订阅在同一把锁下判断，放弃时先移除，之后的请求会重新发起
+                    abandoned = broadcast.subscribers == 0
+                    if abandoned:
+                        self._counters["abandoned"] += 1
+                        if self._broadcasts.get(key) is broadcast:
+                            del self._broadcasts[key]
+                if abandoned:
+                    break
+                with broadcast.condition:
+                    broadcast.events.append(event)
+                    broadcast.condition.notify_all()
+        except BaseException as exc:  # noqa: BLE001
+            error = exc
+        finally:
+            close = getattr(events, "close", None)
+            if close is not None:
+                close()
+            self._finish(key, broadcast, error)
+
+    def _follow(self, broadcast: _Broadcast) -> Generator:
+        index = 0
+        try:
+            while True:
+                with broadcast.condition:
+                    while index == len(broadcast.events) and not broadcast.finished:
+                        broadcast.condition.wait()
+                    pending = broadcast.events[index:]
+                    finished = broadcast.finished
+                index += len(pending)
+                yield from pending
+                if finished and index == len(broadcast.events):
+                    break
+        finally:
+            with self._lock:
+                broadcast.subscribers -= 1
+
+        if broadcast.error is not None:
+            raise broadcast.error
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["inFlight"] = len(self._broadcasts)
+        return counters
+
+
+ocr_flight = SingleFlight("ocr")
+parse_flight = SingleFlight("parse")
+solution_flight = SingleFlight("solution")
+solution_stream_broadcast = StreamBroadcast("solutionStream")
@@ -0,0 +1,245 @@
+"""Incremental structured parsing of streamed solution text."""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Optional
+
+from app.services.chatglm_service import (
+    ANSWER_INLINE_RE,
+    JSON_SOLUTION_MARKERS,
+    NUMBERED_LINE_RE,
+    SECTION_ALIASES,
+    STEP_PREFIX_RE,
+    STEP_SPLIT_RE,
+    SUMMARY_INLINE_RE,
+    ChatGLMService,
+)
+
+# 与 HEADING_CANDIDATE_RE 相同的标题语法，按行匹配；第二个分组为标题同一行后面的正文
+_HEADING_LINE_RE = re.compile(
+    r"^\s*(?:#{1,6}\s*)?(?:【\s*)?(" + "|".join(SECTION_ALIASES) + r")(?:\s*】)?\s*[:：]?\s*(.*)$"
+)
+
+
+class SolutionStreamParser:
+    """Turn ``content`` deltas into ``step``/``answer``/``summary`` events as they become final.
+
+    Text is consumed line by line: each character is buffered once and every completed line
+    is classified once, so total work is linear in the stream length. A step is final when
+    its line ends; the answer and summary are final when the next heading starts or the
+    stream ends. :meth:`close` applies the same fallbacks as
+    ``ChatGLMService._extract_solution_sections`` (paragraphs, numbered lines, inline
+    answer/summary) from state collected along the way instead of re-scanning the text.
+    Output that contains a code fence or a ``{`` line, has no heading at all, or uses a
+    heading layout the line-based pass cannot mirror is parsed once in full with
+    ``ChatGLMService.parse_solution_content`` at the end instead.
+    """
+
+    def __init__(self):
+        self._chunks: list[str] = []
+        self._line_parts: list[str] = []
+        self._sections: Dict[str, list[str]] = {}
+        self._current: Optional[str] = None
+        self._steps: list[str] = []
+        self._emitted: Dict[str, str] = {}
+        self._heading_seen = False
+
+        self._paragraphs: list[str] = []
+        self._paragraph_lines: list[str] = []
+        self._numbered_lines: list[str] = []
+        self._answer_inline = ""
+        self._summary_inline = ""
+        self._needs_full_parse = False
+        self._bare_heading = False
+        self._result: Optional[Dict] = None
+
+    def feed(self, delta: str) -> list[Dict]:
+        if not delta:
+            return []
+        self._chunks.append(delta)
+
+        if "\n" not in delta:
+            self._line_parts.append(delta)
+            return []
+
+        events: list[Dict] = []
+        lines = delta.split("\n")
+        self._line_parts.append(lines[0])
+        events.extend(self._consume_line("".join(self._line_parts)))
+        for line in lines[1:-1]:
+            events.extend(self._consume_line(line))
+        self._line_parts = [lines[-1]]
+        return events
+
+    def close(self) -> list[Dict]:
+        """Flush the trailing line and emit everything that only becomes final at the end.
+
+        Steps, answer and summary that differ from what was streamed are emitted again with
+        the final text, so the last event of each kind always matches :meth:`result`.
+        """
+        if self._result is not None:
+            return []
+
+        events = self._consume_line("".join(self._line_parts))
+        self._line_parts = []
+        events.extend(self._close_section())
+        self._close_paragraph()
+
+        if self._needs_full_parse or not self._heading_seen:
+            # 输出了 JSON（可能前面还有一段说明文字）、没有按模板写标题或标题排版特殊时，
+            # 逐行状态不可靠，对完整文本走一次非流式的解析流程
+            result = ChatGLMService.parse_solution_content("".join(self._chunks))
+        else:
+            result = self._sections_result()
+        self._result = result
+
+        for index, step in enumerate(result["steps"]):
+            if index >= len(self._steps) or self._steps[index] != step:
+                events.append({"type": "step", "index": index, "text": step})
+        for name in ("answer", "summary"):
+            if result[name] and self._emitted.get(name) != result[name]:
+                self._emitted[name] = result[name]
+                events.append({"type": name, "text": result[name]})
+        return events
+
+    def result(self) -> Dict:
+        """Final structured solution, equivalent to ``ChatGLMService.parse_solution_content``."""
+        self.close()
+        result = dict(self._result)
+        result["steps"] = list(result["steps"])
+        return result
+
+    def _sections_result(self) -> Dict:
+        result = ChatGLMService._empty_solution_result()
+        result["thinking"] = self._section_text("thinking")
+        result["steps"] = list(self._steps)
+        result["answer"] = self._section_text("answer")
+        result["summary"] = self._section_text("summary")
+
+        steps_text = self._section_text("steps")
+        if steps_text and not result["steps"]:
+            # 与 _normalize_steps_field 一致：逐行清理后为空时按句号/分号切分
+            result["steps"] = [item.strip() for item in STEP_SPLIT_RE.split(steps_text) if item.strip()]
+
+        if not ChatGLMService._has_solution_content(result):
+            paragraphs = self._paragraphs
+            if paragraphs:
+                result["thinking"] = paragraphs[0]
+                if len(paragraphs) > 1:
+                    result["summary"] = paragraphs[-1]
+                middle = paragraphs[1:-1] if len(paragraphs) > 2 else paragraphs[1:]
+                result["steps"] = [item for item in middle if item]
+            if self._numbered_lines and not result["steps"]:
+                result["steps"] = list(self._numbered_lines)
+
+        if not result["answer"]:
+            if self._answer_inline:
+                result["answer"] = self._answer_inline
+            elif result["steps"]:
+                result["answer"] = str(result["steps"][-1]).strip()
+
+        if not result["summary"]:
+            if self._summary_inline:
+                result["summary"] = self._summary_inline
+            elif len(self._paragraphs) > 1:
+                tail = self._paragraphs[-1]
+                if tail and tail != result["answer"]:
+                    result["summary"] = tail
+
+        result["steps"] = [str(item).strip() for item in result["steps"] if str(item).strip()]
+        if not result["answer"]:
+            hint_text = "\n".join(
+                part for part in ["".join(self._chunks), result["thinking"], result["summary"]] if part
+            )
+            result["answer"] = ChatGLMService._infer_answer_from_free_text(hint_text)
+        if not result["summary"]:
+            if result["thinking"] and result["thinking"] != result["answer"]:
+                result["summary"] = result["thinking"]
+            elif result["answer"]:
+                result["summary"] = result["answer"]
+        return result
+
+    def _consume_line(self, line: str) -> list[Dict]:
+        self._track_fallbacks(line)
+
+        events: list[Dict] = []
+        heading = _HEADING_LINE_RE.match(line)
+        # 标题行后面紧跟另一个标题或以冒号开头的行时，非流式解析的标题正则会跨行匹配，
+        # 结果与按行切分不同，这种少见的排版交给完整解析
+        if self._bare_heading and (heading or line.lstrip().startswith((":", "："))):
+            self._needs_full_parse = True
+        self._bare_heading = bool(heading) and not heading.group(2).strip()
+        if heading:
+            self._heading_seen = True
+            events.extend(self._close_section())
+            name = SECTION_ALIASES[heading.group(1)]
+            # 与 _extract_section 一致：每个部分只取第一次出现的标题
+            self._current = name if name not in self._sections else None
+            if self._current is None:
+                return events
+            self._sections[name] = []
+            line = heading.group(2)
+            if not line.strip():
+                return events
+
+        if self._current is None:
+            return events
+
+        self._sections[self._current].append(line)
+        if self._current == "steps":
+            cleaned = STEP_PREFIX_RE.sub("", line).strip()
+            if cleaned:
+                events.append({"type": "step", "index": len(self._steps), "text": cleaned})
+                self._steps.append(cleaned)
+        return events
+
+    def _close_section(self) -> list[Dict]:
+        name = self._current
+        self._current = None
+        if name not in ("answer", "summary") or name in self._emitted:
+            return []
+        text = self._section_text(name)
+        if not text:
+            return []
+        self._emitted[name] = text
+        return [{"type": name, "text": text}]
+
+    def _section_text(self, name: str) -> str:
+        return "\n".join(self._sections.get(name, [])).strip()
+
+    def _track_fallbacks(self, line: str) -> None:
+        stripped = line.strip()
+        # 任意位置出现代码块或以 { 开头的行都可能是 JSON（模型常在 JSON 前先写一段说明）
+        if not self._needs_full_parse and (
+            stripped.startswith("```")
+            or stripped.startswith("{")
+            or any(marker in line for marker in JSON_SOLUTION_MARKERS)
+        ):
+            self._needs_full_parse = True
+
+        if line == "":
+            self._close_paragraph()
+        else:
+            self._paragraph_lines.append(line)
+
+        if NUMBERED_LINE_RE.match(stripped):
+            cleaned = NUMBERED_LINE_RE.sub("", stripped).strip()
+            if cleaned:
+                self._numbered_lines.append(cleaned)
+
+        if not self._answer_inline:
+            match = ANSWER_INLINE_RE.search(line)
+            if match:
+                self._answer_inline = match.group(1).strip()
+        if not self._summary_inline:
+            match = SUMMARY_INLINE_RE.search(line)
+            if match:
+                self._summary_inline = match.group(1).strip()
+
+    def _close_paragraph(self) -> None:
+        if self._paragraph_lines:
+            paragraph = "\n".join(self._paragraph_lines).strip()
+            if paragraph:
+                self._paragraphs.append(paragraph)
+            self._paragraph_lines = []
@@ -0,0 +1,29 @@
+"""Request authentication helpers."""
+
+from __future__ import annotations
+
+from flask import g, request
+from flask_jwt_extended import decode_token
+
+
+def _decode_bearer() -> str | None:
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header:
+        return None
+
+    parts = auth_header.split(" ")
+    if len(parts) != 2 or parts[0] != "Bearer":
+        return None
+
+    try:
+        decoded = decode_token(parts[1])
+        return decoded.get("sub")
+    except Exception:  # noqa: BLE001
+        return None
+
+
+def bearer_identity() -> str | None:
+    """请求中有效 Bearer 令牌的用户 id，没有或无效时为 None；同一请求只解码一次（限流也会用到）。"""
+    if "bearer_identity" not in g:
+        g.bearer_identity = _decode_bearer()
+    return g.bearer_identity
@@ -41,6 +41,10 @@ def register_error_handlers(app):
     def handle_404(_error):
         return _json_error("接口不存在", 404)
 
+    @app.errorhandler(413)
+    def handle_request_too_large(_error):
+        return _json_error("请求内容过大", 413)
+
     @app.errorhandler(429)
     def handle_rate_limit(_error):
         return _json_error("请求过于频繁，请稍后再试", 429)
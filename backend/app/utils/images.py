@@ -0,0 +1,103 @@
+"""Image payload helpers."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import json
+
+from app.utils.errors import APIError
+
+
+def decode_image_data(image: str) -> bytes:
+    """Decode a data URL or bare base64 string into raw image bytes."""
+    body = image.split(",", 1)[1] if "," in image else image
+    return base64.b64decode(body, validate=False)
+
+
+def image_digest(image: str) -> str | None:
+    # 按解码后的图片内容计算哈希，同一张图换了 MIME 前缀也能命中
+    try:
+        raw = decode_image_data(image)
+    except (binascii.Error, ValueError):
+        return None
+    if not raw:
+        return None
+    return hashlib.sha256(raw).hexdigest()
+
+
+# 从上传流中每次读取的字节数
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+_MAGIC_MIME_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def _sniff_mime(head: bytes) -> str | None:
+    for magic, mime in _MAGIC_MIME_TYPES:
+        if head.startswith(magic):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class ImagePayload:
+    """一张待识别的图片及其内容哈希和大小。
+
+    上传的图片保存原始字节，发给视觉模型时才编码一次 base64；JSON 中传来的 data URL
+    只解码一次（解码结果留给预处理使用），之后原样转发，不再重新编码。
+    """
+
+    __slots__ = ("mime", "raw", "data_url", "size", "digest")
+
+    def __init__(self, mime: str, raw=None, data_url: str | None = None, size: int | None = None, digest=None):
+        self.mime = mime
+        self.raw = raw
+        self.data_url = data_url
+        self.size = size
+        self.digest = digest
+
+    @classmethod
+    def from_stream(cls, stream, mime: str | None, max_size: int) -> "ImagePayload":
+        """边读边计算哈希，超过 max_size 立即停止读取；不是图片或为空时抛出 APIError。"""
+        buffer = bytearray()
+        hasher = hashlib.sha256()
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(buffer) + len(chunk) > max_size:
+                raise APIError("图片大小超过限制", 413)
+            buffer += chunk
+            hasher.update(chunk)
+        if not buffer:
+            raise APIError("缺少图片数据", 400)
+
+        # 客户端没有给出具体类型时按文件头识别
+        if not mime or not mime.startswith("image/"):
+            mime = _sniff_mime(bytes(buffer[:16]))
+            if mime is None:
+                raise APIError("不支持的图片格式", 400)
+        return cls(mime, raw=buffer, size=len(buffer), digest=hasher.hexdigest())
+
+    @classmethod
+    def from_data_url(cls, image: str) -> "ImagePayload":
+        """无法解码时 size 和 digest 为 None，仍按原样交给视觉模型。"""
+        try:
+            raw = decode_image_data(image)
+        except (binascii.Error, ValueError):
+            return cls("", data_url=image)
+        digest = hashlib.sha256(raw).hexdigest() if raw else None
+        return cls("", raw=raw, data_url=image, size=len(raw), digest=digest)
+
+    def data_url_parts(self) -> list[bytes]:
+        """拼进上游 JSON 请求体的 data URL（已按 JSON 字符串转义），分段返回以免再复制一次。"""
+        if self.data_url is not None:
+            return [json.dumps(self.data_url)[1:-1].encode("ascii")]
+        return [f"data:{self.mime};base64,".encode("ascii"), base64.b64encode(self.raw)]
@@ -0,0 +1,94 @@
+"""MinHash LSH band keys over character n-grams of problem text.
+
+Each band hashes every n-gram with its own universal hash function and keeps the
+``ROWS_PER_BAND`` smallest values (a bottom-k MinHash sketch). Two texts share a band key
+when the k smallest hashes of their union all come from the intersection, which happens with
+probability close to ``J ** k`` for Jaccard similarity ``J``. This gives the usual LSH S-curve
+while hashing each n-gram once per band, not once per row.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import struct
+import unicodedata
+import zlib
+
+from app.utils.text import normalize_problem_text
+
+# 字符 3-gram：中文不需要分词，OCR 错一个字只影响相邻的 3 个片段
+SHINGLE_SIZE = 3
+# 8 段、每段取最小的 4 个哈希：Jaccard 0.8 的两道题至少一段相同的概率约 98%，0.9 时接近 100%，0.5 时约 35%
+NUM_BANDS = 8
+ROWS_PER_BAND = 4
+
+_MERSENNE_PRIME = (1 << 61) - 1
+# 段键会写入数据库，哈希参数必须固定；修改这里的任何常量都需要重新生成全部段键
+_rng = random.Random(20240613)
+_HASHES = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_BANDS)]
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+# 只在句子层面起作用的标点，去掉后不改变题意；～（范围）、·（点乘）、〈〉（向量夹角）可能是数学记号，不在其中
+_CJK_SENTENCE_PUNCTUATION = frozenset("，。、；：？！…“”‘’「」『』《》【】")
+_ASCII_SENTENCE_PUNCTUATION = frozenset(",.;:?")
+_ASCII_ALNUM = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+
+
+def canonical_text(text: str) -> str:
+    return normalize_problem_text(text).lower()
+
+
+def shingles(text: str) -> set[str]:
+    """规范化后的字符 n-gram 集合；短于 n 的文本整体作为一个片段。"""
+    canonical = canonical_text(text)
+    if len(canonical) <= SHINGLE_SIZE:
+        return {canonical} if canonical else set()
+    return {canonical[i : i + SHINGLE_SIZE] for i in range(len(canonical) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(left: set, right: set) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def band_keys(text: str) -> list[int] | None:
+    """每段压成一个 63 位整数（可直接存进 SQLite INTEGER）；空文本返回 None。"""
+    items = shingles(text)
+    if not items:
+        return None
+    hashes = [zlib.crc32(item.encode("utf-8")) for item in items]
+    keys = []
+    for a, b in _HASHES:
+        smallest = sorted([(a * value + b) % _MERSENNE_PRIME for value in hashes])[:ROWS_PER_BAND]
+        # 片段不足 k 个时补 0，保证打包长度一致
+        smallest += [0] * (ROWS_PER_BAND - len(smallest))
+        digest = hashlib.blake2b(struct.pack(f"<{ROWS_PER_BAND}Q", *smallest), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little") & ((1 << 63) - 1))
+    return keys
+
+
+def skeleton(text: str) -> str:
+    """去掉空白和句读标点后的文本，用于判断两道题是否只在排版上不同。
+
+    大小写、字母、数字、汉字以及运算符和括号（^ ( ) [ ] { } - + * / = ! % ' 等）全部保留：
+    f(x)=x^2+1 与 f(x)=x2+1、2(x+1) 与 2x+1、A 与 a 都是不同的题。
+    """
+    # 全角句读在折叠成 ASCII 之前去掉，全角 ！ 与阶乘 ! 不会混淆
+    text = "".join(char for char in unicodedata.normalize("NFC", text or "") if char not in _CJK_SENTENCE_PUNCTUATION)
+    compact = "".join(char for char in normalize_problem_text(text) if not char.isspace())
+    # ASCII , . ; : ? 夹在两个字母或数字之间时是小数点、分隔符或比例（3.5、{1,2,3}、1:2），保留
+    return "".join(
+        char
+        for index, char in enumerate(compact)
+        if char not in _ASCII_SENTENCE_PUNCTUATION
+        or 0 < index < len(compact) - 1
+        and compact[index - 1] in _ASCII_ALNUM
+        and compact[index + 1] in _ASCII_ALNUM
+    )
+
+
+def numbers(text: str) -> list[str]:
+    """题目中依次出现的数字。只差一个数字的两道题字面上很像，答案却不同。"""
+    return _NUMBER_RE.findall(canonical_text(text))
@@ -0,0 +1,24 @@
+"""Opaque keyset-pagination cursors."""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from app.utils.errors import APIError
+
+
+def encode_cursor(created_at: datetime, record_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), str(record_id)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise APIError("无效的分页游标", 400) from None
@@ -0,0 +1,130 @@
+"""Rate limit keys, per-endpoint costs and a SQLite counter storage shared by workers."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from flask import current_app, request
+from limits.errors import ConfigurationError
+from limits.storage import Storage
+
+from app.utils.auth import bearer_identity
+
+# 过期计数行的清理间隔（秒）
+PURGE_INTERVAL_SECONDS = 60
+
+
+def rate_limit_key() -> str:
+    """携带有效 JWT 时按用户计数，否则按客户端 IP（经 ProxyFix 还原后的地址）。"""
+    user_id = bearer_identity()
+    if user_id:
+        return f"user:{user_id}"
+    return f"ip:{request.remote_addr or 'unknown'}"
+
+
+@lru_cache(maxsize=8)
+def _parse_costs(value: str) -> dict:
+    costs = {}
+    for item in value.split(","):
+        path, _, cost = item.strip().partition("=")
+        if path and cost.strip().isdigit():
+            costs[path.strip()] = int(cost)
+    return costs
+
+
+def rate_limit_cost() -> int:
+    """本次请求从额度中扣除的数量，按 RATE_LIMIT_COSTS 中的路由规则查找，未列出的为 1。"""
+    rule = request.url_rule.rule if request.url_rule else request.path
+    return _parse_costs(current_app.config.get("RATE_LIMIT_COSTS", "")).get(rule, 1)
+
+
+class SQLiteStorage(Storage):
+    """把固定窗口计数保存在 SQLite 文件中，同一台机器上的所有 worker 进程共享。
+
+    URI 形如 ``sqlite:////abs/path/ratelimit.db``。每次计数是一条 UPSERT ... RETURNING，
+    在 SQLite 的写锁内完成，多个进程并发累加也不会丢失。只支持 fixed-window 策略。
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # 与 SQLAlchemy 相同：sqlite:///相对路径，sqlite:////绝对路径；内存库无法在进程间共享，不支持
+        self.path = uri.split("://", 1)[1][1:]
+        if not self.path or self.path == ":memory:":
+            raise ConfigurationError("sqlite 限流存储需要数据库文件路径，例如 sqlite:////app/backend/data/ratelimit.db")
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = int(options.get("busy_timeout_ms", 5000))
+        self._local = threading.local()
+        self._next_purge = 0.0
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 连接不能跨线程使用，每个线程各开一个；preload_app 下存储在 master 中创建，
+        # fork 出的 worker 不能沿用 master 的连接。自动提交，每条语句即一个事务
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 计数丢失最多意味着多放行一个窗口的请求，不必每次提交都 fsync
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        now = time.time()
+        conn = self._connection()
+        if now >= self._next_purge:
+            self._next_purge = now + PURGE_INTERVAL_SECONDS
+            conn.execute("DELETE FROM rate_limits WHERE expires_at <= ?", (now,))
+        # 窗口已过期时从 amount 重新计数，否则在原窗口内累加
+        row = conn.execute(
+            "INSERT INTO rate_limits (key, count, expires_at) VALUES (?1, ?2, ?3) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "count = CASE WHEN expires_at <= ?4 THEN excluded.count ELSE count + excluded.count END, "
+            "expires_at = CASE WHEN expires_at <= ?4 THEN excluded.expires_at ELSE expires_at END "
+            "RETURNING count",
+            (key, amount, now + expiry, now),
+        ).fetchone()
+        return row[0]
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute(
+            "SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    def reset(self) -> int | None:
+        return self._connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
@@ -0,0 +1,33 @@
+"""Text normalisation helpers used to build cache keys."""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+# \, \; \: \! \> "\ " 以及 \quad 一类 LaTeX 间距命令，对题意没有影响
+_LATEX_SPACING_RE = re.compile(
+    r"\\(?:[,;:!> ]|(?:qquad|quad|enspace|thinspace|medspace|thickspace|negthinspace)(?![A-Za-z]))"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+_ASCII_WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+# 只折叠全角 ASCII（U+FF01–FF5E）和全角空格；不用 NFKC，它会把 x² 变成 x2、a₁ 变成 a1，不同的题目得到相同的键
+_FULLWIDTH_TABLE = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+_FULLWIDTH_TABLE[0x3000] = 0x20
+
+
+def _fold_whitespace(match: re.Match) -> str:
+    # 只有两个英文单词/数字之间的空白有意义（如 "\sin x"、"12 34"），其余空白全部去掉
+    source = match.string
+    start, end = match.span()
+    if 0 < start and end < len(source):
+        if source[start - 1] in _ASCII_WORD_CHARS and source[end] in _ASCII_WORD_CHARS:
+            return " "
+    return ""
+
+
+def normalize_problem_text(text: str) -> str:
+    """Fold whitespace, full-width forms and LaTeX spacing so equivalent problems compare equal."""
+    normalized = unicodedata.normalize("NFC", text or "").translate(_FULLWIDTH_TABLE)
+    normalized = _LATEX_SPACING_RE.sub(" ", normalized).strip()
+    return _WHITESPACE_RE.sub(_fold_whitespace, normalized)
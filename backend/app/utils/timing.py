@@ -0,0 +1,72 @@
+"""Per-request stage timings reported through the ``Server-Timing`` response header."""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from flask import Flask, Response, g, has_app_context
+
+
+class StageTimings:
+    """同一请求内各阶段的累计耗时；推测执行时阶段会在线程池中并行记录，需要加锁。"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+    def __bool__(self) -> bool:
+        return bool(self._stages)
+
+    def header_value(self) -> str:
+        with self._lock:
+            stages = dict(self._stages)
+        stages["total"] = time.perf_counter() - self.started
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items())
+
+
+def current_timings() -> Optional[StageTimings]:
+    if not has_app_context():
+        return None
+    return g.get("stage_timings")
+
+
+@contextmanager
+def timed(name: str, timings: Optional[StageTimings] = None) -> Iterator[None]:
+    """记录代码块耗时；未启用 SERVER_TIMING_ENABLED 时不做任何事。"""
+    # StageTimings 在记录第一个阶段前为假值，不能用 or，否则显式传入的空计时被忽略
+    if timings is None:
+        timings = current_timings()
+    if timings is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def register_server_timing(app: Flask) -> None:
+    if not app.config.get("SERVER_TIMING_ENABLED"):
+        return
+
+    @app.before_request
+    def start_stage_timings():
+        g.stage_timings = StageTimings()
+
+    @app.after_request
+    def add_server_timing_header(response: Response) -> Response:
+        # 流式响应的阶段在响应头发出之后才执行，此时没有可报告的阶段
+        timings = g.get("stage_timings")
+        if timings:
+            response.headers["Server-Timing"] = timings.header_value()
+        return response
@@ -0,0 +1,142 @@
+"""Helpers shared by the benchmark scripts: ports, gunicorn launcher, history seeding and percentiles."""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+import requests
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# 填充历史记录时每批提交的行数
+SEED_BATCH_SIZE = 10000
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_http(url: str, timeout: float = 30) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return True
+        except requests.RequestException:
+            time.sleep(0.2)
+    return False
+
+
+def start_app(
+    port: int,
+    workdir: str,
+    *,
+    workers: int,
+    worker_class: str,
+    env: Optional[dict] = None,
+    log_path: Optional[str] = None,
+) -> subprocess.Popen:
+    """用 gunicorn.conf.py 启动真实应用，数据库放在 ``workdir``，等待 /api/health 可访问后返回。"""
+    app_env = dict(os.environ)
+    app_env.update(
+        {
+            "FLASK_ENV": "production",
+            "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+            "OCR_CACHE_DIR": f"{workdir}/cache/ocr",
+            "RATE_LIMIT_MAX_REQUESTS": "1000000",
+            "RATE_LIMIT_STORAGE_URI": f"sqlite:///{workdir}/ratelimit.db",
+            "GUNICORN_BIND": f"127.0.0.1:{port}",
+            "GUNICORN_WORKERS": str(workers),
+            "GUNICORN_WORKER_CLASS": worker_class,
+        }
+    )
+    app_env.update(env or {})
+
+    log = open(log_path, "ab") if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=PROJECT_ROOT,
+        env=app_env,
+        stdout=log,
+        stderr=log,
+    )
+    if not wait_for_http(f"http://127.0.0.1:{port}/api/health"):
+        process.kill()
+        raise RuntimeError("gunicorn 未能在 30 秒内启动")
+    return process
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def seed_histories(
+    path: str,
+    records: int,
+    make_record: Callable[[int], dict],
+    *,
+    users: int = 1,
+    interval: timedelta = timedelta(seconds=1),
+    create_schema: bool = True,
+) -> list[str]:
+    """绕过 ORM 用 sqlite3 直接写入 ``records`` 条历史记录，返回用户 id 列表。
+
+    ``make_record(index)`` 返回该条记录的列值（如 question、parse_result、solution、subject），
+    dict 类型的值按 JSON 写入；id、user_id 和 created_at 由这里填写，记录依次分给 ``users`` 个用户，
+    创建时间从 2026-01-01 起每条递增 ``interval``。``create_schema`` 为假时表已由调用方建好。
+    """
+    if create_schema:
+        from app import create_app
+
+        create_app("production")
+
+    conn = sqlite3.connect(path)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    conn.executemany(
+        "INSERT INTO users (id, username, created_at) VALUES (?, ?, '2026-01-01 00:00:00.000000')",
+        [(user_id, "bench" if users == 1 else f"bench{i}") for i, user_id in enumerate(user_ids)],
+    )
+    started = datetime(2026, 1, 1)
+    columns, rows = None, []
+    for index in range(records):
+        record = make_record(index)
+        if columns is None:
+            columns = ["id", "user_id", *record, "created_at"]
+        values = [json.dumps(value, ensure_ascii=False) if isinstance(value, dict) else value for value in record.values()]
+        created_at = (started + interval * index).strftime("%Y-%m-%d %H:%M:%S.%f")
+        rows.append((str(uuid.uuid4()), user_ids[index % users], *values, created_at))
+        if len(rows) == SEED_BATCH_SIZE:
+            _insert_histories(conn, columns, rows)
+            rows = []
+    if rows:
+        _insert_histories(conn, columns, rows)
+    conn.close()
+    return user_ids
+
+
+def _insert_histories(conn: sqlite3.Connection, columns: list[str], rows: list[tuple]) -> None:
+    conn.executemany(f"INSERT INTO histories ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+    conn.commit()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,149 @@
+"""Near-duplicate lookup latency and recall over a large history table.
+
+Fills a temporary SQLite database with ``--records`` distinct questions (written with sqlite3
+directly), creates the app with ``DEDUP_MODE=serve`` so that ``ensure_question_signatures``
+backfills the band keys, and times it. Then looks up three kinds of probes through
+``question_dedup.find``: stored questions with one or two characters changed (OCR noise) or
+whitespace added, which should match; the same questions with one number changed, which must
+not; and unrelated questions. Reports hit rates and lookup latency, split into computing the
+band keys and the database work.
+
+    python benchmarks/dedup_bench.py
+    python benchmarks/dedup_bench.py --records 500000 --probes 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from common import seed_histories  # noqa: E402
+
+SUBJECTS = ["函数", "数列", "三角", "向量", "概率", "导数", "立体几何", "圆锥曲线", "不等式", "复数"]
+CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可也你对生能而子那得于着下自之年过发后作里"
+OCR_NOISE = "己已未末土士曰日戊戌"
+
+
+def make_question(rng: random.Random, index: int) -> str:
+    topic = rng.choice(SUBJECTS)
+    filler = "".join(rng.choice(CHARS) for _ in range(rng.randint(25, 60)))
+    return f"第{index}题（{topic}）：已知参数 a = {rng.randint(1, 99)}，b = {rng.randint(1, 99)}，{filler}，求满足条件的值。"
+
+
+def perturb(rng: random.Random, question: str, kind: str) -> str:
+    chars = list(question)
+    if kind == "number":
+        positions = [i for i, char in enumerate(chars) if char.isdigit()]
+        position = rng.choice(positions)
+        chars[position] = str((int(chars[position]) + 1) % 10)
+        return "".join(chars)
+    # OCR 噪声：替换 1–2 个汉字并插入空白
+    positions = [i for i, char in enumerate(chars) if char in CHARS]
+    for position in rng.sample(positions, min(len(positions), rng.randint(1, 2))):
+        chars[position] = rng.choice(OCR_NOISE)
+    # 空白插在数字中间会让题目变成另一道题，只插在非数字字符之间
+    gaps = [i for i in range(1, len(chars)) if not (chars[i - 1].isdigit() or chars[i].isdigit())]
+    chars.insert(rng.choice(gaps), " ")
+    return "".join(chars)
+
+
+def build_database(path: str, records: int, rng: random.Random) -> list[str]:
+    questions = []
+
+    def make_record(index: int) -> dict:
+        questions.append(make_question(rng, index))
+        return {"question": questions[-1], "parse_result": {}, "solution": {"steps": ["代入计算。"], "answer": "1"}}
+
+    seed_histories(path, records, make_record)
+    return questions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--probes", type=int, default=300, help="每类探测题目数")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="dedup-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{db_path}",
+            "DEDUP_MODE": "serve",
+            "DEDUP_THRESHOLD": str(args.threshold),
+        }
+    )
+    questions = build_database(db_path, args.records, rng)
+
+    from app import create_app
+    from app.models.question_signature import QuestionSignature
+    from app.services.dedup_service import question_dedup
+
+    started = time.perf_counter()
+    app = create_app("production")
+    backfill_seconds = time.perf_counter() - started
+
+    sample = rng.sample(questions, args.probes)
+    probes = {
+        "ocrNoise": [perturb(rng, question, "ocr") for question in sample],
+        "numberChanged": [perturb(rng, question, "number") for question in sample],
+        "unrelated": [make_question(rng, args.records + index) for index in range(args.probes)],
+    }
+
+    report = {
+        "records": args.records,
+        "threshold": args.threshold,
+        "backfillSeconds": round(backfill_seconds, 1),
+        "probes": {},
+    }
+    with app.app_context():
+        for kind, texts in probes.items():
+            hits, lookup_ms, keys_ms = 0, [], []
+            for text in texts:
+                started = time.perf_counter()
+                QuestionSignature.band_values(text)
+                keys_ms.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                hits += 1 if question_dedup.find(text) else 0
+                lookup_ms.append((time.perf_counter() - started) * 1000)
+            report["probes"][kind] = {
+                "hitRate": round(hits / len(texts), 3),
+                "lookupMsP50": round(statistics.median(lookup_ms), 3),
+                "lookupMsP95": round(sorted(lookup_ms)[int(len(lookup_ms) * 0.95)], 3),
+                "bandKeysMsP50": round(statistics.median(keys_ms), 3),
+            }
+        report["dedup"] = question_dedup.stats()
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(
+        f"{args.records} 条记录，阈值 {args.threshold}，补齐段键 {report['backfillSeconds']} 秒，"
+        f"每类 {args.probes} 个探测"
+    )
+    print(f"{'probe':<15}{'hit rate':>10}{'p50 ms':>10}{'p95 ms':>10}{'keys ms':>10}")
+    for kind, item in report["probes"].items():
+        print(
+            f"{kind:<15}{item['hitRate']:>10}{item['lookupMsP50']:>10}{item['lookupMsP95']:>10}"
+            f"{item['bandKeysMsP50']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
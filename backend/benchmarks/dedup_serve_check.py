@@ -0,0 +1,81 @@
+"""Check which near-duplicate questions ``DEDUP_MODE=serve`` may answer from history.
+
+Stores one question per case in a temporary database and looks up its variant through
+``question_dedup.find`` at ``DEDUP_THRESHOLD=0.9``. Variants that differ only in whitespace or
+sentence punctuation must come back servable; variants that change the problem (a dropped
+exponent or bracket, a changed letter case, a keyword) must not, even though their 3-gram
+similarity clears the threshold. Any change to ``minhash.skeleton`` must keep this script
+passing.
+
+    python benchmarks/dedup_serve_check.py      # 不符合预期时以非零状态退出
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+PREFIX = "已知函数的定义域为全体实数，且满足题设中给出的全部条件，结合函数的单调性与奇偶性进行分析，"
+SUFFIX = "，请写出完整的推导过程，求出函数在给定区间上的最小值，并说明取得最小值时自变量的取值。"
+
+# (名称, 已有题目, 新题目, 是否可直接复用)
+CASES = [
+    ("whitespace", f"{PREFIX}f(x)=x^2+1{SUFFIX}", f"{PREFIX} f(x) = x^2 + 1 {SUFFIX}", True),
+    ("fullwidth_punctuation", f"{PREFIX}f(x)=x^2+1{SUFFIX}", f"{PREFIX.replace('，', ',')}f(x)=x^2+1{SUFFIX}。", True),
+    ("sentence_punctuation", f"{PREFIX}f(x)=x^2+1{SUFFIX}", f"{PREFIX}f(x)=x^2+1：{SUFFIX}？", True),
+    ("exponent_dropped", f"{PREFIX}f(x)=x^2+1{SUFFIX}", f"{PREFIX}f(x)=x2+1{SUFFIX}", False),
+    ("brackets_dropped", f"{PREFIX}g(x)=2(x+1)，x∈R{SUFFIX}", f"{PREFIX}g(x)=2x+1，x∈R{SUFFIX}", False),
+    ("interval_bracket", f"{PREFIX}f(x)=x^2+1，x∈[0,1]{SUFFIX}", f"{PREFIX}f(x)=x^2+1，x∈(0,1]{SUFFIX}", False),
+    ("letter_case", f"{PREFIX}集合A={{1,2,3}}{SUFFIX}", f"{PREFIX}集合a={{1,2,3}}{SUFFIX}", False),
+    ("factorial", f"{PREFIX}h(n)=n!+1{SUFFIX}", f"{PREFIX}h(n)=n+1{SUFFIX}", False),
+    ("decimal_point", f"{PREFIX}f(x)=3.5x+1{SUFFIX}", f"{PREFIX}f(x)=35x+1{SUFFIX}", False),
+    ("keyword", f"{PREFIX}下列关于f(x)=x^2+1的说法正确的是{SUFFIX}", f"{PREFIX}下列关于f(x)=x^2+1的说法错误的是{SUFFIX}", False),
+]
+
+
+def main() -> int:
+    workdir = tempfile.mkdtemp(prefix="dedup-serve-check-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'check.db')}",
+            "DEDUP_MODE": "serve",
+            "DEDUP_THRESHOLD": "0.9",
+        }
+    )
+    from app import create_app
+    from app.extensions import db
+    from app.models.history import History
+    from app.models.user import User
+    from app.services.dedup_service import question_dedup
+
+    app = create_app("production")
+    failures = 0
+    with app.app_context():
+        user = User(username="check")
+        db.session.add(user)
+        db.session.flush()
+        for _, stored, _, _ in CASES:
+            db.session.add(
+                History(user_id=user.id, question=stored, parse_result={}, solution={"steps": ["代入计算。"], "answer": "1"})
+            )
+        db.session.commit()
+
+        for name, stored, variant, servable in CASES:
+            match = question_dedup.find(variant)
+            served = bool(match and match["servable"] and match["question"] == stored)
+            similarity = match["similarity"] if match else None
+            status = "ok" if served == servable else "FAIL"
+            failures += status == "FAIL"
+            print(f"[{status}] {name:<24} similarity={similarity} served={served} expected={servable}")
+
+    print(f"{len(CASES) - failures}/{len(CASES)} 项符合预期")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Full history export: paging ``/api/history`` vs streaming ``/api/history/export``.
+
+Fills a temporary SQLite database with ``--records`` history rows of realistic size for one
+user (written with sqlite3 directly), then fetches all of them through the Flask test client:
+
+- ``page``: ``GET /api/history?page=N&limit=100`` until the last page (COUNT + OFFSET per page);
+- ``cursor``: ``GET /api/history?cursor=...&limit=100`` following ``nextCursor``;
+- ``ndjson`` / ``csv`` / ``ndjson.gz``: one streamed ``GET /api/history/export`` response.
+
+Reports wall time and, in a separate pass under tracemalloc, the peak Python heap while one
+response is produced and consumed. ``--records`` can be varied to check that the export
+peak does not grow with history size.
+
+    python benchmarks/history_export_bench.py
+    python benchmarks/history_export_bench.py --records 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from common import seed_histories  # noqa: E402
+
+
+def build_database(path: str, records: int, rng: random.Random) -> str:
+    def make_record(index: int) -> dict:
+        return {
+            "question": f"第 {index} 题：已知函数 f(x) = x² - {rng.randint(1, 9)}x + 3，求最大值。",
+            "subject": "数学",
+            "difficulty": "中等",
+            "parse_result": {"type": "解答题", "subject": "数学", "knowledgePoints": ["二次函数"], "difficulty": "中等"},
+            "solution": {
+                "steps": [f"第 {step} 步：根据题意列式，代入 $x = {rng.randint(1, 99)}$ 计算。" * 8 for step in range(5)],
+                "answer": f"最大值为 {rng.randint(1, 999)}。",
+                "summary": "本题考查二次函数在闭区间上的最值。",
+            },
+        }
+
+    return seed_histories(path, records, make_record)[0]
+
+
+def fetch_pages(client, headers, use_cursor: bool) -> tuple[int, int]:
+    records, size, page, cursor = 0, 0, 1, None
+    while True:
+        query = f"cursor={cursor}" if cursor else f"page={page}"
+        response = client.get(f"/api/history?{query}&limit=100", headers=headers)
+        size += len(response.data)
+        data = response.get_json()["data"]
+        records += len(data["records"])
+        if not data["pagination"]["hasMore"]:
+            return records, size
+        page += 1
+        cursor = data["pagination"]["nextCursor"] if use_cursor else None
+
+
+def fetch_export(client, headers, query: str) -> tuple[int, int]:
+    response = client.get(f"/api/history/export?{query}", headers=headers, buffered=False)
+    lines, size = 0, 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+    response.close()
+    return lines, size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="history-export-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    # 按页读取要发几百个请求，不能被限流
+    os.environ.setdefault("RATE_LIMIT_MAX_REQUESTS", "1000000")
+    user_id = build_database(db_path, args.records, random.Random(args.seed))
+
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+
+    app = create_app("production")
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+    client = app.test_client()
+
+    modes = {
+        "page": lambda: fetch_pages(client, headers, use_cursor=False),
+        "cursor": lambda: fetch_pages(client, headers, use_cursor=True),
+        "ndjson": lambda: fetch_export(client, headers, "format=ndjson"),
+        "csv": lambda: fetch_export(client, headers, "format=csv"),
+        "ndjson.gz": lambda: fetch_export(client, headers, "format=ndjson&gzip=true"),
+    }
+    report = {"records": args.records, "modes": []}
+    for name, run in modes.items():
+        started = time.perf_counter()
+        _, size = run()
+        seconds = time.perf_counter() - started
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report["modes"].append(
+            {
+                "mode": name,
+                "seconds": round(seconds, 2),
+                "recordsPerSecond": round(args.records / seconds),
+                "responseMiB": round(size / 1024 / 1024, 1),
+                "peakHeapMiB": round(peak / 1024 / 1024, 1),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{args.records} 条记录")
+    print(f"{'mode':<12}{'seconds':>9}{'rec/s':>9}{'MiB':>8}{'peak MiB':>10}")
+    for item in report["modes"]:
+        print(
+            f"{item['mode']:<12}{item['seconds']:>9}{item['recordsPerSecond']:>9}"
+            f"{item['responseMiB']:>8}{item['peakHeapMiB']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
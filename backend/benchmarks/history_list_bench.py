@@ -0,0 +1,164 @@
+"""Compare GET /api/history response size and latency for ``view=full`` and ``view=summary``.
+
+Fills a temporary SQLite database with one user's records (solutions sized like real model
+output), then times full pages through the Flask test client and the bare list query.
+``--legacy-layout`` starts from the pre-summary table layout and lets ``upgrade_schema``
+append the new columns, as an upgraded production database would.
+
+    python benchmarks/history_list_bench.py
+    python benchmarks/history_list_bench.py --records 5000 --limit 100 --legacy-layout
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from common import seed_histories  # noqa: E402
+
+LEGACY_SCHEMA = """
+CREATE TABLE users (
+    id VARCHAR(36) PRIMARY KEY, username VARCHAR(20) NOT NULL UNIQUE, password_hash VARCHAR(255),
+    password_legacy VARCHAR(64), created_at DATETIME NOT NULL, last_login_at DATETIME
+);
+CREATE TABLE histories (
+    id VARCHAR(36) PRIMARY KEY, user_id VARCHAR(36) NOT NULL REFERENCES users (id), username VARCHAR(64),
+    question TEXT NOT NULL, parse_result JSON NOT NULL, solution JSON NOT NULL, created_at DATETIME NOT NULL
+);
+CREATE INDEX ix_histories_user_id ON histories (user_id);
+CREATE INDEX ix_histories_created_at ON histories (created_at);
+"""
+
+
+def _sample_record(index: int) -> tuple[str, dict, dict]:
+    question = f"第 {index} 题：已知函数 f(x) = x² - {index % 7 + 2}x + 3，求 f(x) 在区间 [0, 4] 上的最大值和最小值，并说明理由。"
+    parse_result = {
+        "type": "计算题",
+        "subject": ["数学", "物理", "化学"][index % 3],
+        "knowledgePoints": ["二次函数", "函数的单调性", "闭区间上的最值"],
+        "difficulty": ["简单", "中等", "困难"][index % 3],
+    }
+    steps = [f"第 {i} 步：对 f(x) 配方并讨论对称轴与区间端点的位置关系，计算得到相应的函数值。" * 3 for i in range(1, 9)]
+    solution = {
+        "steps": steps,
+        "answer": "最大值为 f(4) = 11，最小值为 f(1) = 2。",
+        "summary": "二次函数在闭区间上的最值取决于对称轴与区间的位置关系。" * 4,
+        "reasoning": "先确定对称轴，再比较端点和顶点的函数值。" * 20,
+    }
+    return question, parse_result, solution
+
+
+def build_database(path: str, records: int, legacy_layout: bool) -> str:
+    """旧布局先写数据再由应用启动时升级，新布局先建表再写数据。"""
+    if legacy_layout:
+        conn = sqlite3.connect(path)
+        conn.executescript(LEGACY_SCHEMA)
+        conn.close()
+
+    def make_record(index: int) -> dict:
+        question, parse_result, solution = _sample_record(index)
+        record = {"username": "bench", "question": question, "parse_result": parse_result, "solution": solution}
+        if not legacy_layout:
+            record.update(subject=parse_result["subject"], difficulty=parse_result["difficulty"])
+        return record
+
+    user_ids = seed_histories(
+        path, records, make_record, interval=timedelta(minutes=1), create_schema=not legacy_layout
+    )
+    return user_ids[0]
+
+
+def measure(records: int, limit: int, repeat: int, legacy_layout: bool) -> dict:
+    workdir = tempfile.mkdtemp(prefix="history-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("RATE_LIMIT_MAX_REQUESTS", "1000000")
+    user_id = build_database(db_path, records, legacy_layout)
+
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    from app.extensions import db
+    from app.models.history import History
+
+    # 旧布局在这里由 upgrade_schema 补列并回填
+    app = create_app("production")
+    client = app.test_client()
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+
+    report = {"records": records, "limit": limit, "legacyLayout": legacy_layout, "views": {}}
+    for view in ("full", "summary"):
+        query_string = {"limit": limit, "view": view}
+        client.get("/api/history", query_string=query_string, headers=headers)  # 预热
+        http_times, sizes = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get("/api/history", query_string=query_string, headers=headers)
+            http_times.append(time.perf_counter() - started)
+            sizes.append(len(response.get_data()))
+
+        query_times = []
+        with app.app_context():
+            for _ in range(repeat):
+                db.session.expunge_all()
+                query = History.query.filter_by(user_id=user_id).order_by(
+                    History.created_at.desc(), History.id.desc()
+                )
+                if view == "summary":
+                    query = query.with_entities(*History.summary_columns())
+                started = time.perf_counter()
+                query.limit(limit).all()
+                query_times.append(time.perf_counter() - started)
+
+        report["views"][view] = {
+            "responseBytes": statistics.median(sizes),
+            "requestMs": round(statistics.median(http_times) * 1000, 2),
+            "queryMs": round(statistics.median(query_times) * 1000, 2),
+        }
+
+    full, summary = report["views"]["full"], report["views"]["summary"]
+    report["ratios"] = {
+        key: round(full[key] / summary[key], 1) if summary[key] else None
+        for key in ("responseBytes", "requestMs", "queryMs")
+    }
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--legacy-layout", action="store_true", help="从旧表结构升级而来的数据库")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    report = measure(args.records, args.limit, args.repeat, args.legacy_layout)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    layout = "旧布局升级" if args.legacy_layout else "新建"
+    print(f"{args.records} 条记录（{layout}），每页 {args.limit} 条")
+    print(f"{'view':<10}{'bytes':>12}{'request ms':>12}{'query ms':>10}")
+    for view, item in report["views"].items():
+        print(f"{view:<10}{item['responseBytes']:>12}{item['requestMs']:>12}{item['queryMs']:>10}")
+    ratios = report["ratios"]
+    print(f"{'full/sum':<10}{ratios['responseBytes']:>11}x{ratios['requestMs']:>11}x{ratios['queryMs']:>9}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
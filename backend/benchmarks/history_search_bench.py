@@ -0,0 +1,154 @@
+"""History search latency: FTS5 trigram index vs a ``LIKE '%…%'`` scan.
+
+Fills a temporary SQLite database with ``--records`` history rows spread over ``--users`` users
+(written with sqlite3 directly, bypassing the ORM), then creates the app so that
+``ensure_search_index`` backfills the search table, and times it. Each query is run through
+``HistorySearch.search`` and through the equivalent LIKE scan over the user's full records;
+``matched`` is the number of rows across all users that the FTS query has to rank.
+
+    python benchmarks/history_search_bench.py
+    python benchmarks/history_search_bench.py --records 500000 --users 5 --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from common import seed_histories  # noqa: E402
+
+TOPICS = [
+    ("数学", "二次函数", "已知函数 f(x) = x² - {n}x + 3，求 f(x) 在区间 [0, 4] 上的最大值和最小值。"),
+    ("数学", "等差数列", "等差数列 {{a_n}} 中 a_1 = {n}，公差为 2，求前 20 项和。"),
+    ("数学", "三角函数", "已知 sin α = 3/5，α 为第二象限角，求 cos 2α 的值（第 {n} 组）。"),
+    ("物理", "牛顿第二定律", "质量为 {n} kg 的物体在水平拉力作用下做匀加速直线运动，求加速度。"),
+    ("物理", "电磁感应", "匝数为 {n} 的线圈在匀强磁场中转动，求感应电动势的最大值。"),
+    ("化学", "氧化还原反应", "配平下列氧化还原反应方程式，并指出氧化剂和还原剂（第 {n} 题）。"),
+    ("化学", "化学平衡", "在 {n}℃ 下，反应 N₂ + 3H₂ ⇌ 2NH₃ 达到平衡，求平衡常数。"),
+]
+QUERIES = ["二次函数", "最大值和最小值", "平衡常数", "感应电动势", "氧化剂", "第 12345 题", "不存在的内容"]
+
+
+def build_database(path: str, records: int, users: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+
+    def make_record(index: int) -> dict:
+        subject, point, template = rng.choice(TOPICS)
+        return {
+            "question": template.format(n=index),
+            "subject": subject,
+            "difficulty": "中等",
+            "parse_result": {"subject": subject, "knowledgePoints": [point], "difficulty": "中等"},
+            "solution": {
+                "steps": ["根据题意列式。" * 10, "代入计算得到结果。" * 10],
+                "answer": f"答案为 {rng.randrange(1000)}。",
+                "summary": f"本题考查{point}的基本应用。",
+            },
+        }
+
+    return seed_histories(path, records, make_record, users=users)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="history-search-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    user_ids = build_database(db_path, args.records, args.users, args.seed)
+
+    from sqlalchemy import Text, cast, or_, select, text
+
+    from app import create_app
+    from app.extensions import db
+    from app.models.history import History
+    from app.models.history_search import HistorySearch
+
+    # 第二次创建应用时为直接写入的记录补齐搜索文本和 FTS 索引
+    started = time.perf_counter()
+    app = create_app("production")
+    backfill_seconds = time.perf_counter() - started
+
+    user_id = user_ids[0]
+    report = {
+        "records": args.records,
+        "recordsPerUser": args.records // args.users,
+        "backfillSeconds": round(backfill_seconds, 1),
+        "databaseMiB": round(os.path.getsize(db_path) / 1024 / 1024, 1),
+        "queries": [],
+    }
+    with app.app_context():
+        for query in QUERIES:
+            like = f"%{query}%"
+            scan = (
+                select(*History.summary_columns())
+                .where(
+                    History.user_id == user_id,
+                    or_(
+                        History.question.like(like),
+                        cast(History.parse_result, Text).like(like),
+                        cast(History.solution, Text).like(like),
+                    ),
+                )
+                .order_by(History.created_at.desc())
+                .limit(args.limit)
+            )
+            timings = {"fts": [], "like": []}
+            hits = {}
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                hits["fts"] = len(HistorySearch.search(user_id, query, args.limit))
+                timings["fts"].append(time.perf_counter() - started)
+                started = time.perf_counter()
+                hits["like"] = len(db.session.execute(scan).all())
+                timings["like"].append(time.perf_counter() - started)
+            # bm25 要为全部用户的匹配行打分，耗时随这个数量增长
+            matched = db.session.execute(
+                text("SELECT count(*) FROM history_fts WHERE history_fts MATCH :match"),
+                {"match": '"' + query + '"'},
+            ).scalar()
+            report["queries"].append(
+                {
+                    "query": query,
+                    "hits": hits["fts"],
+                    "matchedRows": matched,
+                    "ftsMs": round(statistics.median(timings["fts"]) * 1000, 2),
+                    "likeMs": round(statistics.median(timings["like"]) * 1000, 2),
+                }
+            )
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(
+        f"{args.records} 条记录，每个用户 {report['recordsPerUser']} 条，数据库 {report['databaseMiB']} MiB，"
+        f"补齐搜索索引 {report['backfillSeconds']} 秒"
+    )
+    print(f"{'query':<16}{'matched':>9}{'hits':>6}{'fts ms':>10}{'like ms':>10}")
+    for item in report["queries"]:
+        print(
+            f"{item['query']:<16}{item['matchedRows']:>9}{item['hits']:>6}{item['ftsMs']:>10}{item['likeMs']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""POST /api/history latency with synchronous commits and with the write-behind queue.
+
+Each mode runs in its own process (the app reads ``HISTORY_WRITE_BEHIND`` at startup) against
+a fresh SQLite file with the production pragmas. ``--threads`` clients post records of
+realistic size through the Flask test client for ``--duration`` seconds; afterwards the
+writer is shut down and the row count is checked against the number of 201 responses.
+
+    python benchmarks/history_write_bench.py
+    python benchmarks/history_write_bench.py --threads 8 --duration 10 --interval-ms 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import percentile  # noqa: E402
+from sqlite_write_bench import PARSE_RESULT, SOLUTION  # noqa: E402
+
+
+def run_mode(write_behind: bool, args, results) -> None:
+    workdir = tempfile.mkdtemp(prefix="history-write-bench-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "RATE_LIMIT_MAX_REQUESTS": "100000000",
+            "HISTORY_WRITE_BEHIND": "true" if write_behind else "false",
+            "HISTORY_WRITE_BEHIND_BATCH_SIZE": str(args.batch_size),
+            "HISTORY_WRITE_BEHIND_INTERVAL_MS": str(args.interval_ms),
+        }
+    )
+    from flask_jwt_extended import create_access_token
+
+    from app import create_app
+    from app.extensions import db
+    from app.models.history import History
+    from app.models.user import User
+    from app.services.history_writer import history_writer
+
+    app = create_app("production")
+    with app.app_context():
+        user = User(username="bench")
+        db.session.add(user)
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=user.id)}"}
+
+    deadline = time.perf_counter() + args.duration
+    latencies: list[float] = []
+    failures = 0
+    lock = threading.Lock()
+
+    def client_loop(index: int) -> None:
+        nonlocal failures
+        client = app.test_client()
+        local, failed, sequence = [], 0, 0
+        while time.perf_counter() < deadline:
+            sequence += 1
+            payload = {
+                "question": f"第 {index}-{sequence} 题：已知 f(x) = x² - 4x + 3，求最值。",
+                "parseResult": PARSE_RESULT,
+                "solution": SOLUTION,
+            }
+            started = time.perf_counter()
+            response = client.post("/api/history", json=payload, headers=headers)
+            if response.status_code == 201:
+                local.append((time.perf_counter() - started) * 1000)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            failures += failed
+
+    threads = [threading.Thread(target=client_loop, args=(index,)) for index in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    flush_started = time.perf_counter()
+    history_writer.shutdown()
+    drain_ms = (time.perf_counter() - flush_started) * 1000
+    with app.app_context():
+        rows = History.query.count()
+
+    results.put(
+        {
+            "mode": "write-behind" if write_behind else "sync",
+            "requests": len(latencies),
+            "failed": failures,
+            "perSecond": round(len(latencies) / args.duration, 1),
+            "p50Ms": round(percentile(latencies, 50), 2),
+            "p95Ms": round(percentile(latencies, 95), 2),
+            "p99Ms": round(percentile(latencies, 99), 2),
+            "rows": rows,
+            "shutdownDrainMs": round(drain_ms, 1),
+            "writer": history_writer.stats(),
+        }
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=8)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--interval-ms", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    reports = []
+    for write_behind in (False, True):
+        results = context.Queue()
+        process = context.Process(target=run_mode, args=(write_behind, args, results))
+        process.start()
+        reports.append(results.get())
+        process.join()
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{args.threads} 个线程，持续 {args.duration} 秒，批大小 {args.batch_size}，间隔 {args.interval_ms} ms")
+    header = f"{'mode':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'201s':>8}{'rows':>8}{'drain ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        print(
+            f"{report['mode']:<14}{report['perSecond']:>9}{report['p50Ms']:>9}{report['p95Ms']:>9}"
+            f"{report['p99Ms']:>9}{report['requests']:>8}{report['rows']:>8}{report['shutdownDrainMs']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Cost of getting an uploaded image to the vision model: base64 JSON vs multipart vs raw body.
+
+Posts the same image to ``/api/recognize`` through the Flask test client as
+
+- ``json``: ``{"image": "data:image/jpeg;base64,..."}`` (what the frontend used to send);
+- ``multipart``: ``multipart/form-data`` with an ``image`` file field;
+- ``raw``: the image bytes as the request body with ``Content-Type: image/jpeg``.
+
+The upstream call is replaced by one that builds the HTTP request with ``requests`` exactly
+as it would be sent (so its body serialization is counted) and answers immediately. The OCR
+cache is disabled so every request goes all the way to the upstream body. Reports the mean
+time per request, the peak Python heap during one request (tracemalloc) and the bytes sent
+by the client and to the upstream.
+
+    python benchmarks/image_upload_bench.py
+    python benchmarks/image_upload_bench.py --sizes 300,4800 --requests 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+class _FakeResponse:
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return {"choices": [{"message": {"content": "解方程：2x + 3 = 11，求 x 的值。"}}]}
+
+
+def patch_upstream(sent: list) -> None:
+    import requests
+
+    from app.services import http_client
+
+    def post(self, url, *, json=None, data=None, headers, read_timeout=None, stream=False):
+        prepared = requests.Request("POST", url, json=json, data=data, headers=headers).prepare()
+        sent.append(len(prepared.body))
+        return _FakeResponse()
+
+    http_client.UpstreamClient.post = post
+
+
+def make_request(mode: str, image: bytes, data_url: str) -> dict:
+    if mode == "json":
+        return {"json": {"image": data_url}}
+    if mode == "multipart":
+        return {"data": {"image": (io.BytesIO(image), "image.jpg", "image/jpeg")}, "content_type": "multipart/form-data"}
+    return {"data": image, "content_type": "image/jpeg"}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="300,2048,4800", help="图片大小（KiB），逗号分隔")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--modes", default="json,multipart,raw")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    # 配置在导入 app 时读取，先设置好数据库和上游
+    workdir = tempfile.mkdtemp(prefix="image-upload-bench-")
+    os.environ.update(
+        {
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+            "RATE_LIMIT_MAX_REQUESTS": "1000000",
+            "OCR_CACHE_ENABLED": "false",
+            "MULTIMODAL_API_KEY": "bench",
+            "MULTIMODAL_API_URL": "http://127.0.0.1:9/v1/chat/completions",
+            "UPSTREAM_WARMUP": "false",
+        }
+    )
+    from app import create_app
+
+    app = create_app("production")
+    client = app.test_client()
+    sent: list[int] = []
+    patch_upstream(sent)
+
+    rng = random.Random(args.seed)
+    report = {"requests": args.requests, "results": []}
+    for size_kib in (int(value) for value in args.sizes.split(",")):
+        # 随机字节近似已压缩的 JPEG，base64 后长度为原来的 4/3
+        image = b"\xff\xd8\xff\xe0" + rng.randbytes(size_kib * 1024 - 4)
+        data_url = "data:image/jpeg;base64," + base64.b64encode(image).decode("ascii")
+        for mode in args.modes.split(","):
+            kwargs = make_request(mode, image, data_url)
+            client_bytes = len(json.dumps(kwargs["json"])) if mode == "json" else len(image)
+
+            response = client.post("/api/recognize", **make_request(mode, image, data_url))
+            if response.status_code != 200:
+                print(f"{mode} {size_kib} KiB: {response.status_code} {response.get_json()}", file=sys.stderr)
+                return 1
+
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                client.post("/api/recognize", **make_request(mode, image, data_url))
+            seconds = (time.perf_counter() - started) / args.requests
+
+            request = make_request(mode, image, data_url)
+            tracemalloc.start()
+            client.post("/api/recognize", **request)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            report["results"].append(
+                {
+                    "sizeKiB": size_kib,
+                    "mode": mode,
+                    "ms": round(seconds * 1000, 2),
+                    "peakHeapMiB": round(peak / 1024 / 1024, 1),
+                    "clientKiB": round(client_bytes / 1024),
+                    "upstreamKiB": round(sent[-1] / 1024),
+                }
+            )
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{'KiB':>6}  {'mode':<10}{'ms':>8}{'peak MiB':>10}{'client KiB':>12}{'upstream KiB':>14}")
+    for item in report["results"]:
+        print(
+            f"{item['sizeKiB']:>6}  {item['mode']:<10}{item['ms']:>8}{item['peakHeapMiB']:>10}"
+            f"{item['clientKiB']:>12}{item['upstreamKiB']:>14}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Size savings and encode/decode cost of compressed History JSON columns.
+
+Generates ``--records`` solutions shaped like the model's output (Markdown steps with LaTeX,
+answer, summary) and parse results. First measures each codec on the values alone: stored
+size relative to plain ``db.JSON`` text and per-value encode/decode time. Then writes the
+records to a temporary SQLite database in the legacy uncompressed format, runs the chunked
+migration (``migrations/compress_history_json.py``) followed by VACUUM, and compares the file
+size and the time to load full records before and after.
+
+    python benchmarks/json_compression_bench.py
+    python benchmarks/json_compression_bench.py --records 100000 --algorithm zstd
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / "migrations"))
+
+SENTENCES = [
+    "根据题意，先确定函数的定义域",
+    "由已知条件可得",
+    "将上式两边同时平方",
+    "注意到判别式必须大于零",
+    "因此所求参数的取值范围为",
+    "对函数求导并判断单调性",
+    "当导数等于零时取得极值",
+    "代入端点值进行比较",
+    "由余弦定理得",
+    "利用等差数列的求和公式",
+    "设所求直线的斜率为 k",
+    "联立直线与椭圆的方程，消去 y 得",
+    "由韦达定理可知",
+    "所以该事件发生的概率为",
+    "这里容易忽略分母不能为零的条件",
+    "综合以上两种情况",
+]
+FORMULAS = [
+    r"$f(x) = {a}x^2 - {b}x + {c}$",
+    r"$f'(x) = {a2}x - {b}$",
+    r"$\Delta = b^2 - 4ac = {b}^2 - 4 \times {a} \times {c}$",
+    r"$S_n = \frac{{n(a_1 + a_n)}}{{2}} = {c}n + {a}$",
+    r"$\cos C = \frac{{a^2 + b^2 - c^2}}{{2ab}} = \frac{{{a}}}{{{b}}}$",
+    r"$x_1 + x_2 = -\frac{{{b}}}{{{a}}},\ x_1 x_2 = \frac{{{c}}}{{{a}}}$",
+    r"$P(A) = \frac{{C_{{{b}}}^{{2}}}}{{C_{{{c}}}^{{3}}}}$",
+]
+
+
+def make_record(rng: random.Random) -> tuple[dict, dict]:
+    def formula() -> str:
+        a, b, c = rng.randint(1, 9), rng.randint(1, 30), rng.randint(1, 50)
+        return rng.choice(FORMULAS).format(a=a, b=b, c=c, a2=2 * a)
+
+    steps = []
+    for index in range(rng.randint(4, 10)):
+        body = "，".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 5)))
+        lines = [f"**第 {index + 1} 步：{rng.choice(SENTENCES)}**", f"{body}：", "", formula()]
+        if rng.random() < 0.5:
+            lines += ["", f"- {rng.choice(SENTENCES)}，{formula()}", f"- {rng.choice(SENTENCES)}。"]
+        steps.append("\n".join(lines))
+    solution = {
+        "steps": steps,
+        "answer": f"所求最大值为 {formula()}，此时 $x = {rng.randint(1, 20)}$。",
+        "summary": "，".join(rng.choice(SENTENCES) for _ in range(3)) + "。",
+        "commonMistakes": [rng.choice(SENTENCES) + "。" for _ in range(rng.randint(1, 3))],
+    }
+    parse_result = {
+        "type": "解答题",
+        "subject": "数学",
+        "knowledgePoints": ["二次函数", "导数"],
+        "difficulty": rng.choice(["简单", "中等", "困难"]),
+    }
+    return parse_result, solution
+
+
+def measure_codecs(records: list[tuple[dict, dict]], codecs: list[tuple[str, int]]) -> list[dict]:
+    from flask import Flask
+
+    from app.models import types
+
+    values = [value for record in records for value in record]
+    # db.JSON 写入的格式：json.dumps 默认参数，中文转义为 \uXXXX
+    plain_bytes = sum(len(json.dumps(value).encode("utf-8")) for value in values)
+    results = []
+    for algorithm, level in codecs:
+        app = Flask(__name__)
+        app.config.update(HISTORY_JSON_COMPRESSION=algorithm, HISTORY_JSON_COMPRESSION_LEVEL=level)
+        types.configure_json_compression(app)
+        started = time.perf_counter()
+        encoded = [types.encode_json(value) for value in values]
+        encode_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for item in encoded:
+            types.decode_json(item)
+        decode_seconds = time.perf_counter() - started
+        stored = sum(len(item.encode("utf-8")) if isinstance(item, str) else len(item) for item in encoded)
+        results.append(
+            {
+                "codec": algorithm if algorithm == "off" else f"{algorithm}-{level}",
+                "storedRatio": round(stored / plain_bytes, 3),
+                "encodeUs": round(encode_seconds / len(values) * 1e6, 1),
+                "decodeUs": round(decode_seconds / len(values) * 1e6, 1),
+            }
+        )
+    return results
+
+
+def load_full_records(app, ids: list[str]) -> float:
+    from app.extensions import db
+    from app.models.history import History
+
+    with app.app_context():
+        started = time.perf_counter()
+        for history_id in ids:
+            db.session.get(History, history_id).to_dict()
+            db.session.expunge_all()
+        return (time.perf_counter() - started) / len(ids) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--codec-records", type=int, default=2000, help="单独测量编解码时使用的记录数")
+    parser.add_argument("--algorithm", default="zlib", choices=["zlib", "zstd"], help="数据库迁移使用的算法")
+    parser.add_argument("--reads", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    # 配置在导入 app 时读取，先设置好数据库路径
+    workdir = tempfile.mkdtemp(prefix="json-compression-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ.update({"DATABASE_URL": f"sqlite:///{db_path}", "HISTORY_JSON_COMPRESSION": args.algorithm})
+
+    from app import create_app
+    from app.models.types import zstandard
+    from compress_history_json import recompress_history, vacuum
+
+    rng = random.Random(args.seed)
+    codecs = [("off", 0), ("zlib", 1), ("zlib", 6), ("zlib", 9)]
+    if zstandard is not None:
+        codecs += [("zstd", 3), ("zstd", 9)]
+    report = {"codecs": measure_codecs([make_record(rng) for _ in range(args.codec_records)], codecs)}
+
+    app = create_app("production")
+    conn = sqlite3.connect(db_path)
+    user_id = str(uuid.uuid4())
+    conn.execute(
+        "INSERT INTO users (id, username, created_at) VALUES (?, 'bench', '2026-01-01 00:00:00.000000')", (user_id,)
+    )
+    ids, rows = [], []
+    for _ in range(args.records):
+        parse_result, solution = make_record(rng)
+        ids.append(str(uuid.uuid4()))
+        rows.append(
+            (
+                ids[-1],
+                user_id,
+                "求函数的最大值。",
+                json.dumps(parse_result),
+                json.dumps(solution),
+                "2026-01-01 00:00:00.000000",
+            )
+        )
+    conn.executemany(
+        "INSERT INTO histories (id, user_id, question, parse_result, solution, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+    read_ids = rng.sample(ids, min(args.reads, len(ids)))
+    size_before = os.path.getsize(db_path)
+    read_before = load_full_records(app, read_ids)
+    with app.app_context():
+        started = time.perf_counter()
+        stats = recompress_history(500)
+        migrate_seconds = time.perf_counter() - started
+        vacuum()
+    size_after = os.path.getsize(db_path)
+    read_after = load_full_records(app, read_ids)
+
+    report["database"] = {
+        "records": args.records,
+        "algorithm": args.algorithm,
+        "sizeMiBBefore": round(size_before / 1024 / 1024, 1),
+        "sizeMiBAfter": round(size_after / 1024 / 1024, 1),
+        "migrateSeconds": round(migrate_seconds, 1),
+        "rewritten": stats["rewritten"],
+        "readMsBefore": round(read_before, 3),
+        "readMsAfter": round(read_after, 3),
+    }
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{'codec':<10}{'stored':>10}{'encode µs':>12}{'decode µs':>12}")
+    for item in report["codecs"]:
+        print(f"{item['codec']:<10}{item['storedRatio']:>10}{item['encodeUs']:>12}{item['decodeUs']:>12}")
+    database = report["database"]
+    print(
+        f"\n{database['records']} 条记录（{database['algorithm']}）：数据库 {database['sizeMiBBefore']} MiB -> "
+        f"{database['sizeMiBAfter']} MiB，迁移 {database['migrateSeconds']} 秒；"
+        f"读取一条完整记录 {database['readMsBefore']} ms -> {database['readMsAfter']} ms"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Throughput and memory of the JSON -> SQLite migration, including an interrupted run.
+
+Writes a legacy dump (``users.json`` and ``history.json`` in the format of the old file
+storage) to a temporary directory, then runs ``migrations/migrate_json_to_sqlite.py`` as a
+child process against a fresh SQLite database and reports wall time, rows per second and the
+child's peak RSS. A second database is migrated with the child killed after
+``--interrupt-after`` seconds and then started again, to check that the resumed run ends
+with exactly the same rows.
+
+    python benchmarks/json_migration_bench.py
+    python benchmarks/json_migration_bench.py --records 1000000 --users 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+MIGRATOR = PROJECT_ROOT / "migrations" / "migrate_json_to_sqlite.py"
+
+
+def write_dump(directory: Path, records: int, users: int, rng: random.Random) -> tuple[int, list[str]]:
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    with (directory / "users.json").open("w", encoding="utf-8") as f:
+        json.dump(
+            [
+                {
+                    "id": user_id,
+                    "username": f"user{index}",
+                    "password": "0" * 64,
+                    "createdAt": "2025-09-01T08:00:00.000Z",
+                }
+                for index, user_id in enumerate(user_ids)
+            ],
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+    started = datetime(2025, 9, 1)
+    with (directory / "history.json").open("w", encoding="utf-8") as f:
+        # 旧的文件存储用 JSON.stringify(data, null, 2) 写出整个数组
+        f.write("[")
+        for index in range(records):
+            item = {
+                "id": str(uuid.uuid4()),
+                "userId": rng.choice(user_ids),
+                "username": None,
+                "question": f"第 {index} 题：已知函数 f(x) = x² - {rng.randint(1, 9)}x + 3，求最大值。",
+                "parseResult": {
+                    "type": "解答题",
+                    "subject": "数学",
+                    "knowledgePoints": ["二次函数"],
+                    "difficulty": "中等",
+                },
+                "solution": {
+                    "steps": [f"第 {step} 步：代入 $x = {rng.randint(1, 99)}$，根据题意列式计算。" * 4 for step in range(4)],
+                    "answer": f"最大值为 {rng.randint(1, 999)}。",
+                    "summary": "本题考查二次函数在闭区间上的最值。",
+                },
+                "createdAt": (started + timedelta(seconds=index)).isoformat(timespec="milliseconds") + "Z",
+            }
+            text = json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+            f.write(("," if index else "") + "\n  " + text)
+        f.write("\n]\n")
+    return os.path.getsize(directory / "history.json"), user_ids
+
+
+def run_migrator(data_dir: Path, db_path: Path, interrupt_after: float | None = None) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        PYTHONWARNINGS="ignore",
+        # mmap 映射的数据库文件页也计入 RSS，会随数据库变大，这里关掉以便只看迁移本身的内存
+        SQLITE_MMAP_SIZE="0",
+    )
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(MIGRATOR), "--data-dir", str(data_dir)],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    if interrupt_after is not None:
+        time.sleep(interrupt_after)
+        # 不用 send_signal：它会先 poll，进程已结束时会被提前回收，wait4 就拿不到资源占用
+        os.kill(process.pid, signal.SIGKILL)
+    # wait4 返回这个子进程自己的资源占用
+    _, status, usage = os.wait4(process.pid, 0)
+    output = process.stdout.read()
+    process.stdout.close()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "seconds": time.perf_counter() - started,
+        "peakRssMiB": usage.ru_maxrss / 1024,
+        "exitCode": process.returncode,
+        "output": output,
+    }
+
+
+def table_counts(db_path: Path) -> dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            "users": conn.execute("SELECT count(*) FROM users").fetchone()[0],
+            "histories": conn.execute("SELECT count(*) FROM histories").fetchone()[0],
+            "historyIds": conn.execute("SELECT count(DISTINCT id) FROM histories").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--interrupt-after", type=float, default=8.0, help="中断测试在启动后多少秒杀掉迁移进程")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="json-migration-bench-"))
+    data_dir = workdir / "dump"
+    data_dir.mkdir()
+    dump_bytes, _ = write_dump(data_dir, args.records, args.users, random.Random(args.seed))
+
+    full = run_migrator(data_dir, workdir / "full.db")
+    full_counts = table_counts(workdir / "full.db")
+
+    # 中断后重跑：检查点在数据目录下，先清掉完整迁移留下的那份
+    (data_dir / ".migrate_checkpoint.json").unlink(missing_ok=True)
+    interrupted = run_migrator(data_dir, workdir / "resume.db", interrupt_after=args.interrupt_after)
+    partial_counts = table_counts(workdir / "resume.db")
+    resumed = run_migrator(data_dir, workdir / "resume.db")
+    resumed_counts = table_counts(workdir / "resume.db")
+
+    report = {
+        "records": args.records,
+        "dumpMiB": round(dump_bytes / 1024 / 1024, 1),
+        "full": {
+            "seconds": round(full["seconds"], 1),
+            "rowsPerSecond": round(args.records / full["seconds"]),
+            "peakRssMiB": round(full["peakRssMiB"], 1),
+            "counts": full_counts,
+        },
+        "resume": {
+            "killedAfterSeconds": round(interrupted["seconds"], 1),
+            "historiesBeforeKill": partial_counts["histories"],
+            "resumedSeconds": round(resumed["seconds"], 1),
+            "counts": resumed_counts,
+            "matchesFullRun": resumed_counts == full_counts,
+        },
+    }
+    if full["exitCode"] != 0 or resumed["exitCode"] != 0:
+        print(full["output"] + resumed["output"], file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{args.records} 条历史记录，{args.users} 个用户，history.json {report['dumpMiB']} MiB")
+    print(
+        f"完整迁移：{report['full']['seconds']} 秒，{report['full']['rowsPerSecond']} 条/秒，"
+        f"峰值 RSS {report['full']['peakRssMiB']} MiB"
+    )
+    print(
+        f"中断重跑：中断时已写入 {partial_counts['histories']} 条，重跑 {report['resume']['resumedSeconds']} 秒，"
+        f"结果与完整迁移{'一致' if report['resume']['matchesFullRun'] else '不一致'}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""End-to-end load test of the real app under gunicorn against the local model stand-in.
+
+Starts ``mock_upstream`` in a separate process and the app under gunicorn with
+``SERVER_TIMING_ENABLED``. It then drives a weighted mix of endpoints from N concurrent
+clients for a fixed duration and reports throughput plus p50/p95/p99 latency per endpoint.
+Per-stage times (ocr / parse / solve / db) come from the ``Server-Timing`` header. For
+streamed endpoints the stages are time to first event and time to completion.
+
+    python benchmarks/load_test.py --concurrency 50 --duration 30
+    python benchmarks/load_test.py --worker-class gevent --mix solve-stream=1 --latency fixed:0.3
+    python benchmarks/load_test.py --error-rate 0.05 --rate-limit-rate 0.05 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+import requests
+
+from common import free_port, percentile, start_app, stop_process, wait_for_http
+from mock_upstream import MockUpstream, add_arguments, settings_from_args
+
+PROBLEMS = [
+    "解方程：2x + 3 = 11，求 x 的值。",
+    "已知直角三角形两直角边分别为 3 和 4，求斜边长。",
+    "一辆汽车以 20 m/s 的速度匀速行驶，刹车后加速度大小为 5 m/s²，求刹车距离。",
+    "写出氢气在氧气中燃烧的化学方程式，并说明反应类型。",
+    "Choose the correct answer: He has ____ the letter. A. write B. written",
+]
+PARSE_RESULT = {"type": "解答", "subject": "数学", "knowledgePoints": ["一元一次方程"], "difficulty": "简单"}
+ENDPOINTS = ("solve-problem", "solve-stream", "recognize", "solve-problem-stream")
+
+
+def _serve_mock(settings, port: int) -> None:
+    server = MockUpstream(settings).serve("127.0.0.1", port)
+    try:
+        threading.Event().wait()
+    finally:
+        server.shutdown()
+
+
+def parse_server_timing(header: str) -> dict[str, float]:
+    stages = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                try:
+                    stages[name] = float(value)
+                except ValueError:
+                    pass
+    return stages
+
+
+class LoadClient:
+    def __init__(self, base_url: str, unique_inputs: bool, seed: int):
+        self.base_url = base_url
+        self.unique_inputs = unique_inputs
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+
+    def _problem(self) -> str:
+        problem = self.rng.choice(PROBLEMS)
+        if self.unique_inputs:
+            # 每次请求附加不同的编号，绕过解析/解答缓存，压测上游调用路径
+            problem = f"{problem}（第 {self.rng.randrange(10**9)} 题）"
+        return problem
+
+    def _image(self) -> str:
+        size = 2048
+        payload = os.urandom(size) if self.unique_inputs else b"\0" * size
+        data = b"\x89PNG\r\n\x1a\n" + payload
+        return "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+
+    def request(self, endpoint: str) -> dict:
+        started = time.perf_counter()
+        record = {"endpoint": endpoint, "status": None, "ok": False, "stages": {}, "error": None}
+        try:
+            if endpoint == "solve-problem":
+                response = self.session.post(
+                    f"{self.base_url}/api/solve-problem",
+                    json={"type": "text", "content": self._problem()},
+                    timeout=120,
+                )
+                self._finish_json(record, response)
+            elif endpoint == "recognize":
+                response = self.session.post(
+                    f"{self.base_url}/api/recognize", json={"image": self._image()}, timeout=120
+                )
+                self._finish_json(record, response)
+            elif endpoint == "solve-stream":
+                body = {"text": self._problem(), "parseResult": PARSE_RESULT}
+                self._stream(record, "/api/solve-stream", body, started)
+            else:
+                body = {"type": "text", "content": self._problem()}
+                self._stream(record, "/api/solve-problem-stream", body, started)
+        except requests.RequestException as exc:
+            record["error"] = type(exc).__name__
+        record["latency"] = time.perf_counter() - started
+        return record
+
+    @staticmethod
+    def _finish_json(record: dict, response: requests.Response) -> None:
+        record["status"] = response.status_code
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        record["ok"] = response.ok and bool(payload.get("success"))
+        if not record["ok"]:
+            record["error"] = str(payload.get("error") or response.status_code)[:80]
+        record["stages"] = parse_server_timing(response.headers.get("Server-Timing", ""))
+
+    def _stream(self, record: dict, path: str, body: dict, started: float) -> None:
+        with self.session.post(f"{self.base_url}{path}", json=body, stream=True, timeout=120) as response:
+            record["status"] = response.status_code
+            first_event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - started
+                    record["stages"]["firstEvent"] = first_event * 1000
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    record["ok"] = response.ok and record["error"] is None
+                    break
+                if '"error"' in data:
+                    try:
+                        record["error"] = str(json.loads(data).get("error"))[:80]
+                    except ValueError:
+                        record["error"] = "error event"
+            record["stages"]["complete"] = (time.perf_counter() - started) * 1000
+            if not record["ok"] and record["error"] is None:
+                record["error"] = "stream ended without [DONE]"
+
+
+def parse_mix(spec: str) -> list[tuple[str, float]]:
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"未知的端点 {name!r}，可选 {', '.join(ENDPOINTS)}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def run_clients(base_url: str, args, mix: list[tuple[str, float]]) -> tuple[list[dict], float]:
+    names = [name for name, _weight in mix]
+    weights = [weight for _name, weight in mix]
+    results: list[dict] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index: int) -> None:
+        client = LoadClient(base_url, not args.repeat_inputs, seed=args.seed * 1000 + index)
+        while time.perf_counter() < deadline:
+            record = client.request(client.rng.choices(names, weights)[0])
+            record["finishedAt"] = time.perf_counter()
+            with lock:
+                results.append(record)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(args.duration + 150)
+    return results, time.perf_counter() - started
+
+
+def _latency_summary(values_ms: list[float]) -> dict:
+    return {
+        "p50": round(percentile(values_ms, 50), 1),
+        "p95": round(percentile(values_ms, 95), 1),
+        "p99": round(percentile(values_ms, 99), 1),
+    }
+
+
+def summarise(results: list[dict], wall: float) -> dict:
+    by_endpoint: dict[str, list[dict]] = defaultdict(list)
+    for record in results:
+        by_endpoint[record["endpoint"]].append(record)
+
+    endpoints = {}
+    for endpoint, records in sorted(by_endpoint.items()):
+        ok = [record for record in records if record["ok"]]
+        statuses: dict[str, int] = defaultdict(int)
+        errors: dict[str, int] = defaultdict(int)
+        for record in records:
+            statuses[str(record["status"])] += 1
+            if record["error"]:
+                errors[record["error"]] += 1
+
+        stage_values: dict[str, list[float]] = defaultdict(list)
+        for record in ok:
+            for stage, value in record["stages"].items():
+                stage_values[stage].append(value)
+
+        endpoints[endpoint] = {
+            "requests": len(records),
+            "ok": len(ok),
+            "throughput": round(len(ok) / wall, 2) if wall else 0,
+            "latencyMs": _latency_summary([record["latency"] * 1000 for record in ok]),
+            "stagesMs": {stage: _latency_summary(values) for stage, values in sorted(stage_values.items())},
+            "statuses": dict(statuses),
+            "errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:5]),
+        }
+
+    total_ok = sum(item["ok"] for item in endpoints.values())
+    return {
+        "wallSeconds": round(wall, 2),
+        "requests": len(results),
+        "ok": total_ok,
+        "throughput": round(total_ok / wall, 2) if wall else 0,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['requests']} 个请求，成功 {report['ok']}，用时 {report['wallSeconds']} s，"
+        f"吞吐 {report['throughput']} req/s"
+    )
+    header = f"{'endpoint / stage':<34}{'count':>7}{'ok':>7}{'req/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, item in report["endpoints"].items():
+        latency = item["latencyMs"]
+        print(
+            f"{endpoint:<34}{item['requests']:>7}{item['ok']:>7}{item['throughput']:>8}"
+            f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}"
+        )
+        for stage, values in item["stagesMs"].items():
+            print(f"{'  · ' + stage:<34}{'':>22}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}")
+        if item["errors"]:
+            print(f"{'':<4}errors: {item['errors']}  statuses: {item['statuses']}")
+    upstream = report.get("upstream")
+    if upstream:
+        print(f"upstream: {json.dumps(upstream, ensure_ascii=False)}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--worker-class", default="sync", choices=["sync", "gevent"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=20, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=20, help="施压时长（秒）")
+    parser.add_argument(
+        "--mix",
+        default="solve-problem=2,solve-stream=2,recognize=1",
+        help=f"端点及权重，可选 {', '.join(ENDPOINTS)}",
+    )
+    parser.add_argument("--repeat-inputs", action="store_true", help="复用相同题目和图片，测量缓存命中时的表现")
+    parser.add_argument("--speculative", action="store_true", help="开启 PIPELINE_SPECULATIVE")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="额外的应用环境变量")
+    parser.add_argument("--app-log", help="gunicorn 日志输出文件")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    add_arguments(parser)
+    args = parser.parse_args()
+    if args.seed is None:
+        args.seed = 1
+
+    mix = parse_mix(args.mix)
+    upstream_port = free_port()
+    app_port = free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}/v1/chat/completions"
+
+    mock = multiprocessing.get_context("spawn").Process(
+        target=_serve_mock, args=(settings_from_args(args), upstream_port), daemon=True
+    )
+    mock.start()
+    upstream: Optional[dict] = None
+    try:
+        if not wait_for_http(f"http://127.0.0.1:{upstream_port}/stats", timeout=10):
+            raise RuntimeError("mock upstream 未能启动")
+
+        env = {
+            "DEEPSEEK_API_KEY": "load-test",
+            "DEEPSEEK_API_URL": upstream_url,
+            "MULTIMODAL_API_KEY": "load-test",
+            "MULTIMODAL_API_URL": upstream_url,
+            "SERVER_TIMING_ENABLED": "true",
+            "PIPELINE_SPECULATIVE": "true" if args.speculative else "false",
+        }
+        for item in args.app_env:
+            key, _, value = item.partition("=")
+            env[key] = value
+
+        with tempfile.TemporaryDirectory() as workdir:
+            process = start_app(
+                app_port,
+                workdir,
+                workers=args.workers,
+                worker_class=args.worker_class,
+                env=env,
+                log_path=args.app_log,
+            )
+            try:
+                results, wall = run_clients(f"http://127.0.0.1:{app_port}", args, mix)
+            finally:
+                stop_process(process)
+        upstream = requests.get(f"http://127.0.0.1:{upstream_port}/stats", timeout=5).json()
+    finally:
+        mock.terminate()
+        mock.join(5)
+
+    report = summarise(results, wall)
+    report.update(
+        {
+            "workerClass": args.worker_class,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "upstreamLatency": args.latency,
+            "tokenInterval": args.token_interval,
+            "upstream": upstream,
+        }
+    )
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+"""Local OpenAI-compatible chat-completions stand-in for load tests.
+
+Serves ``POST .../chat/completions`` for both the DeepSeek text model and the vision
+model. It classifies each request as ``ocr`` / ``parse`` / ``solution`` /
+``solution_stream`` and answers with canned outputs after a sampled latency. Streamed
+answers are sent token by token (optionally preceded by ``reasoning_content``). Errors,
+429s and mid-stream disconnects can be injected at a given rate.
+
+    python benchmarks/mock_upstream.py --port 18080 --latency lognormal:0.8,0.5 --token-interval fixed:0.02
+    python benchmarks/mock_upstream.py --port 18080 --error-rate 0.02 --rate-limit-rate 0.05 --reasoning
+
+Point ``DEEPSEEK_API_URL`` and ``MULTIMODAL_API_URL`` at
+``http://127.0.0.1:<port>/v1/chat/completions``. ``GET /stats`` returns request counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+# 流式输出的切分粒度：每个中日文字符/全角标点一个 token，其余按空白和连续非空白切分
+_CJK = r"\u3000-\u303f\u4e00-\u9fff\uff00-\uffef"
+_TOKEN_RE = re.compile(rf"[{_CJK}]|\s+|[^\s{_CJK}]+")
+
+DEFAULT_OUTPUTS = {
+    "ocr": [
+        "解方程：2x + 3 = 11，求 x 的值。",
+        "已知直角三角形两直角边分别为 3 和 4，求斜边长。",
+        "一辆汽车以 20 m/s 的速度匀速行驶，刹车后加速度大小为 5 m/s²，求刹车距离。",
+    ],
+    "parse": [
+        json.dumps(
+            {
+                "type": "解答",
+                "subject": "数学",
+                "knowledgePoints": ["一元一次方程", "移项"],
+                "difficulty": "简单",
+                "prerequisites": ["等式的性质"],
+            },
+            ensure_ascii=False,
+        ),
+        json.dumps(
+            {
+                "type": "解答",
+                "subject": "物理",
+                "knowledgePoints": ["匀变速直线运动", "刹车问题"],
+                "difficulty": "中等",
+                "prerequisites": ["速度与加速度"],
+            },
+            ensure_ascii=False,
+        ),
+    ],
+    "solution": [
+        json.dumps(
+            {
+                "thinking": "本题考查一元一次方程的解法，先移项再把系数化为 1。",
+                "steps": ["移项得 $2x = 11 - 3 = 8$", "两边同时除以 2，得 $x = 4$", "代入检验：$2 \\times 4 + 3 = 11$"],
+                "answer": "$x = 4$",
+                "summary": "解一元一次方程的一般步骤：去分母、去括号、移项、合并同类项、系数化为 1。",
+            },
+            ensure_ascii=False,
+        ),
+    ],
+    "solution_stream": [
+        "## 解题思路\n本题考查一元一次方程的解法，先移项再把系数化为 1。\n\n"
+        "## 详细步骤\n1. 移项得 $2x = 11 - 3 = 8$\n2. 两边同时除以 2，得 $x = 4$\n"
+        "3. 代入检验：$2 \\times 4 + 3 = 11$，成立\n\n"
+        "## 最终答案\n$x = 4$\n\n"
+        "## 知识总结\n解一元一次方程的一般步骤：去分母、去括号、移项、合并同类项、系数化为 1。",
+    ],
+    "reasoning": [
+        "题目给出一个一元一次方程，需要求 x。先把常数项移到右边，得到 2x = 8，再两边除以 2。"
+        "最后代入原式检验结果是否成立。",
+    ],
+}
+
+
+class Distribution:
+    """延迟分布，格式 ``fixed:s`` / ``uniform:a,b`` / ``normal:mean,std`` / ``lognormal:median,sigma`` / ``exp:mean``。"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, raw = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(item) for item in raw.split(",") if item.strip()] if raw else []
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exp": 1}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"无法解析延迟分布: {spec!r}")
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = p[0] * rng.lognormvariate(0, p[1])
+        else:
+            value = rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+    def __repr__(self) -> str:
+        return self.spec
+
+
+@dataclass
+class MockSettings:
+    latency: Distribution = field(default_factory=lambda: Distribution("fixed:0"))
+    token_interval: Distribution = field(default_factory=lambda: Distribution("fixed:0"))
+    kind_latency: dict = field(default_factory=dict)
+    tokens_per_chunk: int = 1
+    reasoning: bool = False
+    error_rate: float = 0.0
+    error_status: int = 500
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    stream_abort_rate: float = 0.0
+    outputs: dict = field(default_factory=lambda: dict(DEFAULT_OUTPUTS))
+    seed: Optional[int] = None
+
+
+class MockUpstream:
+    def __init__(self, settings: MockSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._rng = random.Random(settings.seed)
+        self._counter = 0
+        self.stats = {"requests": 0, "byKind": {}, "errors": 0, "rateLimited": 0, "streamAborts": 0, "inFlight": 0}
+
+    def _random(self) -> random.Random:
+        # 每个请求一个独立的随机源，避免多线程共享 Random 的锁竞争
+        with self._lock:
+            self._counter += 1
+            return random.Random(self._rng.random())
+
+    def _count(self, name: str, kind: Optional[str] = None, delta: int = 1) -> None:
+        with self._lock:
+            self.stats[name] += delta
+            if kind is not None:
+                self.stats["byKind"][kind] = self.stats["byKind"].get(kind, 0) + 1
+
+    @staticmethod
+    def classify(payload: dict) -> str:
+        messages = payload.get("messages") or []
+        for message in messages:
+            content = message.get("content")
+            if isinstance(content, list) and any(
+                isinstance(item, dict) and item.get("type") == "image_url" for item in content
+            ):
+                return "ocr"
+        if payload.get("stream"):
+            return "solution_stream"
+        text = "\n".join(str(message.get("content", "")) for message in messages)
+        if "教育分析师" in text or '"knowledgePoints"' in text:
+            return "parse"
+        return "solution"
+
+    def _output(self, kind: str, rng: random.Random) -> str:
+        candidates = self.settings.outputs.get(kind) or DEFAULT_OUTPUTS[kind]
+        if isinstance(candidates, str):
+            return candidates
+        return rng.choice(candidates)
+
+    def _latency(self, kind: str) -> Distribution:
+        return self.settings.kind_latency.get(kind, self.settings.latency)
+
+    @staticmethod
+    def tokenize(text: str) -> list[str]:
+        return _TOKEN_RE.findall(text)
+
+    def _chunks(self, text: str) -> list[str]:
+        tokens = self.tokenize(text)
+        size = max(1, self.settings.tokens_per_chunk)
+        return ["".join(tokens[i : i + size]) for i in range(0, len(tokens), size)]
+
+    def make_handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_args):
+                pass
+
+            def _send_json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, str(value))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_HEAD(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    with upstream._lock:
+                        stats = json.loads(json.dumps(upstream.stats))
+                    self._send_json(200, stats)
+                else:
+                    self._send_json(200, {"status": "ok"})
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not self.path.rstrip("/").endswith("chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                try:
+                    payload = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "invalid json", "type": "invalid_request_error"}})
+                    return
+
+                kind = upstream.classify(payload)
+                upstream._count("requests", kind)
+                upstream._count("inFlight")
+                try:
+                    self._respond(payload, kind)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    upstream._count("inFlight", delta=-1)
+
+            def _respond(self, payload: dict, kind: str) -> None:
+                settings = upstream.settings
+                rng = upstream._random()
+
+                roll = rng.random()
+                if roll < settings.rate_limit_rate:
+                    upstream._count("rateLimited")
+                    self._send_json(
+                        429,
+                        {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}},
+                        {"Retry-After": settings.retry_after},
+                    )
+                    return
+                if roll < settings.rate_limit_rate + settings.error_rate:
+                    upstream._count("errors")
+                    time.sleep(upstream._latency(kind).sample(rng))
+                    self._send_json(
+                        settings.error_status,
+                        {"error": {"message": "Injected upstream failure (mock)", "type": "server_error"}},
+                    )
+                    return
+
+                thinking = settings.reasoning or (payload.get("thinking") or {}).get("type") == "enabled"
+                content = upstream._output(kind, rng)
+                reasoning = upstream._output("reasoning", rng) if thinking and kind != "ocr" else ""
+                model = payload.get("model", "mock")
+
+                if payload.get("stream"):
+                    self._stream(model, kind, reasoning, content, rng)
+                    return
+
+                chunks = len(upstream._chunks(reasoning)) + len(upstream._chunks(content))
+                delay = upstream._latency(kind).sample(rng) + sum(
+                    settings.token_interval.sample(rng) for _ in range(chunks)
+                )
+                time.sleep(delay)
+                message = {"role": "assistant", "content": content}
+                if reasoning:
+                    message["reasoning_content"] = reasoning
+                completion_tokens = len(upstream.tokenize(content)) + len(upstream.tokenize(reasoning))
+                self._send_json(
+                    200,
+                    {
+                        "id": f"chatcmpl-mock-{upstream._counter}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                        "usage": {
+                            "prompt_tokens": len(json.dumps(payload.get("messages", []), ensure_ascii=False)) // 2,
+                            "completion_tokens": completion_tokens,
+                            "total_tokens": completion_tokens,
+                        },
+                    },
+                )
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _write_event(self, model: str, delta: dict, finish_reason: Optional[str] = None) -> None:
+                event = {
+                    "id": "chatcmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+            def _stream(self, model: str, kind: str, reasoning: str, content: str, rng: random.Random) -> None:
+                settings = upstream.settings
+                time.sleep(upstream._latency(kind).sample(rng))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                events = [("reasoning_content", chunk) for chunk in upstream._chunks(reasoning)]
+                events += [("content", chunk) for chunk in upstream._chunks(content)]
+                abort_at = len(events) // 2 if rng.random() < settings.stream_abort_rate else None
+
+                self._write_event(model, {"role": "assistant"})
+                for index, (key, chunk) in enumerate(events):
+                    if index == abort_at:
+                        upstream._count("streamAborts")
+                        # 不发送结束块直接断开，模拟上游中途掉线
+                        self.close_connection = True
+                        return
+                    self._write_event(model, {key: chunk})
+                    time.sleep(settings.token_interval.sample(rng))
+                self._write_event(model, {}, "stop")
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def serve(self, host: str, port: int) -> ThreadingHTTPServer:
+        """在后台线程中启动，供其他脚本在进程内使用。"""
+        server = _QuietServer((host, port), self.make_handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭连接池中的空闲连接是正常现象，不打印堆栈
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="lognormal:0.5,0.4", help="非流式响应 / 流式首个分片前的延迟分布")
+    parser.add_argument("--token-interval", default="fixed:0.01", help="相邻分片之间的延迟分布")
+    parser.add_argument(
+        "--kind-latency",
+        action="append",
+        default=[],
+        metavar="KIND=SPEC",
+        help="按请求类型覆盖延迟，例如 ocr=fixed:1.5（可重复）",
+    )
+    parser.add_argument("--tokens-per-chunk", type=int, default=1)
+    parser.add_argument("--reasoning", action="store_true", help="总是返回 reasoning_content")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回 429 的比例")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--stream-abort-rate", type=float, default=0.0, help="流式响应中途断开的比例")
+    parser.add_argument("--outputs", help="JSON 文件，按 ocr/parse/solution/solution_stream/reasoning 覆盖输出")
+    parser.add_argument("--seed", type=int)
+
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    outputs = dict(DEFAULT_OUTPUTS)
+    if args.outputs:
+        with open(args.outputs, encoding="utf-8") as f:
+            outputs.update(json.load(f))
+    kind_latency = {}
+    for item in args.kind_latency:
+        kind, _, spec = item.partition("=")
+        kind_latency[kind.strip()] = Distribution(spec)
+    return MockSettings(
+        latency=Distribution(args.latency),
+        token_interval=Distribution(args.token_interval),
+        kind_latency=kind_latency,
+        tokens_per_chunk=args.tokens_per_chunk,
+        reasoning=args.reasoning,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        stream_abort_rate=args.stream_abort_rate,
+        outputs=outputs,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    upstream = MockUpstream(settings_from_args(args))
+    server = _QuietServer((args.host, args.port), upstream.make_handler())
+    print(f"mock upstream listening on http://{args.host}:{args.port}/v1/chat/completions", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
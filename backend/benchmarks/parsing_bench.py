@@ -0,0 +1,264 @@
+"""Benchmark the ChatGLMService parsing and normalisation hot path against a stored baseline.
+
+Runs every function over the checked-in corpus (``corpus/solution_outputs.jsonl`` and
+``corpus/parse_outputs.jsonl``), grouped by output kind and size, and reports per-call
+time, throughput and peak allocation. Each time is also expressed relative to a fixed
+calibration workload measured right next to it, so the baseline stays comparable across
+machines. A function fails when the geometric mean of its groups' slowdowns exceeds the
+time tolerance, or when any group allocates more than the baseline allows.
+
+    python benchmarks/parsing_bench.py                    # 与基线比较，回退时以非零状态退出
+    python benchmarks/parsing_bench.py --update-baseline  # 有意的性能变化后更新基线
+    python benchmarks/parsing_bench.py --filter parse_solution_content/sections
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services.chatglm_service import ChatGLMService, chatglm_service  # noqa: E402
+from app.utils.errors import APIError  # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+SOLUTION_CORPUS = BENCH_DIR / "corpus" / "solution_outputs.jsonl"
+PARSE_CORPUS = BENCH_DIR / "corpus" / "parse_outputs.jsonl"
+BASELINE_PATH = BENCH_DIR / "baselines" / "parsing.json"
+
+# 允许与基线之间的差异：计时受机器负载影响较大，分配量基本确定
+DEFAULT_TIME_TOLERANCE = 0.20
+DEFAULT_MEMORY_TOLERANCE = 0.10
+MEMORY_SLACK_BYTES = 512
+
+
+def _extract_json(text: str):
+    try:
+        return ChatGLMService._extract_json(text)
+    except APIError:
+        return None
+
+
+FUNCTIONS = {
+    "_extract_json": ("solution", lambda sample: _extract_json(sample["text"])),
+    "_extract_solution_sections": ("solution", lambda sample: ChatGLMService._extract_solution_sections(sample["text"])),
+    "_normalize_steps_field": ("solution", lambda sample: ChatGLMService._normalize_steps_field(sample["text"])),
+    "parse_solution_content": ("solution", lambda sample: ChatGLMService.parse_solution_content(sample["text"])),
+    "_coerce_parse_result": (
+        "parse",
+        lambda sample: chatglm_service._coerce_parse_result(sample["data"], sample["source"]),
+    ),
+}
+
+_CALIBRATION_TEXT = "## 详细步骤\n" + "\n".join(f"{i}. 计算第 {i} 项，x = {i * 3}" for i in range(200))
+_CALIBRATION_RE = re.compile(r"(\d+)\.\s*([^\n]+)")
+
+
+def _calibration_workload() -> None:
+    items = _CALIBRATION_RE.findall(_CALIBRATION_TEXT)
+    json.loads(json.dumps({"steps": [text for _num, text in items]}, ensure_ascii=False))
+
+
+def load_groups() -> dict[str, list[dict]]:
+    corpora = {}
+    for name, path in (("solution", SOLUTION_CORPUS), ("parse", PARSE_CORPUS)):
+        with path.open(encoding="utf-8") as f:
+            corpora[name] = [json.loads(line) for line in f if line.strip()]
+
+    groups: dict[str, list[dict]] = defaultdict(list)
+    for function, (corpus, _call) in FUNCTIONS.items():
+        for sample in corpora[corpus]:
+            groups[f"{function}/{sample['kind']}/{sample['size']}"].append(sample)
+    return dict(sorted(groups.items()))
+
+
+def _sample_bytes(sample: dict) -> int:
+    if "text" in sample:
+        return len(sample["text"].encode("utf-8"))
+    return len(json.dumps(sample["data"], ensure_ascii=False).encode("utf-8")) + len(
+        sample["source"].encode("utf-8")
+    )
+
+
+def time_per_call(func, args: list, repeat: int, min_time: float) -> float:
+    """timeit 式测量：自动放大循环次数使单轮不少于 ``min_time``，取 ``repeat`` 轮中的最小值。"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            for arg in args:
+                func(arg)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed) + 1)
+
+    best = elapsed
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            for arg in args:
+                func(arg)
+        best = min(best, time.perf_counter() - started)
+    return best / (loops * len(args))
+
+
+def peak_allocation(func, args: list) -> int:
+    """单次调用期间新增内存的峰值（字节），取各输入的平均值。"""
+    for arg in args:
+        func(arg)  # 预热，排除正则编译、模块级缓存等一次性分配
+
+    tracemalloc.start()
+    try:
+        total = 0
+        for arg in args:
+            tracemalloc.reset_peak()
+            before, _peak = tracemalloc.get_traced_memory()
+            func(arg)
+            _current, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+    return round(total / len(args))
+
+
+def calibrate(repeat: int, min_time: float) -> float:
+    return time_per_call(lambda _arg: _calibration_workload(), [None], repeat, min_time)
+
+
+def run(groups: dict[str, list[dict]], repeat: int, min_time: float) -> dict:
+    calibrations = []
+    results = {}
+    for key, samples in groups.items():
+        function = key.split("/", 1)[0]
+        call = FUNCTIONS[function][1]
+        # 紧挨着被测分组测量校准负载，抵消运行过程中的 CPU 频率和负载变化
+        calibration = calibrate(repeat, min_time)
+        seconds = time_per_call(call, samples, repeat, min_time)
+        calibration = min(calibration, calibrate(repeat, min_time))
+        calibrations.append(calibration)
+        avg_bytes = sum(_sample_bytes(sample) for sample in samples) / len(samples)
+        results[key] = {
+            "samples": len(samples),
+            "inputBytes": round(avg_bytes),
+            "usPerCall": round(seconds * 1e6, 2),
+            "callsPerSecond": round(1 / seconds),
+            "mbPerSecond": round(avg_bytes / seconds / 1e6, 2),
+            "relCost": round(seconds / calibration, 4),
+            "peakBytes": peak_allocation(call, samples),
+        }
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "calibrationUs": round(min(calibrations) * 1e6, 2),
+        "groups": results,
+    }
+
+
+def compare(report: dict, baseline: dict, time_tolerance: float, memory_tolerance: float) -> list[str]:
+    failures = []
+    same_python = report["python"].rsplit(".", 1)[0] == baseline.get("python", "").rsplit(".", 1)[0]
+    if not same_python:
+        print(f"提示：基线来自 Python {baseline.get('python')}，当前 {report['python']}，跳过分配量比较")
+
+    ratios: dict[str, list[float]] = defaultdict(list)
+    for key, current in report["groups"].items():
+        expected = baseline.get("groups", {}).get(key)
+        if expected is None:
+            continue
+        ratio = current["relCost"] / expected["relCost"] if expected["relCost"] else 1.0
+        current["vsBaseline"] = round(ratio, 3)
+        ratios[key.split("/", 1)[0]].append(ratio)
+        memory_limit = expected["peakBytes"] * (1 + memory_tolerance) + MEMORY_SLACK_BYTES
+        if same_python and current["peakBytes"] > memory_limit:
+            failures.append(f"{key}: 峰值分配 {current['peakBytes']} B，基线 {expected['peakBytes']} B")
+
+    # 单个分组的计时噪声较大，按函数取几何平均后再判断
+    report["functions"] = {}
+    for function, values in sorted(ratios.items()):
+        geomean = math.exp(sum(math.log(value) for value in values) / len(values))
+        report["functions"][function] = round(geomean, 3)
+        if geomean > 1 + time_tolerance:
+            failures.append(f"{function}: 耗时为基线的 {geomean:.2f} 倍（允许 {1 + time_tolerance:.2f}）")
+    return failures
+
+
+def print_table(report: dict) -> None:
+    header = f"{'group':<52}{'us/call':>10}{'calls/s':>10}{'MB/s':>8}{'peak B':>10}{'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for key, item in report["groups"].items():
+        vs = f"{item['vsBaseline']:.2f}x" if "vsBaseline" in item else "-"
+        print(
+            f"{key:<52}{item['usPerCall']:>10.1f}{item['callsPerSecond']:>10}"
+            f"{item['mbPerSecond']:>8.2f}{item['peakBytes']:>10}{vs:>9}"
+        )
+    for function, ratio in report.get("functions", {}).items():
+        print(f"{function:<52}{ratio:>10.2f}x vs baseline")
+    print(f"calibration: {report['calibrationUs']} us  python {report['python']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的分组")
+    parser.add_argument("--repeat", type=int, default=5, help="每个分组测量的轮数，取最小值")
+    parser.add_argument("--min-time", type=float, default=0.03, help="每轮最短耗时（秒）")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    groups = {key: samples for key, samples in load_groups().items() if args.filter in key}
+    if not groups:
+        print(f"没有匹配 {args.filter!r} 的分组")
+        return 2
+
+    report = run(groups, args.repeat, args.min_time)
+
+    if args.update_baseline:
+        if args.filter and BASELINE_PATH.exists():
+            # 只更新选中的分组，保留其余基线
+            with BASELINE_PATH.open(encoding="utf-8") as f:
+                merged = json.load(f)
+            merged["groups"].update(report["groups"])
+            merged.update({key: report[key] for key in ("python", "platform", "calibrationUs")})
+            report = merged
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with BASELINE_PATH.open("w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1, sort_keys=True)
+            f.write("\n")
+        print_table(report)
+        print(f"基线已写入 {BASELINE_PATH}")
+        return 0
+
+    failures = []
+    if BASELINE_PATH.exists():
+        with BASELINE_PATH.open(encoding="utf-8") as f:
+            baseline = json.load(f)
+        failures = compare(report, baseline, args.time_tolerance, args.memory_tolerance)
+    else:
+        print(f"未找到基线 {BASELINE_PATH}，仅输出结果（使用 --update-baseline 生成）")
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_table(report)
+
+    for failure in failures:
+        print(f"[REGRESSION] {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Check the solution-text parsers against golden outputs recorded for a fixed corpus.
+
+The corpus (``corpus/solution_outputs.jsonl``) holds model outputs of every shape the
+parsers have to cope with; ``corpus/solution_golden.json`` holds what each parser
+returned for them. Any change to the parsing code must keep this script passing.
+
+    python benchmarks/parsing_golden.py            # 比对，不一致时以非零状态退出
+    python benchmarks/parsing_golden.py --update   # 有意修改解析行为后重新生成
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from app.services.chatglm_service import ChatGLMService  # noqa: E402
+from app.utils.errors import APIError  # noqa: E402
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+CORPUS_PATH = CORPUS_DIR / "solution_outputs.jsonl"
+GOLDEN_PATH = CORPUS_DIR / "solution_golden.json"
+
+
+def load_corpus() -> list[dict]:
+    with CORPUS_PATH.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _extract_json(text: str):
+    try:
+        return {"ok": ChatGLMService._extract_json(text)}
+    except APIError as exc:
+        return {"error": exc.message}
+
+
+def run_parsers(text: str) -> dict:
+    return {
+        "parse_solution_content": ChatGLMService.parse_solution_content(text),
+        "_extract_json": _extract_json(text),
+        "_extract_solution_from_json_like_text": ChatGLMService._extract_solution_from_json_like_text(text),
+        "_extract_solution_sections": ChatGLMService._extract_solution_sections(text),
+        "_normalize_steps_field": ChatGLMService._normalize_steps_field(text),
+        "_infer_answer_from_free_text": ChatGLMService._infer_answer_from_free_text(text),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--update", action="store_true", help="用当前实现重新生成 golden 文件")
+    args = parser.parse_args()
+
+    # 经过一次 JSON 往返，使元组、非字符串键等与读取 golden 文件后的形式一致
+    actual = json.loads(
+        json.dumps({sample["name"]: run_parsers(sample["text"]) for sample in load_corpus()}, ensure_ascii=False)
+    )
+
+    if args.update:
+        with GOLDEN_PATH.open("w", encoding="utf-8") as f:
+            json.dump(actual, f, ensure_ascii=False, indent=1, sort_keys=True)
+            f.write("\n")
+        print(f"已写入 {len(actual)} 条 golden 结果: {GOLDEN_PATH}")
+        return 0
+
+    with GOLDEN_PATH.open(encoding="utf-8") as f:
+        golden = json.load(f)
+
+    failures = 0
+    for name in sorted(set(golden) | set(actual)):
+        expected_outputs = golden.get(name, {})
+        actual_outputs = actual.get(name, {})
+        for function in sorted(set(expected_outputs) | set(actual_outputs)):
+            if expected_outputs.get(function) != actual_outputs.get(function):
+                failures += 1
+                print(f"[FAIL] {name} · {function}")
+                print(f"  expected: {json.dumps(expected_outputs.get(function), ensure_ascii=False)[:400]}")
+                print(f"  actual:   {json.dumps(actual_outputs.get(function), ensure_ascii=False)[:400]}")
+
+    total = sum(len(outputs) for outputs in golden.values())
+    print(f"{total - failures}/{total} 项与 golden 一致")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Effective rate limit and per-request overhead with multiple gunicorn workers.
+
+Starts the real app under gunicorn with ``--workers`` workers behind a simulated proxy
+(``TRUSTED_PROXY_COUNT=1``, client addresses sent in ``X-Forwarded-For``), once per
+counter storage (``memory://`` and the shared ``sqlite://`` file), and reports:
+
+- ``allowed``: how many of ``--requests`` concurrent ``GET /api/health`` from one client
+  pass a limit of ``--limit`` per minute (ideal: exactly ``--limit``);
+- ``otherClient``: whether a second client address still gets through afterwards;
+- ``weighted``: how many ``POST /api/solve-problem`` (cost 3 by default) pass for a third
+  client (ideal: ``--limit // 3``);
+- ``p50Ms`` / ``p99Ms``: latency of ``GET /api/health`` with the limiter counting but never
+  rejecting, i.e. the cost of one counter update per request.
+
+    python benchmarks/rate_limit_bench.py
+    python benchmarks/rate_limit_bench.py --workers 8 --limit 100 --requests 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import free_port, percentile, start_app, stop_process  # noqa: E402
+
+STORAGES = {
+    "memory": lambda workdir: "memory://",
+    "sqlite": lambda workdir: f"sqlite:///{workdir}/ratelimit.db",
+}
+
+
+def burst(base: str, client_ip: str, total: int, concurrency: int, method: str, path: str) -> int:
+    """同一客户端并发发送 total 个请求，返回没有被限流（非 429）的个数。"""
+    local = threading.local()
+
+    def send(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        response = local.session.request(
+            method, base + path, headers={"X-Forwarded-For": client_ip}, json={}, timeout=30
+        )
+        return response.status_code != 429
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return sum(pool.map(send, range(total)))
+
+
+def latency(base: str, total: int) -> list[float]:
+    session = requests.Session()
+    timings = []
+    for index in range(total):
+        started = time.perf_counter()
+        session.get(base + "/api/health", headers={"X-Forwarded-For": f"10.1.{index // 250}.{index % 250}"})
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=60)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-requests", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    report = {"workers": args.workers, "limit": args.limit, "requests": args.requests, "storages": []}
+    for name, make_uri in STORAGES.items():
+        workdir = tempfile.mkdtemp(prefix=f"rate-limit-bench-{name}-")
+        env = {"RATE_LIMIT_STORAGE_URI": make_uri(workdir), "TRUSTED_PROXY_COUNT": "1"}
+
+        # 启动检查本身也会计数，来自 127.0.0.1，不影响下面模拟的客户端地址
+        port = free_port()
+        process = start_app(
+            port, workdir, workers=args.workers, worker_class="sync", env={**env, "RATE_LIMIT_MAX_REQUESTS": str(args.limit)}
+        )
+        base = f"http://127.0.0.1:{port}"
+        try:
+            allowed = burst(base, "10.0.0.1", args.requests, args.concurrency, "GET", "/api/health")
+            other = requests.get(base + "/api/health", headers={"X-Forwarded-For": "10.0.0.2"}).status_code
+            weighted = burst(base, "10.0.0.3", args.requests, args.concurrency, "POST", "/api/solve-problem")
+        finally:
+            stop_process(process)
+
+        port = free_port()
+        process = start_app(port, workdir, workers=args.workers, worker_class="sync", env=env)
+        base = f"http://127.0.0.1:{port}"
+        try:
+            latency(base, 200)
+            timings = latency(base, args.latency_requests)
+        finally:
+            stop_process(process)
+
+        report["storages"].append(
+            {
+                "storage": name,
+                "allowed": allowed,
+                "otherClient": other != 429,
+                "weighted": weighted,
+                "p50Ms": round(percentile(timings, 50), 2),
+                "p99Ms": round(percentile(timings, 99), 2),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{args.workers} 个 worker，上限 {args.limit} 次/分钟，单个客户端并发发送 {args.requests} 个请求")
+    print(f"{'storage':<9}{'allowed':>9}{'other':>7}{'weighted':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for item in report["storages"]:
+        print(
+            f"{item['storage']:<9}{item['allowed']:>9}{str(item['otherClient']):>7}{item['weighted']:>10}"
+            f"{item['p50Ms']:>9}{item['p99Ms']:>9}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
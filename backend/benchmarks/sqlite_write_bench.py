@@ -0,0 +1,261 @@
+"""Concurrent write throughput of the SQLite database with and without the production pragmas.
+
+Spawns ``--workers`` processes (standing in for gunicorn workers), each creating the real app
+and running ``--threads`` threads against one shared database file. Every operation goes
+through the ORM like the request handlers do: inserting a history row (a solved problem),
+updating ``last_login_at`` (a login) or reading a summary page of the history list.
+Reports operations per second, write latency percentiles and errors such as
+``database is locked``, once with the ``SQLITE_*`` profile and once with SQLite defaults.
+``--slow-reader`` adds a thread that keeps scanning the whole table, like an export would.
+
+    python benchmarks/sqlite_write_bench.py
+    python benchmarks/sqlite_write_bench.py --workers 8 --threads 4 --duration 15 --read-ratio 0.5
+    python benchmarks/sqlite_write_bench.py --profile tuned --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import percentile  # noqa: E402
+
+USERS = 20
+SOLUTION = {
+    "steps": [f"第 {i} 步：配方并讨论对称轴与区间端点的位置关系，计算得到相应的函数值。" * 3 for i in range(8)],
+    "answer": "最大值为 11，最小值为 2。",
+    "summary": "二次函数在闭区间上的最值取决于对称轴与区间的位置关系。" * 4,
+}
+PARSE_RESULT = {"type": "计算题", "subject": "数学", "knowledgePoints": ["二次函数"], "difficulty": "中等"}
+
+
+def _profile_env(database_path: str, tuned: bool) -> dict:
+    return {
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "SQLITE_PRAGMAS_ENABLED": "true" if tuned else "false",
+        "RATE_LIMIT_MAX_REQUESTS": "1000000",
+    }
+
+
+def prepare_database(env: dict) -> list[str]:
+    os.environ.update(env)
+    from app import create_app
+    from app.extensions import db
+    from app.models.history_count import HistoryCount
+    from app.models.user import User
+
+    app = create_app("production")
+    with app.app_context():
+        users = [User(username=f"bench{i}") for i in range(USERS)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+        for user_id in user_ids:
+            HistoryCount.for_user(user_id)
+    return user_ids
+
+
+def _prepare_into_queue(env: dict, queue) -> None:
+    queue.put(prepare_database(env))
+
+
+def worker(
+    env: dict,
+    user_ids: list[str],
+    threads: int,
+    duration: float,
+    read_ratio: float,
+    seed: int,
+    slow_reader: bool,
+    results,
+):
+    os.environ.update(env)
+    from app import create_app
+    from app.extensions import db
+    from app.models.history import History
+    from app.models.user import User
+
+    app = create_app("production")
+    deadline = time.perf_counter() + duration
+    records: list[tuple[str, float, str]] = []
+    lock = threading.Lock()
+
+    def run(thread_index: int) -> None:
+        rng = random.Random(seed * 1000 + thread_index)
+        local = []
+        while time.perf_counter() < deadline:
+            user_id = rng.choice(user_ids)
+            roll = rng.random()
+            operation = "read" if roll < read_ratio else ("login" if roll < read_ratio + 0.1 else "insert")
+            started = time.perf_counter()
+            error = ""
+            with app.app_context():
+                try:
+                    if operation == "insert":
+                        db.session.add(
+                            History(
+                                user_id=user_id,
+                                question=f"已知 f(x) = x² - {rng.randrange(100)}x + 3，求最值。",
+                                parse_result=PARSE_RESULT,
+                                solution=SOLUTION,
+                            )
+                        )
+                        db.session.commit()
+                    elif operation == "login":
+                        user = db.session.get(User, user_id)
+                        user.last_login_at = datetime.utcnow()
+                        db.session.commit()
+                    else:
+                        (
+                            History.query.filter_by(user_id=user_id)
+                            .order_by(History.created_at.desc(), History.id.desc())
+                            .with_entities(*History.summary_columns())
+                            .limit(20)
+                            .all()
+                        )
+                except Exception as exc:  # noqa: BLE001
+                    db.session.rollback()
+                    error = str(exc).split("\n", 1)[0][:80]
+            local.append((operation, time.perf_counter() - started, error))
+        with lock:
+            records.extend(local)
+
+    def scan() -> None:
+        # 模拟导出这类长时间读取：逐批读取全部记录，每批之间稍作停顿，读取期间语句保持打开
+        local = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            error = ""
+            with app.app_context():
+                try:
+                    for index, _row in enumerate(db.session.execute(History.__table__.select()).yield_per(50)):
+                        if index % 50 == 0:
+                            time.sleep(0.005)
+                except Exception as exc:  # noqa: BLE001
+                    db.session.rollback()
+                    error = str(exc).split("\n", 1)[0][:80]
+            local.append(("scan", time.perf_counter() - started, error))
+        with lock:
+            records.extend(local)
+
+    pool = [threading.Thread(target=run, args=(index,)) for index in range(threads)]
+    if slow_reader:
+        pool.append(threading.Thread(target=scan))
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(records)
+
+
+def run_profile(tuned: bool, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="sqlite-bench-")
+    env = _profile_env(os.path.join(workdir, "bench.db"), tuned)
+    context = multiprocessing.get_context("spawn")
+
+    # 在子进程中建库，避免本进程导入应用后影响各 profile 的配置
+    setup_queue = context.Queue()
+    setup = context.Process(target=_prepare_into_queue, args=(env, setup_queue))
+    setup.start()
+    user_ids = setup_queue.get()
+    setup.join()
+
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=worker,
+            args=(
+                env,
+                user_ids,
+                args.threads,
+                args.duration,
+                args.read_ratio,
+                args.seed + index,
+                args.slow_reader and index == 0,
+                results,
+            ),
+        )
+        for index in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    records = []
+    for _ in processes:
+        records.extend(results.get())
+    for process in processes:
+        process.join()
+    wall = time.perf_counter() - started
+
+    report = {"profile": "tuned" if tuned else "defaults", "wallSeconds": round(wall, 2), "operations": {}}
+    errors = Counter(error for _op, _elapsed, error in records if error)
+    for operation in ("insert", "login", "read", "scan"):
+        ok = [elapsed * 1000 for op, elapsed, error in records if op == operation and not error]
+        failed = sum(1 for op, _elapsed, error in records if op == operation and error)
+        report["operations"][operation] = {
+            "ok": len(ok),
+            "failed": failed,
+            "perSecond": round(len(ok) / args.duration, 1),
+            "p50Ms": round(percentile(ok, 50), 2),
+            "p95Ms": round(percentile(ok, 95), 2),
+            "p99Ms": round(percentile(ok, 99), 2),
+        }
+    writes = report["operations"]["insert"]["ok"] + report["operations"]["login"]["ok"]
+    report["writesPerSecond"] = round(writes / args.duration, 1)
+    report["errors"] = dict(errors.most_common(5))
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4, help="进程数（模拟 gunicorn worker）")
+    parser.add_argument("--threads", type=int, default=4, help="每个进程的并发线程数")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--read-ratio", type=float, default=0.3, help="读列表操作的比例，其余为写（10% 为登录更新）")
+    parser.add_argument("--slow-reader", action="store_true", help="额外运行一个持续全表扫描的慢读线程")
+    parser.add_argument("--profile", choices=["both", "tuned", "defaults"], default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出完整结果")
+    args = parser.parse_args()
+
+    profiles = {"both": [False, True], "tuned": [True], "defaults": [False]}[args.profile]
+    reports = [run_profile(tuned, args) for tuned in profiles]
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{args.workers} 个进程 × {args.threads} 个线程，持续 {args.duration} 秒，读比例 {args.read_ratio}")
+    header = f"{'profile':<10}{'operation':<10}{'ok/s':>9}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        for operation, item in report["operations"].items():
+            if not item["ok"] and not item["failed"]:
+                continue
+            print(
+                f"{report['profile']:<10}{operation:<10}{item['perSecond']:>9}{item['failed']:>8}"
+                f"{item['p50Ms']:>9}{item['p95Ms']:>9}{item['p99Ms']:>9}"
+            )
+        print(f"{report['profile']:<10}{'writes/s':<10}{report['writesPerSecond']:>9}")
+        if report["errors"]:
+            print(f"  errors: {report['errors']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
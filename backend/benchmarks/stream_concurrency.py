@@ -0,0 +1,171 @@
+"""Measure how many concurrent /api/solve-stream requests a gunicorn setup can serve.
+
+Starts a slow fake chat-completions upstream in-process, runs the real app under
+gunicorn against it and opens N streams at once.
+
+    python benchmarks/stream_concurrency.py --worker-class sync --concurrency 200
+    python benchmarks/stream_concurrency.py --worker-class gevent --concurrency 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from common import free_port, percentile, start_app, stop_process
+
+
+def make_upstream_handler(chunks: int, interval: float):
+    class SlowStreamHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *_args):
+            pass
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _write_chunk(self, data: bytes) -> None:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for index in range(chunks):
+                    delta = {"choices": [{"delta": {"content": f"第{index + 1}段 "}}]}
+                    self._write_chunk(f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    time.sleep(interval)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return SlowStreamHandler
+
+
+def start_upstream(port: int, chunks: int, interval: float) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_upstream_handler(chunks, interval))
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_stream(url: str, deadline: float, results: list, lock: threading.Lock) -> None:
+    started = time.perf_counter()
+    first_byte = None
+    done = False
+    try:
+        with requests.post(
+            url,
+            json={"text": "1+1=?", "parseResult": {"type": "解答", "subject": "数学"}},
+            stream=True,
+            timeout=(5, max(1.0, deadline - time.time())),
+        ) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if first_byte is None and line:
+                    first_byte = time.perf_counter() - started
+                if line == "data: [DONE]":
+                    done = True
+                    break
+                if time.time() > deadline:
+                    break
+    except requests.RequestException:
+        pass
+    with lock:
+        results.append(
+            {
+                "done": done,
+                "ttfb": first_byte,
+                "elapsed": time.perf_counter() - started,
+            }
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--worker-class", default="sync", choices=["sync", "gevent"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=20, help="每个上游流的分片数")
+    parser.add_argument("--interval", type=float, default=0.25, help="上游分片间隔（秒）")
+    parser.add_argument("--deadline", type=float, default=30, help="整体截止时间（秒）")
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    app_port = free_port()
+    upstream = start_upstream(upstream_port, args.chunks, args.interval)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process = start_app(
+            app_port,
+            workdir,
+            workers=args.workers,
+            worker_class=args.worker_class,
+            env={
+                "DEEPSEEK_API_KEY": "bench",
+                "DEEPSEEK_API_URL": f"http://127.0.0.1:{upstream_port}/chat/completions",
+            },
+        )
+        try:
+            url = f"http://127.0.0.1:{app_port}/api/solve-stream"
+            results: list[dict] = []
+            lock = threading.Lock()
+            started = time.perf_counter()
+            deadline = time.time() + args.deadline
+            threads = [
+                threading.Thread(target=run_stream, args=(url, deadline, results, lock), daemon=True)
+                for _ in range(args.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(args.deadline + 10)
+            wall = time.perf_counter() - started
+        finally:
+            stop_process(process)
+            upstream.shutdown()
+
+    completed = [item for item in results if item["done"]]
+    ttfb = [item["ttfb"] for item in results if item["ttfb"] is not None]
+    elapsed = [item["elapsed"] for item in completed]
+    streaming = [item["elapsed"] - item["ttfb"] for item in completed if item["ttfb"] is not None]
+    stream_seconds = args.chunks * args.interval
+
+    report = {
+        "workerClass": args.worker_class,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "upstreamStreamSeconds": round(stream_seconds, 2),
+        "completed": len(completed),
+        "failedOrTimedOut": args.concurrency - len(completed),
+        "wallSeconds": round(wall, 2),
+        "ttfbP50": round(percentile(ttfb, 50), 3),
+        "ttfbP95": round(percentile(ttfb, 95), 3),
+        "elapsedP50": round(percentile(elapsed, 50), 3),
+        "elapsedP95": round(percentile(elapsed, 95), 3),
+        # 首字节之后的流式传输时间总和 / 墙钟时间，约等于同时在服务的流数量
+        "effectiveConcurrentStreams": round(sum(streaming) / wall, 1) if wall else 0,
+        "meanElapsed": round(statistics.fmean(elapsed), 3) if elapsed else None,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
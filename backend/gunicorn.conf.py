@@ -1,4 +1,42 @@
-bind = "0.0.0.0:3000"
-workers = 2
-timeout = 120
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# 与 app/config.py 一致，允许在 backend/.env 中配置 GUNICORN_* 变量
+load_dotenv(Path(__file__).resolve().parent / ".env")
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:3000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
 preload_app = True
+
+# sync：每个 worker 同时只处理一个请求；gevent：协程 worker，等待上游时不占用进程，
+# 单个 worker 可同时挂起上千个 /api/solve-stream 等长连接请求。
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+
+if worker_class == "gevent":
+    # preload_app 会在 master 中先导入应用（requests/ssl/sqlite 等），必须在此之前打补丁
+    from gevent import monkey
+
+    monkey.patch_all()
+
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+    # 并发的上游请求数随之增加，连接池也需要相应放大
+    os.environ.setdefault("UPSTREAM_POOL_MAXSIZE", "200")
+
+
+def post_worker_init(worker):
+    # preload_app 下应用在 master 中创建；连接池按 worker 进程建立并在这里预热
+    from app.services.http_client import upstream_client
+
+    app = worker.app.wsgi()
+    with app.app_context():
+        upstream_client.warm_up()
+
+
+def worker_exit(server, worker):
+    # 正常退出（重启、缩容、SIGTERM）时写完延迟写入队列中的历史记录
+    from app.services.history_writer import history_writer
+
+    history_writer.shutdown()
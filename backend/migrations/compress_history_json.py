@@ -0,0 +1,112 @@
+"""Rewrite History.parse_result and History.solution in the current compression format.
+
+Rows are read and updated in primary-key order, ``--chunk-size`` rows per transaction, so the
+app can keep serving while the script runs and an interrupted run can simply be restarted.
+Rows already stored the way the current settings would store them are left alone.
+
+    python migrations/compress_history_json.py
+    python migrations/compress_history_json.py --vacuum          # 回收空间
+    python migrations/compress_history_json.py --decompress      # 降级前恢复为 JSON 文本
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from sqlalchemy import Text, bindparam, select, type_coerce, update  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.models.history import History  # noqa: E402
+from app.models.types import configure_json_compression, decode_json, encode_json  # noqa: E402
+
+COLUMNS = ("parse_result", "solution")
+
+
+def _stored_size(value) -> int:
+    return len(value.encode("utf-8")) if isinstance(value, str) else len(value)
+
+
+def recompress_history(chunk_size: int) -> dict:
+    table = History.__table__
+    # 按 Text 读取，拿到库中原样存储的文本或字节
+    raw_columns = [type_coerce(table.c[name], Text).label(name) for name in COLUMNS]
+    query = select(table.c.id, *raw_columns).order_by(table.c.id)
+    rewrite = (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values({name: bindparam(f"new_{name}", type_=Text) for name in COLUMNS})
+    )
+
+    stats = {"rows": 0, "rewritten": 0, "bytesBefore": 0, "bytesAfter": 0}
+    last_id = None
+    while True:
+        chunk = query if last_id is None else query.where(table.c.id > last_id)
+        rows = db.session.execute(chunk.limit(chunk_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        changes = []
+        for row in rows:
+            change = {"row_id": row.id}
+            for name in COLUMNS:
+                stored = getattr(row, name)
+                encoded = encode_json(decode_json(stored))
+                stats["bytesBefore"] += _stored_size(stored)
+                stats["bytesAfter"] += _stored_size(encoded)
+                change[f"new_{name}"] = encoded
+                if encoded != stored:
+                    change["changed"] = True
+            if change.pop("changed", False):
+                changes.append(change)
+        if changes:
+            db.session.execute(rewrite, changes)
+        db.session.commit()
+        stats["rows"] += len(rows)
+        stats["rewritten"] += len(changes)
+        print(f"已处理 {stats['rows']} 条，改写 {stats['rewritten']} 条", flush=True)
+    return stats
+
+
+def vacuum() -> None:
+    # 改写后空出的页只会被后续写入复用，VACUUM 才会缩小文件；期间会锁住整个数据库
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("VACUUM")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--decompress", action="store_true", help="全部改写为未压缩的 JSON 文本")
+    parser.add_argument("--vacuum", action="store_true", help="完成后执行 VACUUM 缩小数据库文件")
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.decompress:
+        app.config["HISTORY_JSON_COMPRESSION"] = "off"
+        configure_json_compression(app)
+
+    started = time.perf_counter()
+    with app.app_context():
+        stats = recompress_history(args.chunk_size)
+        if args.vacuum:
+            vacuum()
+
+    print("历史记录 JSON 字段改写完成")
+    print(f"记录: 共 {stats['rows']}, 改写 {stats['rewritten']}")
+    print(
+        f"字段大小: {stats['bytesBefore'] / 1024 / 1024:.1f} MiB -> {stats['bytesAfter'] / 1024 / 1024:.1f} MiB，"
+        f"用时 {time.perf_counter() - started:.1f} 秒"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
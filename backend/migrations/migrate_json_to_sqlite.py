@@ -1,28 +1,174 @@
-"""Migrate legacy JSON data into SQLite tables."""
+"""Migrate legacy JSON data into SQLite tables.
+
+``users.json`` and ``history.json`` are parsed incrementally, so memory does not grow with
+the size of the dump. Ids and usernames already in the database are loaded into sets once,
+and new rows are bulk-inserted ``--chunk-size`` at a time, one commit per chunk. After each
+commit the byte offset reached in the file is written to a checkpoint; running the script
+again continues from there, and rows that were committed but not yet checkpointed are
+skipped as existing.
+
+    python migrations/migrate_json_to_sqlite.py
+    python migrations/migrate_json_to_sqlite.py --data-dir /path/to/dump --chunk-size 5000
+    python migrations/migrate_json_to_sqlite.py --restart     # 忽略检查点，从头开始
+"""
 
 from __future__ import annotations
 
+import argparse
+import codecs
 import json
+import os
 import re
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Iterator
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+from sqlalchemy import insert, select  # noqa: E402
+
 from app import create_app  # noqa: E402
 from app.extensions import db  # noqa: E402
 from app.models.history import History  # noqa: E402
+from app.models.history_count import HistoryCount  # noqa: E402
+from app.models.history_search import ensure_search_index  # noqa: E402
+from app.models.question_signature import ensure_question_signatures  # noqa: E402
 from app.models.user import User  # noqa: E402
 
-
-def load_json(path: Path):
-    if not path.exists():
-        return []
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+READ_SIZE = 1 << 20
+PROGRESS_INTERVAL_SECONDS = 5
+
+
+class JsonArrayReader:
+    """逐个读出文件顶层 JSON 数组的元素，内存中只保留当前读到的一段文本。
+
+    ``offset`` 是最近读出的元素之后的字节位置；从这个位置重新打开即可接着读。
+    """
+
+    def __init__(self, path: Path, start: int = 0):
+        self.path = path
+        self.offset = start
+        self._resume = start > 0
+
+    def __iter__(self) -> Iterator:
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        with self.path.open("rb") as fh:
+            fh.seek(self.offset)
+            buffer, pos, eof = "", 0, False
+
+            def fill() -> bool:
+                nonlocal buffer, pos, eof
+                if eof:
+                    return False
+                data = fh.read(READ_SIZE)
+                eof = not data
+                # 丢掉已经解析过的部分，再接上新读到的文本
+                buffer = buffer[pos:] + utf8.decode(data, final=eof)
+                pos = 0
+                return True
+
+            def next_char() -> str:
+                nonlocal pos
+                while True:
+                    while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                        self.offset += 1
+                        pos += 1
+                    if pos < len(buffer):
+                        return buffer[pos]
+                    if not fill():
+                        raise ValueError(f"{self.path.name}: 文件在数组结束之前截断")
+
+            def expect(char: str) -> None:
+                nonlocal pos
+                if next_char() != char:
+                    raise ValueError(f"{self.path.name}: 第 {self.offset} 字节处应为 {char!r}")
+                pos += 1
+                self.offset += 1
+
+            if not self._resume:
+                # 允许文件以 UTF-8 BOM 开头
+                fill()
+                if buffer.startswith("\ufeff"):
+                    pos = 1
+                    self.offset += 3
+                expect("[")
+            first = not self._resume
+            while True:
+                if next_char() == "]":
+                    return
+                if not first:
+                    expect(",")
+                    next_char()
+                first = False
+                while True:
+                    try:
+                        item, end = decoder.raw_decode(buffer, pos)
+                        # 元素恰好在缓冲区末尾结束时可能还没读完（例如数字），多读一些再确认
+                        if end < len(buffer) or eof:
+                            break
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    fill()
+                self.offset += len(buffer[pos:end].encode("utf-8"))
+                pos = end
+                yield item
+
+
+class Checkpoint:
+    """记录每个文件已经提交到的字节位置；文件大小或修改时间变化后作废。"""
+
+    def __init__(self, path: Path, restart: bool):
+        self.path = path
+        self.state = {}
+        if path.exists() and not restart:
+            with path.open("r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    @staticmethod
+    def _fingerprint(source: Path) -> dict:
+        stat = source.stat()
+        return {"size": stat.st_size, "mtimeNs": stat.st_mtime_ns}
+
+    def start_offset(self, source: Path) -> int:
+        entry = self.state.get(source.name)
+        if not entry or {key: entry.get(key) for key in ("size", "mtimeNs")} != self._fingerprint(source):
+            return 0
+        return entry["offset"]
+
+    def save(self, source: Path, offset: int) -> None:
+        self.state[source.name] = {"offset": offset, **self._fingerprint(source)}
+        temp_path = self.path.with_suffix(".tmp")
+        with temp_path.open("w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.path)
+
+
+class Progress:
+    def __init__(self, name: str, source: Path, start: int):
+        self.name = name
+        self.total_bytes = max(1, source.stat().st_size)
+        self.start = start
+        self.started = self.last_report = time.perf_counter()
+        self.read = self.inserted = self.skipped = 0
+
+    def report(self, offset: int, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self.last_report < PROGRESS_INTERVAL_SECONDS:
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-9)
+        print(
+            f"{self.name}: 已读取 {self.read} 条，新增 {self.inserted}，跳过 {self.skipped}，"
+            f"{offset / self.total_bytes:.1%}，{self.read / elapsed:.0f} 条/秒，"
+            f"{(offset - self.start) / 1024 / 1024 / elapsed:.1f} MiB/秒",
+            flush=True,
+        )
 
 
 def parse_time(value: str | None):
@@ -39,99 +185,144 @@ def looks_like_sha256_hash(value: str) -> bool:
     return bool(re.fullmatch(r"[0-9a-fA-F]{64}", value or ""))
 
 
-def migrate_users(users_path: Path):
-    users_data = load_json(users_path)
-    inserted = 0
-    skipped = 0
-
-    for item in users_data:
-        user_id = item.get("id")
-        username = item.get("username")
-        password = item.get("password")
-
-        if not user_id or not username:
-            skipped += 1
-            continue
-
-        exists = User.query.filter((User.id == user_id) | (User.username == username)).first()
-        if exists:
-            skipped += 1
-            continue
-
-        user = User(
-            id=user_id,
-            username=username,
-            created_at=parse_time(item.get("createdAt")) or datetime.utcnow(),
-            last_login_at=parse_time(item.get("lastLoginAt")),
-        )
+def user_row(item, user_ids: set, usernames: set) -> dict | None:
+    if not isinstance(item, dict):
+        return None
+    user_id = item.get("id")
+    username = item.get("username")
+    if not user_id or not username or user_id in user_ids or username in usernames:
+        return None
 
-        if password:
-            if looks_like_sha256_hash(password):
-                user.password_legacy = password
-            else:
-                user.password_hash = password
-
-        db.session.add(user)
-        inserted += 1
-
-    db.session.commit()
-    return inserted, skipped
-
-
-def migrate_history(history_path: Path):
-    history_data = load_json(history_path)
-    inserted = 0
-    skipped = 0
-
-    for item in history_data:
-        record_id = item.get("id")
-        user_id = item.get("userId")
-        question = item.get("question")
-
-        if not record_id or not user_id or not question:
-            skipped += 1
-            continue
-
-        if History.query.filter_by(id=record_id).first():
-            skipped += 1
-            continue
-
-        user = db.session.get(User, user_id)
-        if not user:
-            skipped += 1
-            continue
-
-        record = History(
-            id=record_id,
-            user_id=user_id,
-            username=item.get("username"),
-            question=question,
-            parse_result=item.get("parseResult") or {},
-            solution=item.get("solution") or {},
-            created_at=parse_time(item.get("createdAt")) or datetime.utcnow(),
-        )
+    password = item.get("password")
+    return {
+        "id": user_id,
+        "username": username,
+        "password_hash": password if password and not looks_like_sha256_hash(password) else None,
+        "password_legacy": password if password and looks_like_sha256_hash(password) else None,
+        "created_at": parse_time(item.get("createdAt")) or datetime.utcnow(),
+        "last_login_at": parse_time(item.get("lastLoginAt")),
+    }
 
-        db.session.add(record)
-        inserted += 1
 
-    db.session.commit()
-    return inserted, skipped
+def history_row(item, history_ids: set, user_ids: set) -> dict | None:
+    if not isinstance(item, dict):
+        return None
+    record_id = item.get("id")
+    user_id = item.get("userId")
+    question = item.get("question")
+    if not record_id or not user_id or not question or record_id in history_ids or user_id not in user_ids:
+        return None
 
+    parse_result = item.get("parseResult") or {}
+    return {
+        "id": record_id,
+        "user_id": user_id,
+        "username": item.get("username"),
+        "question": question,
+        "parse_result": parse_result,
+        "solution": item.get("solution") or {},
+        "created_at": parse_time(item.get("createdAt")) or datetime.utcnow(),
+        **History.parse_fields(parse_result),
+    }
+
+
+def migrate_file(
+    name: str, source: Path, checkpoint: Checkpoint, chunk_size: int, build_row, on_chunk
+) -> Progress | None:
+    if not source.exists():
+        print(f"{name}: 未找到 {source}，跳过")
+        return None
+    start = checkpoint.start_offset(source)
+    progress = Progress(name, source, start)
+    if start:
+        print(f"{name}: 从检查点继续（第 {start} 字节）")
+
+    reader = JsonArrayReader(source, start)
+    rows = []
+
+    def commit(offset: int) -> None:
+        if rows:
+            on_chunk(rows)
+        db.session.commit()
+        checkpoint.save(source, offset)
+        rows.clear()
+
+    for item in reader:
+        progress.read += 1
+        row = build_row(item)
+        if row is None:
+            progress.skipped += 1
+        else:
+            rows.append(row)
+            progress.inserted += 1
+        if len(rows) >= chunk_size:
+            commit(reader.offset)
+        progress.report(reader.offset)
+    commit(reader.offset)
+    progress.report(reader.offset, force=True)
+    return progress
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=PROJECT_ROOT / "data")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="每次批量插入并提交的行数")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="默认为数据目录下的 .migrate_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="忽略已有检查点，从文件开头重新读取")
+    args = parser.parse_args()
 
-def main():
     app = create_app()
-    data_dir = PROJECT_ROOT / "data"
+    checkpoint = Checkpoint(args.checkpoint or args.data_dir / ".migrate_checkpoint.json", args.restart)
+    started = time.perf_counter()
 
     with app.app_context():
         db.create_all()
 
-        user_inserted, user_skipped = migrate_users(data_dir / "users.json")
-        history_inserted, history_skipped = migrate_history(data_dir / "history.json")
+        # 已有的 id 一次性读入内存，之后每行只做集合查找，不再逐行查询数据库
+        user_ids = set(db.session.execute(select(User.id)).scalars())
+        usernames = set(db.session.execute(select(User.username)).scalars())
+        history_ids = set(db.session.execute(select(History.id)).scalars())
+
+        def build_user(item):
+            row = user_row(item, user_ids, usernames)
+            if row:
+                user_ids.add(row["id"])
+                usernames.add(row["username"])
+            return row
+
+        def build_history(item):
+            row = history_row(item, history_ids, user_ids)
+            if row:
+                history_ids.add(row["id"])
+            return row
+
+        def insert_users(rows):
+            db.session.execute(insert(User.__table__), rows)
+
+        def insert_histories(rows):
+            db.session.execute(insert(History.__table__), rows)
+            # 批量插入不经过 ORM 事件，这些用户的记录数需要重新统计
+            HistoryCount.invalidate({row["user_id"] for row in rows})
+
+        users = migrate_file(
+            "用户", args.data_dir / "users.json", checkpoint, args.chunk_size, build_user, insert_users
+        )
+        histories = migrate_file(
+            "历史", args.data_dir / "history.json", checkpoint, args.chunk_size, build_history, insert_histories
+        )
+
+        # 搜索文本和近似重复段键同样不经过 ORM 事件，在这里补齐，避免下次启动时再做
+        ensure_search_index()
+        if app.config["DEDUP_MODE"] != "off":
+            ensure_question_signatures()
 
     print("JSON -> SQLite 迁移完成")
-    print(f"用户: 新增 {user_inserted}, 跳过 {user_skipped}")
-    print(f"历史: 新增 {history_inserted}, 跳过 {history_skipped}")
+    for name, progress in (("用户", users), ("历史", histories)):
+        if progress:
+            print(f"{name}: 新增 {progress.inserted}, 跳过 {progress.skipped}")
+    print(f"用时 {time.perf_counter() - started:.1f} 秒")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
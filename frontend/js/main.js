@@ -12,9 +12,11 @@ const AppState = {
     isProcessing: false,
     currentStep: 0, // 0: 未开始, 1: 识别中, 2: 解析中, 3: 解答中
     imageData: null, // 压缩后的图片 Base64
+    imageBlob: null, // 压缩后的图片二进制，上传时不再经过 base64
     recognizedText: '',
     parseResult: null,
     solution: null,
+    historyId: null, // 服务端已保存的历史记录 ID
     history: [],
     currentUser: null
 };
@@ -284,6 +286,10 @@ function compressImage(img, type) {
     // 转换为 Base64 (质量 0.8)
     const compressedData = canvas.toDataURL(type, 0.8);
     AppState.imageData = compressedData;
+    AppState.imageBlob = null;
+    canvas.toBlob(blob => {
+        if (AppState.imageData === compressedData) AppState.imageBlob = blob;
+    }, type, 0.8);
     
     // 显示预览
     showImagePreview(compressedData);
@@ -306,6 +312,7 @@ function removeImage(e) {
     e.stopPropagation();
     
     AppState.imageData = null;
+    AppState.imageBlob = null;
     DOM.imageInput.value = '';
     DOM.imagePreview.src = '';
     
@@ -364,13 +371,9 @@ async function handleSubmit() {
     try {
         if (AppState.currentTab === 'text') {
             AppState.recognizedText = DOM.textInput.value.trim();
-            await skipRecognitionStep();
-        } else {
-            await performRecognition();
         }
 
-        await performParsing();
-        await performSolving();
+        await performStreamingPipeline();
         await saveToHistory();
         
     } catch (error) {
@@ -430,88 +433,120 @@ async function solveWithFullPipeline() {
 // 多 Agent 流程
 // ========================================
 
-async function performRecognition() {
-    showProgress(1);
-    
-    // 调用后端 API 进行图像识别
-    const response = await UserManager.fetchApi('/api/recognize', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ image: AppState.imageData })
-    });
-    
-    if (!response.ok) throw new Error('识别失败');
-    
-    const result = await response.json();
-    if (!result.success) throw new Error(result.error || '识别失败');
-    
-    AppState.recognizedText = normalizeRecognizedText(result.data.text);
-    
-    showRecognitionResult();
+// 以 multipart 上传图片；Content-Type 由浏览器连同 boundary 一起设置
+function buildImageUpload(fields = {}) {
+    const form = new FormData();
+    form.append('image', AppState.imageBlob, 'image');
+    Object.entries(fields).forEach(([key, value]) => form.append(key, String(value)));
+
+    const headers = { ...UserManager.getHeaders() };
+    delete headers['Content-Type'];
+    return { headers, body: form };
 }
 
-async function skipRecognitionStep() {
+// 单个 SSE 流完成识别 → 解析 → 解答，省去多次请求往返
+async function performStreamingPipeline(options = {}) {
     showProgress(1);
-    // 文字输入不需要识别，直接显示
-    showRecognitionResult();
-}
+    AppState.historyId = null;
+    AppState.solution = null;
+    let offered = null;
+
+    const skipDuplicate = Boolean(options.skipDuplicate);
+    const upload = AppState.currentTab === 'image' && AppState.imageBlob
+        ? buildImageUpload({ skipDuplicate })
+        : {
+            headers: UserManager.getHeaders(),
+            body: JSON.stringify({
+                type: AppState.currentTab,
+                content: AppState.currentTab === 'text' ? AppState.recognizedText : AppState.imageData,
+                skipDuplicate
+            })
+        };
+    const response = await UserManager.fetchApi('/api/solve-problem-stream', { method: 'POST', ...upload });
 
-async function performParsing() {
-    showProgress(2);
-    
-    // 调用后端 API 进行题目解析
-    const response = await UserManager.fetchApi('/api/parse', {
-        method: 'POST',
-        headers: UserManager.getHeaders(),
-        body: JSON.stringify({ 
-            text: AppState.recognizedText
-        })
+    if (!response.ok || !response.body) throw new Error('解题失败');
+
+    let reasoningText = '';
+    let contentText = '';
+
+    await readSSEEvents(response, event => {
+        if (event.error) {
+            throw new Error(event.error);
+        }
+        switch (event.type) {
+            case 'recognized':
+                AppState.recognizedText = normalizeRecognizedText(event.text);
+                showRecognitionResult();
+                showProgress(2);
+                break;
+            case 'parsed':
+                AppState.parseResult = event.parseResult;
+                showParseResult();
+                showProgress(3);
+                showStreamingSolutionResult();
+                break;
+            case 'reasoning':
+                reasoningText += event.content || '';
+                updateStreamingMarkdown(DOM.solutionReasoning, reasoningText || '模型正在思考...');
+                break;
+            case 'content':
+                contentText += event.content || '';
+                updateStreamingMarkdown(DOM.solutionSteps, contentText || '正在生成解答...');
+                break;
+            case 'solution':
+                AppState.solution = event.solution;
+                break;
+            case 'duplicate':
+                // offer 模式下服务端只返回相似题目的已有解答，由用户决定是否采用
+                if (event.duplicate && event.duplicate.solution) {
+                    offered = event.duplicate;
+                }
+                break;
+            case 'done':
+                AppState.historyId = event.historyId || null;
+                break;
+            default:
+                break;
+        }
     });
-    
-    if (!response.ok) {
-        let errorText = '解析失败';
-        try {
-            const errBody = await response.json();
-            errorText = errBody.error || errBody.message || errorText;
-        } catch (e) {
-            // ignore json parse error
+
+    if (offered && !AppState.solution) {
+        const similarity = Math.round((offered.similarity || 0) * 100);
+        if (!window.confirm(`找到相似度 ${similarity}% 的已解题目，是否直接使用已有解答？`)) {
+            await performStreamingPipeline({ skipDuplicate: true });
+            return;
         }
-        throw new Error(errorText);
+        AppState.parseResult = offered.parseResult;
+        AppState.solution = offered.solution;
+        showParseResult();
+        showProgress(3);
+        showStreamingSolutionResult();
     }
-    
-    const result = await response.json();
-    if (!result.success) throw new Error(result.error || '解析失败');
-    
-    AppState.parseResult = result.data;
-    
-    showParseResult();
-}
 
-async function performSolving() {
-    showProgress(3);
-    showStreamingSolutionResult();
-    
-    const response = await UserManager.fetchApi('/api/solve-stream', {
-        method: 'POST',
-        headers: UserManager.getHeaders(),
-        body: JSON.stringify({ 
-            text: AppState.recognizedText, 
-            parseResult: AppState.parseResult
-        })
-    });
-    
-    if (!response.ok || !response.body) throw new Error('解答生成失败');
+    if (AppState.solution) {
+        showSolutionResult();
+        return;
+    }
 
+    AppState.solution = {
+        reasoning: reasoningText,
+        thinking: '',
+        steps: contentText ? [contentText] : [],
+        answer: '',
+        summary: '',
+    };
+    updateStreamingMarkdown(DOM.solutionReasoning, reasoningText || '模型未返回独立思考过程。');
+    updateStreamingMarkdown(DOM.solutionSteps, contentText || '暂未生成详细步骤，请重试。');
+}
+
+async function readSSEEvents(response, onEvent) {
     const reader = response.body.getReader();
     const decoder = new TextDecoder('utf-8');
     let buffer = '';
-    let reasoningText = '';
-    let contentText = '';
-    let streamDone = false;
 
-    while (!streamDone) {
+    while (true) {
         const { value, done } = await reader.read();
-        if (done) break;
+        if (done) return;
 
         buffer += decoder.decode(value, { stream: true });
         const events = buffer.split('\n\n');
@@ -521,33 +556,12 @@ async function performSolving() {
             const event = parseSSEEvent(eventText);
             if (!event) continue;
             if (event.done) {
-                buffer = '';
-                streamDone = true;
-                break;
-            }
-            if (event.error) {
-                throw new Error(event.error);
-            }
-            if (event.type === 'reasoning') {
-                reasoningText += event.content || '';
-                updateStreamingMarkdown(DOM.solutionReasoning, reasoningText || '模型正在思考...');
-            } else {
-                contentText += event.content || '';
-                updateStreamingMarkdown(DOM.solutionSteps, contentText || '正在生成解答...');
+                await reader.cancel();
+                return;
             }
+            onEvent(event);
         }
     }
-
-    AppState.solution = {
-        reasoning: reasoningText,
-        thinking: '',
-        steps: contentText ? [contentText] : [],
-        answer: '',
-        summary: '',
-    };
-
-    updateStreamingMarkdown(DOM.solutionReasoning, reasoningText || '模型未返回独立思考过程。');
-    updateStreamingMarkdown(DOM.solutionSteps, contentText || '暂未生成详细步骤，请重试。');
 }
 
 // ========================================
@@ -773,7 +787,8 @@ function loadHistory() {
 
 async function loadHistoryFromServer() {
     try {
-        const response = await UserManager.fetchApi('/api/history', {
+        // 列表只取摘要，点击某条记录时再加载完整解答
+        const response = await UserManager.fetchApi('/api/history?view=summary&limit=50', {
             method: 'GET',
             headers: UserManager.getHeaders()
         });
@@ -786,10 +801,10 @@ async function loadHistoryFromServer() {
                 id: record.id,
                 timestamp: record.createdAt,
                 type: 'text',
-                content: record.question.substring(0, 50) + (record.question.length > 50 ? '...' : ''),
-                recognizedText: record.question,
-                parseResult: record.parseResult,
-                solution: record.solution,
+                content: record.question.substring(0, 50) + (record.question.length > 50 || record.questionTruncated ? '...' : ''),
+                recognizedText: null,
+                parseResult: null,
+                solution: null,
                 fromServer: true
             }));
             renderHistory();
@@ -800,6 +815,12 @@ async function loadHistoryFromServer() {
 }
 
 async function saveToHistory() {
+    if (UserManager.isLoggedIn() && AppState.historyId) {
+        // 流式解题接口已在服务端保存历史记录
+        await loadHistoryFromServer();
+        return;
+    }
+
     if (UserManager.isLoggedIn()) {
         try {
             const response = await UserManager.fetchApi('/api/history', {
@@ -861,14 +882,37 @@ function renderHistory() {
     
     // 绑定点击事件
     DOM.historyList.querySelectorAll('.history-item').forEach(item => {
-        item.addEventListener('click', () => loadHistoryItem(parseInt(item.dataset.id)));
+        item.addEventListener('click', () => loadHistoryItem(item.dataset.id));
     });
 }
 
-function loadHistoryItem(id) {
-    const item = AppState.history.find(h => h.id === id);
+async function loadHistoryItem(id) {
+    // 服务端记录的 ID 是 UUID，本地记录是时间戳，统一按字符串比较
+    const item = AppState.history.find(h => String(h.id) === id);
     if (!item) return;
     
+    if (item.fromServer && !item.solution) {
+        try {
+            const response = await UserManager.fetchApi(`/api/history/${encodeURIComponent(item.id)}`, {
+                method: 'GET',
+                headers: UserManager.getHeaders()
+            });
+            const result = await response.json();
+            if (!result.success) {
+                showError(result.error || '加载历史记录失败');
+                return;
+            }
+            const record = result.data.record;
+            item.recognizedText = record.question;
+            item.parseResult = record.parseResult;
+            item.solution = record.solution;
+        } catch (error) {
+            console.error('加载历史记录详情失败:', error);
+            showError('加载历史记录失败');
+            return;
+        }
+    }
+    
     // 恢复数据
     AppState.recognizedText = item.recognizedText;
     AppState.parseResult = item.parseResult;